@@ -1,20 +1,21 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor  # 블로킹 작업용 스레드 풀
+import asyncio
+import contextvars
+import functools
+import time
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import json
 import re
-import ast
 import gc  # 가비지 컬렉션 임포트
 import weakref
+import uuid
 import logging
-import platform  # 플랫폼 확인용
-
-# Windows에서는 resource 모듈을 사용할 수 없으므로 조건부로 임포트
-if platform.system() != "Windows":
-    import resource  # 리소스 사용량 모니터링
 
 # galaxy_chatbot.py의 핵심 기능 임포트
 from galaxy_chatbot import (
@@ -23,11 +24,21 @@ from galaxy_chatbot import (
     text_vectorstore, 
     image_vectorstore, 
     llm, 
-    AgentState
+    AgentState,
+    image_index,
+    search_pipeline,
+    bm25_refresher,
+    vector_retriever,
+    SLOW_QUERY_THRESHOLD_MS,
+    VECTOR_BACKEND
 )
 
-# SearchDocumentsTool 클래스를 임포트하지 않고 필요한 기능만 재구현
-from galaxy_chatbot import client, np
+from langchain.schema import Document  # 문서 스키마
+from caching import SemanticCache  # 의미 기반 답변 캐시
+from session_store import create_session_store  # 서버 측 대화 세션
+from memory_governor import MemoryGovernor  # RSS 기반 메모리 정리 / 부하 조절
+from tracing import annotate, external_call, start_trace  # 요청별 구간 트리 / 느린 쿼리 로그
+from metrics import IN_FLIGHT, REGISTRY, REQUEST_LATENCY, REQUESTS, cache_collector, outcome_of, stage  # /metrics 메트릭
 
 # 메모리 사용량 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +46,17 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="갤럭시 S25 매뉴얼 챗봇 API")
 
+# 블로킹 작업(Supabase, Cohere, 검색기)을 실행할 제한된 스레드 풀
+# 핸들러는 이 풀에 작업을 넘기고 await 하므로 느린 외부 호출이 이벤트 루프를 막지 않는다.
+BLOCKING_POOL_SIZE = int(os.environ.get("BLOCKING_POOL_SIZE", "8"))
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+
+async def run_blocking(func, *args, **kwargs):
+    """동기 함수를 제한된 스레드 풀에서 실행하고 결과를 기다림"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()  # 요청 컨텍스트 변수 전달
+    return await loop.run_in_executor(blocking_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
 # CORS 설정 (Next.js 앱에서 API 호출 허용)
 app.add_middleware(
     CORSMiddleware,
@@ -44,292 +66,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 메모리 사용량 로깅 함수
+# 메모리 거버너 - 현재 RSS가 높은 수위를 넘을 때만 가비지 컬렉션/malloc_trim 실행, 위험 수위에서는 요청 거절
+# (MEMORY_LIMIT_MB가 0이면 컨테이너(cgroup) 메모리 한도를 사용)
+# serve.py 다중 워커 모드에서는 한도를 워커 수로 나누고, 워커끼리 공유하는 페이지를 나누어 계산한 PSS로 판단
+MEMORY_LIMIT_MB = float(os.environ.get("MEMORY_LIMIT_MB", "0"))
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+memory_governor = MemoryGovernor(
+    limit_bytes=int(MEMORY_LIMIT_MB * 1024 * 1024) or None,
+    high_watermark=float(os.environ.get("MEMORY_HIGH_WATERMARK", "0.75")),
+    critical_watermark=float(os.environ.get("MEMORY_CRITICAL_WATERMARK", "0.9")),
+    cooldown=float(os.environ.get("MEMORY_GC_COOLDOWN", "5")),
+    sample_interval=float(os.environ.get("MEMORY_SAMPLE_INTERVAL", "1")),
+    workers=WEB_WORKERS,
+    proportional=WEB_WORKERS > 1
+)
+
+# 메모리 사용량 로깅 함수 (최대값이 아닌 현재 RSS)
 def log_memory_usage(location=""):
     try:
-        if platform.system() != "Windows":
-            usage = resource.getrusage(resource.RUSAGE_SELF)
-            memory_mb = usage.ru_maxrss / 1024  # KB를 MB로 변환
-            logger.info(f"메모리 사용량 ({location}): {memory_mb:.2f} MB")
-        else:
-            # Windows 환경에서는 다른 방법으로 메모리 사용량 로깅
-            import psutil
-            process = psutil.Process(os.getpid())
-            memory_mb = process.memory_info().rss / 1024 / 1024  # bytes를 MB로 변환
-            logger.info(f"메모리 사용량 ({location}): {memory_mb:.2f} MB")
+        memory_mb = memory_governor.sample() / 1024 / 1024  # bytes를 MB로 변환
+        logger.info(f"메모리 사용량 ({location}): {memory_mb:.2f} MB")
     except Exception as e:
         logger.error(f"메모리 사용량 로깅 오류: {str(e)}")
 
-# 이미지 관련성 분석 함수 (SearchDocumentsTool에서 추출)
-def analyze_image_relevance(image_url, query_text):
-    try:
-        query_embedding = cohere_embeddings.embed_query(query_text)
-        
-        img_embedding = None
-        try:
-            resp = client.table("image_embeddings").select("embedding,metadata").eq("metadata->>image_url", image_url).execute()
-            if resp and resp.data and len(resp.data) > 0:
-                if 'embedding' in resp.data[0]:
-                    embedding_str = resp.data[0]['embedding']
-                    if isinstance(embedding_str, str):
-                        try:
-                            embedding_str = embedding_str.replace(" ", "")
-                            img_embedding = ast.literal_eval(embedding_str)
-                        except:
-                            print(f"임베딩 문자열 파싱 실패: {embedding_str[:50]}...")
-                            img_embedding = None
-                    else:
-                        img_embedding = embedding_str
-                metadata = resp.data[0].get('metadata', {})
-        except Exception as e:
-            print(f"이미지 임베딩 검색 오류: {str(e)}")
-            metadata = {}
-        
-        # 임베딩 유사도 계산 (기본 점수 0.5)
-        embedding_similarity = 0.5
-        if img_embedding:
-            try:
-                # 코사인 유사도 계산
-                norm_q = np.linalg.norm(query_embedding)
-                norm_img = np.linalg.norm(img_embedding)
-                if norm_q > 0 and norm_img > 0:
-                    embedding_similarity = np.dot(query_embedding, img_embedding) / (norm_q * norm_img)
-                    # 0~1 범위로 정규화
-                    embedding_similarity = (embedding_similarity + 1) / 2
-                    # numpy.float64를 Python float로 변환
-                    embedding_similarity = float(embedding_similarity)
-            except Exception as e:
-                print(f"유사도 계산 오류: {str(e)}")
-                embedding_similarity = 0.5
-        
-        # 위치 정보 추출 (URL 패턴 기반)
-        vertical_position = 0.5  # 기본값 (중간)
-        if "top" in image_url.lower() or "upper" in image_url.lower():
-            vertical_position = 0.2  # 위쪽
-        elif "bottom" in image_url.lower() or "lower" in image_url.lower():
-            vertical_position = 0.8  # 아래쪽
-        elif "mid" in image_url.lower() or "middle" in image_url.lower():
-            vertical_position = 0.5  # 중간
-        
-        # 기본 결과 설정
-        result = {
-            "vertical_position": float(vertical_position),
-            "relevance_score": float(embedding_similarity),
-            "embedding_similarity": float(embedding_similarity),
-            "metadata": metadata
-        }
-        
-        # 메모리 정리
-        del query_embedding
-        del img_embedding
-        
-        return result
-    except Exception as e:
-        print(f"이미지 분석 오류: {str(e)}")
-        return {
-            "vertical_position": 0.5,  # 기본값
-            "relevance_score": 0.5,  # 기본 관련성 점수
-            "embedding_similarity": 0.5
-        }
-    finally:
-        # 명시적 가비지 컬렉션
-        gc.collect()
-
-# 페이지의 모든 이미지 검색 함수
-def get_all_page_images(page, query_text):
-    try:
-        # 해당 페이지의 모든 이미지 검색
-        resp = client.table("image_embeddings").select("*").eq("metadata->>page", str(page)).execute()
-        
-        if not resp or not resp.data or len(resp.data) == 0:
-            # URL 패턴으로 검색 시도
-            resp = client.table("image_embeddings").select("*").ilike("metadata->>image_url", f"%p{page}%").execute()
-            if not resp or not resp.data or len(resp.data) == 0:
-                return []
-        
-        page_images = []
-        for item in resp.data:
-            if 'metadata' in item and item['metadata'] and 'image_url' in item['metadata']:
-                img_url = item['metadata']['image_url']
-                img_page = item['metadata'].get('page', page)
-                
-                # 이미지 관련성 분석
-                img_analysis = analyze_image_relevance(img_url, query_text)
-                
-                # 이미지 정보 저장
-                image_info = {
-                    "url": img_url,
-                    "page": img_page,
-                    "is_page_match": True,  # 같은 페이지이므로 항상 True
-                    "text_similarity": float(img_analysis["embedding_similarity"]),
-                    "vertical_position": float(img_analysis["vertical_position"]),
-                    "relevance_score": float(img_analysis["relevance_score"]),
-                    "score": float(0.7 * img_analysis["relevance_score"] + 0.3)  # 점수 계산 방식 수정
-                }
-                
-                page_images.append(image_info)
-        
-        # 관련성 점수 기준 내림차순 정렬
-        page_images.sort(key=lambda x: x["relevance_score"], reverse=True)
-        return page_images
-        
-    except Exception as e:
-        print(f"페이지 이미지 검색 오류: {str(e)}")
-        return []
-
 # 직접 문서 검색 기능 구현 (_run 함수 대체)
-def perform_search(query: str):
-    """검색 기능 래퍼 함수"""
+def perform_search(query: str, retrieved=None):
+    """검색 기능 래퍼 함수 (retrieved: 일괄 검색에서 미리 구한 (문서 목록, 검색기별 상태))
+
+    단계별 구간 트리를 debug_info["timing"]에 기록하고, 기준 시간을 넘으면 느린 쿼리 로그를 남긴다.
+    """
+    with start_trace("perform_search", slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS, query=query) as trace:
+        result_text, debug_info = _perform_search(query, retrieved)
+        annotate(pages=debug_info.get("page_numbers", [])[:3])
+    debug_info["timing"] = trace.to_dict()
+    return result_text, debug_info
+
+def _perform_search(query: str, retrieved=None):
     log_memory_usage("검색 시작")
     
-    normalized_query = query.strip().rstrip('.!?')
+    # 검색 -> 페이지 점수화 -> 이미지 후보 -> 이미지 재정렬 -> 컨텍스트 구성 (에이전트 도구와 같은 파이프라인)
+    # 메모리가 높은 수위를 넘은 상태면 이미지 단계를 생략하고 텍스트 결과만 반환
+    result_text, debug_info = search_pipeline.run(query, retrieved=retrieved, skip_images=memory_governor.degraded())
     
-    debug_info = {
-        "query": normalized_query,
-        "results": [],
-        "image_results": [],
-        "page_info": {},
-        "vertical_position": {}
-    }
+    log_memory_usage("검색 완료")
+    return result_text, debug_info
+
+# 여러 쿼리 일괄 검색 (임베딩/벡터 검색 RPC를 쿼리마다 반복하지 않음)
+def perform_search_batch(queries: List[str]):
+    normalized_queries = [query.strip().rstrip('.!?') for query in queries]
+    retrieved = hybrid_retriever.invoke_batch_with_info(normalized_queries)
     
-    try:
-        # 1. 텍스트 검색 수행
-        docs = hybrid_retriever.invoke(normalized_query)
-        
-        if not docs:
-            return "매뉴얼에서 관련 정보를 찾을 수 없습니다.", debug_info
-        
-        # 2. 검색 결과에서 페이지 정보 추출
-        page_info = {}
-        page_numbers = []
-        
-        # 페이지 번호 직접 추출 (쿼리에서)
-        extracted_page = None
-        page_pattern = re.search(r'(?:페이지|page|p)?\s*(\d+)(?:페이지|쪽|page)?', normalized_query.lower())
-        if page_pattern:
-            extracted_page = page_pattern.group(1)
-            debug_info["extracted_page"] = extracted_page
-        
-        # 검색 결과에서 페이지 정보 수집
-        for rank, doc in enumerate(docs):
-            doc_page = None
-            
-            # 메타데이터에서 페이지 번호 추출
-            if "page" in doc.metadata:
-                doc_page = str(doc.metadata["page"])
-            elif "category" in doc.metadata and doc.metadata["category"]:
-                if isinstance(doc.metadata["category"], str) and "p" in doc.metadata["category"].lower():
-                    page_matches = re.findall(r'p(\d+)', doc.metadata["category"].lower())
-                    if page_matches:
-                        doc_page = page_matches[0]
-            
-            if doc_page:
-                # 페이지별 점수 계산 (순위에 반비례)
-                page_score = 1.0 / (rank + 1)
-                
-                # 쿼리에서 추출한 페이지와 일치하면 점수 가중치
-                if extracted_page and doc_page == extracted_page:
-                    page_score *= 1.5
-                
-                # 페이지 정보 저장
-                if doc_page not in page_info:
-                    page_info[doc_page] = {
-                        "score": page_score,
-                        "content": [doc.page_content]
-                    }
-                    page_numbers.append(doc_page)
-                else:
-                    page_info[doc_page]["score"] += page_score
-                    page_info[doc_page]["content"].append(doc.page_content)
-        
-        # 페이지 점수 기준으로 정렬
-        sorted_pages = sorted([(page, info["score"]) for page, info in page_info.items()], 
-                            key=lambda x: x[1], reverse=True)
-        top_pages = [page for page, _ in sorted_pages]
-        
-        # 디버그 정보에 페이지 정보 추가
-        debug_info["page_numbers"] = top_pages
-        debug_info["page_info"] = {page: " ".join(page_info[page]["content"])[:200] 
-                                 for page in page_info}
-        debug_info["page_scores"] = {page: float(page_info[page]["score"]) 
-                                   for page in page_info}
-        
-        # 3. 이미지 검색 - 주요 페이지에 대한 이미지 가져오기
-        all_images = []
-        
-        # 상위 페이지에 있는 모든 이미지 검색
-        if top_pages:
-            best_page = top_pages[0]
-            # 해당 페이지의 모든 이미지 가져오기
-            page_images = get_all_page_images(best_page, normalized_query)
-            
-            if page_images:
-                # 최대 3개까지 이미지 선택
-                best_images = page_images[:3]
-                debug_info["best_images"] = best_images
-                
-                # 관련 텍스트 준비 (검색 결과 사용)
-                result_texts = [doc.page_content for doc in docs[:3]]
-                combined_text = " ".join(result_texts)
-                
-                # 각 이미지별 텍스트 관련성 점수 계산
-                for img in best_images:
-                    img_result = analyze_image_relevance(img["url"], combined_text)
-                    img["text_relevance"] = float(img_result.get("relevance_score", 0.5))
-                    img["relevance_score"] = float(img["text_relevance"])
-        
-        # 5. 최종 결과 구성
-        result_text = ""
-        
-        # 참조 페이지 목록 저장
-        reference_pages = []
-        for doc in docs:
-            if "page" in doc.metadata:
-                page = str(doc.metadata["page"])
-                if page not in reference_pages:
-                    reference_pages.append(page)
-        
-        # 텍스트 결과 구성
-        for i, doc in enumerate(docs[:5]):  # 최대 5개만 사용
-            result_text += f"내용: {doc.page_content}\n"
-            result_text += f"카테고리: {doc.metadata.get('category','없음')}\n"
-            result_text += f"페이지: {doc.metadata.get('page','없음')}\n"
-            result_text += "\n"
-            
-            # 디버그 정보 저장
-            debug_info["results"].append({
-                "rank": i+1,
-                "source": doc.metadata.get("source", "알 수 없음"),
-                "score": float(doc.metadata.get("score", 0)),
-                "page": doc.metadata.get("page", "없음"),
-                "category": doc.metadata.get("category", "없음"),
-                "section": doc.metadata.get("section", "없음"),
-                "preview": doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
-            })
-        
-        # 참조 페이지 정보 추가
-        if reference_pages:
-            reference_pages.sort()
-            debug_info["reference_pages"] = reference_pages
+    # 이미지 관련성 평가에 쓰는 결합 텍스트 임베딩도 한 번에 미리 계산 (결과는 임베딩 캐시에 저장됨)
+    combined_texts = [" ".join(doc.page_content for doc in docs[:3]) for docs, _ in retrieved if docs]
+    if combined_texts:
+        try:
+            cohere_embeddings.embed_queries(combined_texts)
+        except Exception as e:
+            logger.warning(f"결합 텍스트 일괄 임베딩 실패: {str(e)}")
+    
+    return [perform_search(query, retrieved=result) for query, result in zip(queries, retrieved)]
 
-        log_memory_usage("검색 완료")
-        
-        # 결과 반환 전 임시 객체 정리
-        del docs
-        
-        return result_text, debug_info
-    except Exception as e:
-        import traceback
-        debug_info["error"] = str(e)
-        debug_info["traceback"] = traceback.format_exc()
-        return "검색 중 오류가 발생했습니다: " + str(e), debug_info
-    finally:
-        # 명시적 가비지 컬렉션
-        gc.collect()
+# 일괄 요청 최대 쿼리 수
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "64"))
+
+def check_batch_size(items):
+    if not items:
+        raise HTTPException(status_code=400, detail="쿼리 목록이 비어 있습니다.")
+    if len(items) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {BATCH_MAX_QUERIES}개까지 요청할 수 있습니다.")
 
 # 요청 모델 정의
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None  # 서버에 보관된 대화 세션 (있으면 history 대신 사용)
     history: Optional[List[Dict[str, str]]] = None
     debug_mode: Optional[bool] = False
 
@@ -339,6 +148,7 @@ class ChatResponse(BaseModel):
     context: str
     images: Optional[List[Dict[str, Any]]] = None
     debug_info: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
 
 # 검색 요청 모델
 class SearchRequest(BaseModel):
@@ -346,54 +156,53 @@ class SearchRequest(BaseModel):
     page_filter: Optional[str] = None
     limit: Optional[int] = 5
 
+# 일괄 검색 요청 모델
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    page_filter: Optional[str] = None
+    limit: Optional[int] = 5
+
+# 일괄 대화 요청 모델 (대화 이력 없이 질문별로 독립 처리)
+class ChatBatchRequest(BaseModel):
+    messages: List[str]
+    debug_mode: Optional[bool] = False
+
 # 이미지 검색 요청 모델
 class ImageSearchRequest(BaseModel):
     query: str
     page: Optional[str] = None
     limit: Optional[int] = 3
 
-# 챗봇 대화 처리 엔드포인트
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    try:
-        # 래퍼 함수를 사용하여 검색 실행
-        context, debug_info = perform_search(request.message)
-        
-        # 대화 히스토리 구성
-        conversation_history = request.history if request.history else []
-        
-        # 프롬프트 구성
-        conversation_context = ""
-        if conversation_history:
-            conversation_context = "이전 대화 내용:\n"
-            for i, exchange in enumerate(conversation_history[-5:]):  
-                conversation_context += f"[대화 {i+1}]\n"
-                # 대화 히스토리 구조 확인 및 올바른 필드 접근
-                if "user" in exchange and "ai" in exchange:
-                    # user와 ai 필드 형식인 경우 (streamlit_app.py에서 보내는 형식)
-                    conversation_context += f"사용자: {exchange.get('user', '')}\n"
-                    conversation_context += f"도우미: {exchange.get('ai', '')}\n"
-                elif "role" in exchange and "content" in exchange:
-                    # role과 content 필드 형식인 경우
-                    if exchange["role"] == "user":
-                        conversation_context += f"사용자: {exchange.get('content', '')}\n"
-                    elif exchange["role"] == "assistant":
-                        conversation_context += f"도우미: {exchange.get('content', '')}\n"
-                else:
-                    # 기타 경우 (키가 없는 경우) - 기본 처리
-                    user_msg = exchange.get('user', exchange.get('content', ''))
-                    conversation_context += f"사용자: {user_msg}\n"
-                    ai_msg = exchange.get('ai', '')
-                    if ai_msg:
-                        conversation_context += f"도우미: {ai_msg}\n"
-        
-        # 참조 페이지 추출
-        reference_pages = []
-        if "reference_pages" in debug_info:
-            reference_pages = debug_info["reference_pages"]
-        
-        # 프롬프트 구성
-        prompt = f"""
+# 대화 히스토리를 프롬프트용 텍스트로 변환
+def build_conversation_context(conversation_history):
+    conversation_context = ""
+    if conversation_history:
+        conversation_context = "이전 대화 내용:\n"
+        for i, exchange in enumerate(conversation_history[-5:]):  
+            conversation_context += f"[대화 {i+1}]\n"
+            # 대화 히스토리 구조 확인 및 올바른 필드 접근
+            if "user" in exchange and "ai" in exchange:
+                # user와 ai 필드 형식인 경우 (streamlit_app.py에서 보내는 형식)
+                conversation_context += f"사용자: {exchange.get('user', '')}\n"
+                conversation_context += f"도우미: {exchange.get('ai', '')}\n"
+            elif "role" in exchange and "content" in exchange:
+                # role과 content 필드 형식인 경우
+                if exchange["role"] == "user":
+                    conversation_context += f"사용자: {exchange.get('content', '')}\n"
+                elif exchange["role"] == "assistant":
+                    conversation_context += f"도우미: {exchange.get('content', '')}\n"
+            else:
+                # 기타 경우 (키가 없는 경우) - 기본 처리
+                user_msg = exchange.get('user', exchange.get('content', ''))
+                conversation_context += f"사용자: {user_msg}\n"
+                ai_msg = exchange.get('ai', '')
+                if ai_msg:
+                    conversation_context += f"도우미: {ai_msg}\n"
+    return conversation_context
+
+# LLM 프롬프트 구성
+def build_chat_prompt(message, conversation_context, context):
+    return f"""
         당신은 삼성 갤럭시 S25의 친절하고 도움이 되는 가상 도우미입니다. 
         사용자의 질문에 대해 상세하고 유용한 정보를 제공하며, 필요한 경우 단계별 안내를 해주세요.
         기술적인 정보뿐만 아니라 실제 사용자가 이해하기 쉽고 도움이 되는 조언도 함께 제공해 주세요.
@@ -411,90 +220,347 @@ async def chat(request: ChatRequest):
         참고할 정보는 다음과 같습니다:
         {context}
 
-        사용자 질문: {request.message}
+        사용자 질문: {message}
 
         위 참고 정보를 바탕으로 상세하고 친절하게 답변해 주세요.  
         내용이 부족하다면 관련된 추가 팁이나 조언도 함께 제공하세요.
         """
+
+# 매뉴얼 페이지 참조 문구 생성 (이미 포함되어 있으면 빈 문자열)
+def build_reference_text(message, answer, reference_pages):
+    if not reference_pages or "매뉴얼의 관련 섹션" in answer or "더 알고 싶으시면" in answer:
+        return ""
+    
+    reference_pages.sort()
+    
+    # 문맥에 맞는 자연스러운 안내문 생성
+    if "설정" in message.lower() or "방법" in message.lower():
+        return "\n\n💡 이 설정에 대해 더 자세히 알고 싶으시면 매뉴얼의 관련 섹션을 참고해보세요."
+    elif "기능" in message.lower() or "사용" in message.lower():
+        return "\n\n💡 이 기능의 추가 옵션과 활용법은 매뉴얼에서 더 자세히 확인하실 수 있습니다."
+    return "\n\n💡 더 자세한 정보가 필요하시면 매뉴얼의 관련 섹션을 참고해보세요."
+
+# 응답 하단에 붙일 이미지 정보 텍스트 생성
+def build_image_info_text(images):
+    if not images:
+        return ""
+    
+    img_info_text = "\n\n"
+    
+    for i, img in enumerate(images[:3]):  # 최대 3개까지만 표시
+        relevance_score = float(img.get('text_relevance', img.get('relevance_score', 0)))
+        match_score = float(img.get('score', 0))
+        
+        # 이미지 간 공백 처리
+        if i > 0:
+            img_info_text += "\n\n"
+        
+        # 이미지 태그와 URL - Next.js가 인식할 수 있는 정확한 형식
+        # 첫 번째 이미지이고 여러 이미지가 있는 경우 👑 표시 추가
+        if i == 0 and len(images) > 1:
+            img_info_text += f"[이미지 {i+1}] 👑 텍스트와 가장 관련성 높은 이미지\n"
+        else:
+            img_info_text += f"[이미지 {i+1}]\n"
         
-        # LLM 응답 생성
-        response = llm.invoke(prompt)
-        answer = response.content
+        # URL은 반드시 별도 줄에 단독으로 배치 (Next.js 인식용)
+        img_info_text += f"{img['url']}\n\n"
         
-        # 매뉴얼 페이지 참조 문구 추가 (이미 포함되어 있지 않은 경우에만)
-        if reference_pages and "매뉴얼의 관련 섹션" not in answer and "더 알고 싶으시면" not in answer:
-            reference_pages.sort()
-            
-            # 문맥에 맞는 자연스러운 안내문 생성
-            if "설정" in request.message.lower() or "방법" in request.message.lower():
-                reference_text = "\n\n💡 이 설정에 대해 더 자세히 알고 싶으시면 매뉴얼의 관련 섹션을 참고해보세요."
-            elif "기능" in request.message.lower() or "사용" in request.message.lower():
-                reference_text = "\n\n💡 이 기능의 추가 옵션과 활용법은 매뉴얼에서 더 자세히 확인하실 수 있습니다."
-            else:
-                reference_text = "\n\n💡 더 자세한 정보가 필요하시면 매뉴얼의 관련 섹션을 참고해보세요."
-            
-            answer += reference_text
+        # 메타데이터는 URL 뒤에 별도로 표시
+        img_info_text += f"페이지: {img.get('page', '알 수 없음')}\n"
+        img_info_text += f"관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}"
         
-        # 이미지 정보 추가
-        images = []
-        if debug_info and "best_images" in debug_info and debug_info["best_images"]:
-            images = debug_info["best_images"]
-            
-            # 추가 이미지 정보 텍스트도 응답에 포함
-            img_info_text = "\n\n"
+        # 이미지 관련성에 대한 설명 추가
+        if relevance_score < 0.65 or match_score < 0.7:
+            img_info_text += " (낮은 관련성)"
+        elif relevance_score >= 0.8:
+            img_info_text += " (높은 관련성)"
+        else:
+            img_info_text += " (중간 관련성)"
+    
+    return img_info_text
+
+# 응답용 이미지 목록 구성
+def format_response_images(images):
+    return [{
+        "url": img["url"],
+        "page": str(img.get("page", "")),
+        "relevance_score": float(img.get("relevance_score", 0.5)),
+        "match_score": float(img.get("score", 0.5)),
+        "text_relevance": float(img.get("text_relevance", 0.5))
+    } for img in images]
+
+# LLM 답변에 참조 문구와 이미지 정보를 붙여 응답 구성
+def build_chat_response(message, answer, context, debug_info, debug_mode=False):
+    # 매뉴얼 페이지 참조 문구 추가 (이미 포함되어 있지 않은 경우에만)
+    answer += build_reference_text(message, answer, debug_info.get("reference_pages", []))
+    
+    # 이미지 정보 추가
+    images = debug_info.get("best_images") or []
+    answer += build_image_info_text(images)
+    
+    return ChatResponse(
+        answer=answer,
+        context=context,
+        images=format_response_images(images),
+        debug_info=debug_info if debug_mode else None  # 디버그 모드가 아니면 None
+    )
+
+# 의미 기반 답변 캐시 - 대화 이력이 없는 질문은 임베딩이 충분히 비슷한 이전 질문의 답변을 재사용
+# (BM25 인덱스가 갱신되거나 인메모리 이미지/텍스트 인덱스를 다시 로딩하면 전체 무효화)
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+answer_cache = SemanticCache(max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD) if ANSWER_CACHE_SIZE > 0 else None
+if answer_cache is not None:
+    bm25_refresher.add_listener(answer_cache.clear)
+    image_index.add_listener(answer_cache.clear)
+    if hasattr(vector_retriever, "add_listener"):
+        vector_retriever.add_listener(answer_cache.clear)
+
+def lookup_answer_cache(message):
+    """질문 임베딩으로 캐시된 답변 조회 (반환: (캐시 결과 또는 None, 정규화된 질문, 임베딩))"""
+    normalized_query = message.strip().rstrip('.!?')  # perform_search와 같은 정규화 -> 미스여도 벡터 검색이 임베딩 캐시 재사용
+    embedding = cohere_embeddings.embed_query(normalized_query)
+    return answer_cache.get(normalized_query, embedding), normalized_query, embedding
+
+# 요청마다 다시 기록하는 debug_info 키 (캐시에 저장하지 않음)
+REQUEST_SCOPED_DEBUG_KEYS = ("timing", "answer_cache")
+
+def cacheable_debug_info(debug_info):
+    """캐시에 저장할 debug_info 사본 (응답 객체와 공유하지 않아 이후 응답에 쓰는 값이 캐시에 섞이지 않음)"""
+    return {key: value for key, value in debug_info.items() if key not in REQUEST_SCOPED_DEBUG_KEYS}
+
+def cached_answer(response, context, debug_info):
+    """캐시에 저장할 응답 항목 (debug_info는 디버그 모드 여부와 관계없이 보관)"""
+    return {"answer": response.answer, "context": context, "images": response.images, "debug_info": cacheable_debug_info(debug_info)}
+
+def cached_chat_response(hit, debug_mode=False):
+    entry, similarity, matched_query = hit
+    debug_info = None
+    if debug_mode:
+        debug_info = dict(entry["debug_info"], answer_cache={"hit": True, "similarity": round(similarity, 4), "matched_query": matched_query})
+    return ChatResponse(
+        answer=entry["answer"],
+        context=entry["context"],
+        images=[dict(image) for image in entry["images"]],
+        debug_info=debug_info
+    )
+
+def is_cacheable(debug_info):
+    # 검색 결과가 없었거나 메모리 부족으로 이미지 분석을 생략한 답변은 저장하지 않음
+    return bool(debug_info.get("results")) and "degraded" not in debug_info
+
+# 서버 측 대화 세션 - 클라이언트는 session_id만 보내고, 서버가 세션별 최근 SESSION_MAX_TURNS개 대화를 보관
+# (요청 크기가 대화 길이와 관계없이 일정, 유휴 세션은 SESSION_IDLE_TTL초 후 제거)
+# memory 백엔드는 워커별이므로 WEB_WORKERS가 2 이상이면 sqlite 백엔드 사용
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_MAX_TURNS = int(os.environ.get("SESSION_MAX_TURNS", "5"))
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_ANSWER_CHARS = int(os.environ.get("SESSION_MAX_ANSWER_CHARS", "1000"))
+SESSION_SQLITE_PATH = os.environ.get("SESSION_SQLITE_PATH", ".cache/sessions.sqlite3")
+SESSION_ID_MAX_LENGTH = 128
+session_store = create_session_store(
+    SESSION_BACKEND,
+    sqlite_path=SESSION_SQLITE_PATH,
+    max_turns=SESSION_MAX_TURNS,
+    idle_ttl=SESSION_IDLE_TTL,
+    max_sessions=SESSION_MAX_SESSIONS,
+    max_answer_chars=SESSION_MAX_ANSWER_CHARS
+)
+
+def load_history(request):
+    """대화 이력 (session_id가 있으면 서버에 보관된 세션, 없으면 요청의 history)"""
+    if request.session_id is None:
+        return request.history
+    if not request.session_id or len(request.session_id) > SESSION_ID_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"session_id는 1~{SESSION_ID_MAX_LENGTH}자여야 합니다.")
+    return session_store.get(request.session_id)
+
+def remember_turn(request, answer):
+    """세션에 이번 대화 추가 (답변은 SESSION_MAX_ANSWER_CHARS자까지만 저장)"""
+    if request.session_id:
+        try:
+            session_store.append(request.session_id, request.message, answer)
+        except Exception as e:
+            logger.warning(f"세션 저장 실패: {str(e)}")
+
+# 챗봇 대화 처리 엔드포인트
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    history = await run_blocking(load_history, request)
+    try:
+        # 요청 전체를 구간 트리로 기록 (검색 단계는 perform_search 구간 아래에 기록됨)
+        with start_trace("chat", slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS, query=request.message) as trace:
+            # 대화 이력이 없으면 의미 기반 답변 캐시 먼저 조회
+            result = None
+            use_cache = answer_cache is not None and not history
+            if use_cache:
+                with stage("answer_cache_lookup"):
+                    hit, cache_key, embedding = await run_blocking(lookup_answer_cache, request.message)
+                if hit is not None:
+                    result = cached_chat_response(hit, request.debug_mode)
+                    await run_blocking(remember_turn, request, hit[0]["answer"])
             
-            for i, img in enumerate(images[:3]):  # 최대 3개까지만 표시
-                relevance_score = float(img.get('text_relevance', img.get('relevance_score', 0)))
-                match_score = float(img.get('score', 0))
-                
-                # 이미지 간 공백 처리
-                if i > 0:
-                    img_info_text += "\n\n"
-                
-                # 이미지 태그와 URL - Next.js가 인식할 수 있는 정확한 형식
-                # 첫 번째 이미지이고 여러 이미지가 있는 경우 👑 표시 추가
-                if i == 0 and len(images) > 1:
-                    img_info_text += f"[이미지 {i+1}] 👑 텍스트와 가장 관련성 높은 이미지\n"
-                else:
-                    img_info_text += f"[이미지 {i+1}]\n"
-                
-                # URL은 반드시 별도 줄에 단독으로 배치 (Next.js 인식용)
-                img_info_text += f"{img['url']}\n\n"
+            if result is None:
+                # 래퍼 함수를 사용하여 검색 실행 (스레드 풀에서 실행)
+                context, debug_info = await run_blocking(perform_search, request.message)
                 
-                # 메타데이터는 URL 뒤에 별도로 표시
-                img_info_text += f"페이지: {img.get('page', '알 수 없음')}\n"
-                img_info_text += f"관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}"
+                # 프롬프트 구성
+                conversation_context = build_conversation_context(history)
+                with stage("prompt_build"):
+                    prompt = build_chat_prompt(request.message, conversation_context, context)
                 
-                # 이미지 관련성에 대한 설명 추가
-                if relevance_score < 0.65 or match_score < 0.7:
-                    img_info_text += " (낮은 관련성)"
-                elif relevance_score >= 0.8:
-                    img_info_text += " (높은 관련성)"
-                else:
-                    img_info_text += " (중간 관련성)"
-            
-            answer += img_info_text
-        
-        # 디버그 모드가 아니면 debug_info를 None으로 설정
-        if not request.debug_mode:
-            debug_info = None
-        
-        return ChatResponse(
-            answer=answer,
-            context=context,
-            images=[{
-                "url": img["url"],
-                "page": str(img.get("page", "")),
-                "relevance_score": float(img.get("relevance_score", 0.5)),
-                "match_score": float(img.get("score", 0.5)),
-                "text_relevance": float(img.get("text_relevance", 0.5))
-            } for img in images],
-            debug_info=debug_info
-        )
+                # LLM 응답 생성 (비동기 호출)
+                with stage("llm_completion"):
+                    external_call()
+                    response = await llm.ainvoke(prompt)
+                result = build_chat_response(request.message, response.content, context, debug_info, request.debug_mode)
+                await run_blocking(remember_turn, request, response.content)
+                if use_cache and is_cacheable(debug_info):
+                    answer_cache.set(cache_key, embedding, cached_answer(result, context, debug_info))
+        
+        result.session_id = request.session_id
+        if result.debug_info is not None:
+            result.debug_info["timing"] = trace.to_dict()  # 응답 직전까지의 전체 구간 트리
+        return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"오류 발생: {str(e)}")
 
+# 일괄 대화 엔드포인트 - 검색은 한 번에, LLM 호출은 동시에 실행
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    check_batch_size(request.messages)
+    try:
+        searches = await run_blocking(perform_search_batch, request.messages)
+        with stage("prompt_build"):
+            prompts = [build_chat_prompt(message, build_conversation_context(None), context) for message, (context, _) in zip(request.messages, searches)]
+        with stage("llm_completion_batch"):
+            external_call(len(prompts))
+            responses = await llm.abatch(prompts, config={"max_concurrency": BLOCKING_POOL_SIZE}, return_exceptions=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"오류 발생: {str(e)}")
+    
+    results = []
+    for message, (context, debug_info), response in zip(request.messages, searches, responses):
+        if isinstance(response, Exception):  # 개별 질문 오류는 해당 항목에만 기록
+            results.append({"message": message, "error": f"오류 발생: {str(response)}"})
+        else:
+            results.append(build_chat_response(message, response.content, context, debug_info, request.debug_mode))
+    return {"responses": results}
+
+# SSE 이벤트 직렬화
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# 챗봇 스트리밍 엔드포인트 (Server-Sent Events)
+# 이벤트 순서: retrieval -> context -> token(여러 번) -> reference -> images -> done (오류 시 error)
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    history = await run_blocking(load_history, request)
+    
+    async def event_stream():
+        try:
+            # 0. 대화 이력이 없으면 의미 기반 답변 캐시 조회 (적중 시 답변 전체를 한 번에 전송)
+            started = time.perf_counter()
+            use_cache = answer_cache is not None and not history
+            if use_cache:
+                hit, cache_key, embedding = await run_blocking(lookup_answer_cache, request.message)
+                if hit is not None:
+                    cached = cached_chat_response(hit, request.debug_mode)
+                    await run_blocking(remember_turn, request, cached.answer)
+                    yield sse_event("retrieval", {
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                        "page_numbers": hit[0]["debug_info"].get("page_numbers", []),
+                        "reference_pages": hit[0]["debug_info"].get("reference_pages", []),
+                        "cached": True
+                    })
+                    yield sse_event("context", {"context": cached.context})
+                    yield sse_event("token", {"text": cached.answer})
+                    yield sse_event("reference", {"text": ""})
+                    yield sse_event("images", {"images": cached.images, "text": ""})
+                    yield sse_event("done", {"answer": cached.answer, "debug_info": cached.debug_info})
+                    return
+            
+            # 1. 검색 (스레드 풀에서 실행)
+            context, debug_info = await run_blocking(perform_search, request.message)
+            yield sse_event("retrieval", {
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "page_numbers": debug_info.get("page_numbers", []),
+                "reference_pages": debug_info.get("reference_pages", [])
+            })
+            yield sse_event("context", {"context": context})
+            
+            # 2. LLM 토큰 스트리밍
+            with stage("prompt_build"):
+                prompt = build_chat_prompt(request.message, build_conversation_context(history), context)
+            answer = ""
+            with stage("llm_completion"):
+                external_call()
+                async for chunk in llm.astream(prompt):
+                    if chunk.content:
+                        answer += chunk.content
+                        yield sse_event("token", {"text": chunk.content})
+            
+            await run_blocking(remember_turn, request, answer)
+            
+            # 3. 참조 문구와 이미지 블록 (/chat 응답과 같은 순서로 이어 붙임)
+            reference_text = build_reference_text(request.message, answer, debug_info.get("reference_pages", []))
+            yield sse_event("reference", {"text": reference_text})
+            
+            images = debug_info.get("best_images") or []
+            image_text = build_image_info_text(images)
+            yield sse_event("images", {"images": format_response_images(images), "text": image_text})
+            
+            yield sse_event("done", {
+                "answer": answer + reference_text + image_text,
+                "debug_info": debug_info if request.debug_mode else None
+            })
+            if use_cache and is_cacheable(debug_info):
+                answer_cache.set(cache_key, embedding, {
+                    "answer": answer + reference_text + image_text,
+                    "context": context,
+                    "images": format_response_images(images),
+                    "debug_info": cacheable_debug_info(debug_info)
+                })
+        except Exception as e:
+            yield sse_event("error", {"detail": f"오류 발생: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # 프록시 버퍼링 방지
+    )
+
+# 대화 세션 생성 엔드포인트 - 이후 /chat, /chat/stream 요청에 session_id로 전달
+@app.post("/sessions")
+async def create_session():
+    return {"session_id": uuid.uuid4().hex, "max_turns": session_store.max_turns, "idle_ttl": session_store.idle_ttl}
+
+# 대화 세션 삭제 엔드포인트
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    deleted = await run_blocking(session_store.delete, session_id)
+    return {"session_id": session_id, "deleted": deleted}
+
+# 검색 결과를 응답 형식으로 변환
+def format_search_results(docs, page_filter=None, limit=None):
+    # 페이지 필터 적용 (선택 사항)
+    if page_filter:
+        docs = [doc for doc in docs if doc.metadata.get("page") == page_filter]
+    
+    # 결과 제한
+    if limit and limit < len(docs):
+        docs = docs[:limit]
+    
+    # 결과 구성
+    return [{
+        "content": doc.page_content,
+        "metadata": doc.metadata,
+        "score": float(doc.metadata.get("score", 0))
+    } for doc in docs]
+
 # 텍스트 검색 엔드포인트
 @app.post("/search")
 async def search(request: SearchRequest):
@@ -502,38 +568,73 @@ async def search(request: SearchRequest):
         # 쿼리 정규화
         normalized_query = request.query.strip().rstrip('.!?')
         
-        # 하이브리드 검색기 사용
-        docs = hybrid_retriever.invoke(normalized_query)
+        # 하이브리드 검색기 사용 (스레드 풀에서 실행)
+        docs = await run_blocking(hybrid_retriever.invoke, normalized_query)
         
-        # 페이지 필터 적용 (선택 사항)
-        if request.page_filter:
-            docs = [doc for doc in docs if doc.metadata.get("page") == request.page_filter]
+        results = format_search_results(docs, request.page_filter, request.limit)
         
-        # 결과 제한
-        if request.limit and request.limit < len(docs):
-            docs = docs[:request.limit]
+        return {"results": results}
         
-        # 결과 구성
-        results = []
-        for doc in docs:
-            results.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": float(doc.metadata.get("score", 0))
-            })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"검색 오류: {str(e)}")
+
+# 일괄 텍스트 검색 엔드포인트 - 모든 쿼리를 임베딩 1회, 벡터 검색 RPC 1회로 처리
+@app.post("/search/batch")
+async def search_batch(request: SearchBatchRequest):
+    check_batch_size(request.queries)
+    try:
+        normalized_queries = [query.strip().rstrip('.!?') for query in request.queries]
+        retrieved = await run_blocking(hybrid_retriever.invoke_batch_with_info, normalized_queries)
         
-        return {"results": results}
+        return {"results": [{
+            "query": query,
+            "results": format_search_results(docs, request.page_filter, request.limit)
+        } for query, (docs, _) in zip(request.queries, retrieved)]}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"검색 오류: {str(e)}")
 
+# 쿼리 기반 이미지 검색 함수
+def search_images_by_query(query, limit):
+    # 쿼리 임베딩 생성
+    query_embedding = cohere_embeddings.embed_query(query)
+    
+    # 이미지 벡터 검색 (인프로세스 백엔드면 이미지 인덱스에서 검색, 인덱스를 쓸 수 없으면 RPC)
+    matches = image_index.search(query_embedding, k=limit or 3) if VECTOR_BACKEND != "supabase" else None
+    if matches is not None:
+        docs = [Document(page_content="", metadata=dict(metadata, similarity=similarity)) for metadata, similarity in matches]
+    else:
+        docs = image_vectorstore.similarity_search_by_vector(
+            query_embedding,
+            k=limit or 3
+        )
+    
+    # 결과 구성 (이미지 관련성 일괄 분석)
+    analyses = search_pipeline.analyze_images_relevance(
+        [doc.metadata['image_url'] for doc in docs if 'image_url' in doc.metadata],
+        query
+    )
+    images = []
+    for doc in docs:
+        if 'image_url' in doc.metadata:
+            img_analysis = analyses[doc.metadata['image_url']]
+            
+            images.append({
+                "url": doc.metadata['image_url'],
+                "page": doc.metadata.get('page', 'unknown'),
+                "relevance_score": float(img_analysis["relevance_score"]),
+                "vertical_position": float(img_analysis["vertical_position"]),
+                "metadata": doc.metadata
+            })
+    return images
+
 # 이미지 검색 엔드포인트
 @app.post("/image-search")
 async def image_search(request: ImageSearchRequest):
     try:
         # 페이지 기반 이미지 검색
         if request.page:
-            images = get_all_page_images(request.page, request.query)
+            images = await run_blocking(search_pipeline.get_all_page_images, request.page, request.query)
             
             # 결과 제한
             if request.limit and request.limit < len(images):
@@ -543,38 +644,66 @@ async def image_search(request: ImageSearchRequest):
         
         # 쿼리 기반 이미지 검색
         else:
-            # 쿼리 임베딩 생성
-            query_embedding = cohere_embeddings.embed_query(request.query)
-            
-            # 이미지 벡터 검색
-            docs = image_vectorstore.similarity_search_by_vector(
-                query_embedding,
-                k=request.limit or 3
-            )
-            
-            # 결과 구성
-            images = []
-            for doc in docs:
-                if 'image_url' in doc.metadata:
-                    # 이미지 관련성 분석
-                    img_analysis = analyze_image_relevance(
-                        doc.metadata['image_url'], 
-                        request.query
-                    )
-                    
-                    images.append({
-                        "url": doc.metadata['image_url'],
-                        "page": doc.metadata.get('page', 'unknown'),
-                        "relevance_score": float(img_analysis["relevance_score"]),
-                        "vertical_position": float(img_analysis["vertical_position"]),
-                        "metadata": doc.metadata
-                    })
-            
+            images = await run_blocking(search_images_by_query, request.query, request.limit)
             return {"images": images}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"이미지 검색 오류: {str(e)}")
 
+# 서버 시작 시 이미지 임베딩 인덱스 미리 로딩 및 BM25 증분 갱신 시작
+@app.on_event("startup")
+async def preload_indexes():
+    if os.environ.get("PRELOAD_IMAGE_INDEX", "true").lower() != "false":
+        await run_blocking(image_index.ensure_loaded)
+        log_memory_usage("이미지 인덱스 로딩")
+    if hasattr(vector_retriever, "ensure_loaded") and os.environ.get("PRELOAD_VECTOR_INDEX", "true").lower() != "false":
+        await run_blocking(vector_retriever.ensure_loaded)
+        log_memory_usage("텍스트 벡터 인덱스 로딩")
+    # 시작 시 만든 인덱스/모델 객체는 이후 세대 GC 검사 대상에서 제외 (전체 수집 비용 감소)
+    gc.collect()
+    gc.freeze()
+    bm25_refresher.start()  # BM25_REFRESH_INTERVAL > 0일 때만 백그라운드 갱신 시작
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    bm25_refresher.stop()
+
+# 캐시 통계 엔드포인트
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "embedding_cache": cohere_embeddings.stats(),
+        "image_index": {"loaded": image_index.loaded, "images": len(image_index)},
+        "vector_index": vector_retriever.stats() if hasattr(vector_retriever, "stats") else {"backend": VECTOR_BACKEND},
+        "retrieval_cache": hybrid_retriever.cache.stats() if hybrid_retriever.cache is not None else None,
+        "bm25_index": bm25_refresher.stats(),
+        "memory": memory_governor.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "sessions": session_store.stats()
+    }
+
+# Prometheus 메트릭 엔드포인트 (단계별 지연 시간, 요청 수, 캐시 적중률, 처리 중 요청 수, 메모리)
+def memory_collector():
+    stats = memory_governor.stats()
+    return [
+        ("chatbot_memory_rss_bytes", "gauge", "Current resident set size", [("", {}, stats["rss_bytes"])]),
+        ("chatbot_memory_peak_rss_bytes", "gauge", "Peak resident set size", [("", {}, stats["peak_rss_bytes"])]),
+        ("chatbot_memory_collections", "counter", "Collections triggered by the memory governor", [("_total", {}, stats["collections"])]),
+        ("chatbot_memory_shed_requests", "counter", "Requests rejected by the memory governor", [("_total", {}, stats["shed_requests"])]),
+    ]
+
+REGISTRY.add_collector(cache_collector(lambda: {
+    "embedding": cohere_embeddings.stats(),
+    "retrieval": hybrid_retriever.cache.stats() if hybrid_retriever.cache is not None else None,
+    "answer": answer_cache.stats() if answer_cache is not None else None,
+}))
+REGISTRY.add_collector(memory_collector)
+
+@app.get("/metrics")
+async def metrics():
+    memory_governor.sample(0)
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # 상태 확인 엔드포인트
 @app.get("/health")
 async def health_check():
@@ -588,18 +717,56 @@ async def read_root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/chat - POST 요청으로 챗봇과 대화",
+            "chat_stream": "/chat/stream - POST 요청으로 챗봇 응답을 SSE 스트림으로 수신",
+            "chat_batch": "/chat/batch - POST 요청으로 여러 질문에 한 번에 답변",
+            "sessions": "/sessions - POST 요청으로 대화 세션 생성 (session_id를 /chat에 전달), DELETE /sessions/{session_id}로 삭제",
             "search": "/search - POST 요청으로 매뉴얼 검색",
+            "search_batch": "/search/batch - POST 요청으로 여러 쿼리 일괄 검색",
             "image_search": "/image-search - POST 요청으로 이미지 검색",
+            "metrics": "/metrics - GET 요청으로 Prometheus 형식 메트릭 수집",
+            "cache_stats": "/cache/stats - GET 요청으로 캐시 적중/미스 및 메모리(현재/최대 RSS) 통계 확인",
             "health": "/health - GET 요청으로 API 상태 확인"
         },
         "docs": "/docs - API 문서 확인"
     }
 
-# 각 요청 처리 후 메모리 정리를 위한 이벤트 핸들러
+# 메모리 수위에 따른 요청 거절 및 정리
+# 위험 수위를 넘으면 검색/대화 요청을 503으로 거절하고, 요청 처리 후에는 높은 수위를 넘었을 때만 정리
+SHEDDABLE_PATHS = {"/chat", "/chat/stream", "/chat/batch", "/search", "/search/batch", "/image-search"}
+
 @app.middleware("http")
-async def clean_memory_after_request(request, call_next):
+async def govern_memory(request, call_next):
+    # 수위 확인은 캐시된 측정값으로 하고, gc.collect / malloc_trim은 이벤트 루프를 막지 않도록 스레드 풀에서 실행
+    if request.url.path in SHEDDABLE_PATHS:
+        memory_governor.sample()
+        if memory_governor.level() == "critical" and await run_blocking(memory_governor.should_shed):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "서버 메모리가 부족합니다. 잠시 후 다시 시도해 주세요."},
+                headers={"Retry-After": str(int(memory_governor.cooldown) or 1)}
+            )
     response = await call_next(request)
-    gc.collect()
+    if memory_governor.collect_due():  # 높은 수위를 넘었을 때만 gc.collect + malloc_trim (응답은 기다리지 않음)
+        blocking_executor.submit(memory_governor.collect)
+    return response
+
+ROUTE_PATHS = {route.path for route in app.routes}  # 메트릭 레이블로 사용할 등록 경로
+
+# 요청 수 / 지연 시간 / 처리 중 요청 수 기록 (가장 바깥 미들웨어 - 메모리 부족으로 거절된 요청도 집계)
+# 엔드포인트 레이블은 등록된 경로만 사용하고 그 밖의 경로는 "other"로 묶어 레이블 수를 제한
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    path = request.url.path
+    endpoint = path if path in ROUTE_PATHS else "other"
+    started = time.perf_counter()
+    with IN_FLIGHT.track_inprogress(endpoint=endpoint):
+        try:
+            response = await call_next(request)
+        except Exception:
+            REQUESTS.inc(endpoint=endpoint, method=request.method, outcome="server_error")
+            raise
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, outcome=outcome_of(response.status_code))
     return response
 
 # 직접 실행 시 서버 구동
@@ -608,4 +775,4 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     
     # 서버 시작
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
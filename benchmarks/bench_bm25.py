@@ -0,0 +1,107 @@
+# BM25 키워드 검색 벤치마크
+# 기존 BM25Retriever(rank_bm25, 공백 분리)와 sparse_bm25(CSR + 한국어 토크나이저)를
+# 매뉴얼 크기의 1배 / 10배 / 100배 합성 코퍼스에서 비교한다.
+#  - 색인 생성 시간, 질의당 지연 시간(p50/p95)
+#  - 같은 공백 토크나이저를 썼을 때 두 엔진의 상위 k개 결과 일치 여부
+#
+# 실행: python benchmarks/bench_bm25.py [--base-docs 1000] [--scales 1,10,100] [--queries 50]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bm25_index import BM25Snapshot, default_tokenizer  # noqa: E402
+from sparse_bm25 import KoreanTokenizer, SparseBM25  # noqa: E402
+
+NOUNS = ["배터리", "충전", "화면", "카메라", "사진", "동영상", "설정", "메뉴", "와이파이", "블루투스", "지문", "얼굴", "잠금",
+         "알림", "소리", "진동", "빅스비", "삼성", "계정", "갤러리", "앱", "위젯", "홈화면", "스크린샷", "보안", "폴더", "연락처",
+         "메시지", "전화", "키보드", "언어", "날짜", "시간", "디스플레이", "밝기", "모드", "절전", "업데이트", "저장공간", "유심"]
+PARTICLES = ["", "", "을", "를", "이", "가", "은", "는", "에서", "으로", "의", "에"]
+VERBS = ["설정하세요", "누르세요", "확인하세요", "선택합니다", "사용할 수 있습니다", "변경하려면", "켜거나 끄세요"]
+
+
+def make_corpus(count, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(15, 60)):
+            if rng.random() < 0.8:
+                words.append(rng.choice(NOUNS) + rng.choice(PARTICLES))
+            else:
+                words.append(rng.choice(VERBS))
+        docs.append(" ".join(words))
+    return docs
+
+
+def make_queries(count, seed=1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(NOUNS) + rng.choice(PARTICLES) for _ in range(rng.randint(2, 4))) + " 방법" for _ in range(count)]
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95)
+
+
+def time_queries(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-docs", type=int, default=1000, help="매뉴얼 크기 (청크 수)")
+    parser.add_argument("--scales", default="1,10,100", help="코퍼스 배수 목록")
+    parser.add_argument("--queries", type=int, default=50, help="질의 수")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from langchain_community.retrievers import BM25Retriever
+
+    queries = make_queries(args.queries)
+    korean = KoreanTokenizer()
+    print(f"{'문서 수':>8} | {'엔진':<26} | {'색인(ms)':>9} | {'p50(ms)':>8} | {'p95(ms)':>8}")
+    for scale in (int(s) for s in args.scales.split(",")):
+        texts = make_corpus(args.base_docs * scale)
+        metadatas = [{"i": i} for i in range(len(texts))]
+
+        started = time.perf_counter()
+        legacy = BM25Retriever.from_texts(texts, metadatas=metadatas, k=args.k)
+        legacy_build = time.perf_counter() - started
+        legacy_queries = queries if scale < 100 else queries[:10]  # rank_bm25는 100배에서 질의가 느려 일부만 측정
+        legacy_p50, legacy_p95 = time_queries(legacy.invoke, legacy_queries)
+
+        started = time.perf_counter()
+        whitespace = SparseBM25(BM25Snapshot.build(texts, metadatas))
+        sparse_build = time.perf_counter() - started
+        sparse_p50, sparse_p95 = time_queries(lambda q: whitespace.top_k(default_tokenizer(q), args.k), queries)
+
+        started = time.perf_counter()
+        analyzed = SparseBM25(BM25Snapshot.build(texts, metadatas, tokenizer=korean))
+        korean_build = time.perf_counter() - started
+        korean_p50, korean_p95 = time_queries(lambda q: analyzed.top_k(korean(q), args.k), queries)
+
+        # 같은 토크나이저에서 상위 k개 점수 일치 확인
+        for query in legacy_queries[:5]:
+            expected = np.sort(legacy.vectorizer.get_scores(default_tokenizer(query)))[::-1][:args.k]
+            actual = [score for _, score in whitespace.top_k(default_tokenizer(query), args.k)]
+            assert np.allclose(expected[:len(actual)], actual, rtol=1e-4), query
+
+        n = len(texts)
+        print(f"{n:>8} | {'rank_bm25 (공백)':<26} | {legacy_build * 1000:>9.1f} | {legacy_p50:>8.2f} | {legacy_p95:>8.2f}")
+        print(f"{n:>8} | {'sparse (공백)':<26} | {sparse_build * 1000:>9.1f} | {sparse_p50:>8.3f} | {sparse_p95:>8.3f}")
+        print(f"{n:>8} | {'sparse (한국어 조사+바이그램)':<22} | {korean_build * 1000:>9.1f} | {korean_p50:>8.3f} | {korean_p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
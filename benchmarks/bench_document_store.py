@@ -0,0 +1,68 @@
+# 문서 저장소 메모리 벤치마크 (외부 서비스 불필요)
+# 같은 합성 코퍼스(매뉴얼 형태의 본문 + page/category/section 메타데이터)를
+#  - documents: langchain Document 목록 (문서마다 본문 문자열 + 메타데이터 사전)
+#  - store: DocumentStore (UTF-8 버퍼 + 위치 배열 + 메타데이터 코드 배열)
+# 로 만들었을 때의 파이썬 힙 사용량(tracemalloc)과, 상위 5개를 Document로 만드는 데 걸리는 시간을 비교한다.
+#
+# 실행: python benchmarks/bench_document_store.py [--pages 2000,20000] [--lookups 2000]
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain.schema import Document  # noqa: E402
+
+from benchmarks.fakes import make_corpus  # noqa: E402
+from document_store import DocumentStore, as_document  # noqa: E402
+
+
+def measure(build):
+    """build()가 만든 객체가 유지하는 힙 크기 (MB)와 객체"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / 1048576, built
+
+
+def top_k_ms(get, size, lookups, k=5, seed=0):
+    rows = np.random.default_rng(seed).integers(0, size, size=(lookups, k))
+    started = time.perf_counter()
+    for batch in rows:
+        [as_document(get(int(row))) for row in batch]
+    return (time.perf_counter() - started) * 1000 / lookups
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="2000,20000", help="매뉴얼 페이지 수 목록 (페이지당 문서 3개)")
+    parser.add_argument("--lookups", type=int, default=2000, help="상위 5개 변환 반복 횟수")
+    args = parser.parse_args()
+
+    print(f"{'문서 수':>8} | {'방식':<10} | {'힙(MB)':>8} | {'문서당(B)':>9} | {'상위 5개 변환(ms)':>16}")
+    for pages in (int(p) for p in args.pages.split(",")):
+        rows = make_corpus(pages=pages, images_per_page=0)["embeddings"]
+        texts = [row["content"] for row in rows]  # 조회 결과 문자열은 두 방식이 공유하지 않도록 새로 만듦
+        metadatas = [row["metadata"] for row in rows]
+        del rows
+
+        documents_mb, documents = measure(lambda: [Document(page_content="".join(text), metadata=dict(metadata))
+                                                   for text, metadata in zip(texts, metadatas)])
+        store_mb, store = measure(lambda: DocumentStore.build(texts, metadatas))
+        size = len(texts)
+        for name, mb, get in (("documents", documents_mb, documents.__getitem__), ("store", store_mb, store.handle)):
+            print(f"{size:>8} | {name:<10} | {mb:>8.1f} | {mb * 1048576 / size:>9.0f} | {top_k_ms(get, size, args.lookups):>16.4f}", flush=True)
+        del documents, store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# 엔드포인트 부하 벤치마크 (외부 서비스 없이 실행)
+# benchmarks/fakes.py의 가짜 Supabase / Cohere / OpenAI로 app을 그대로 띄우고,
+# 코퍼스 크기와 동시 요청 수를 바꿔 가며 엔드포인트별 처리량과 p50/p95/p99 지연 시간을 측정한다.
+# 코퍼스 크기마다 별도 프로세스에서 실행하므로 모듈 전역 상태(인덱스, 캐시)가 섞이지 않는다.
+#
+# 실행: python benchmarks/bench_endpoints.py [--pages 60,600] [--concurrency 1,4,16] [--requests 32]
+#                                           [--endpoints chat,chat_stream,search,perform_search,hybrid_retriever]
+#                                           [--latency-scale 1.0] [--with-caches]
+#  - --latency-scale 0: 모의 네트워크 지연 없이 CPU 비용만 측정
+#  - --with-caches: 검색 결과/답변 캐시를 켠 상태로 측정 (기본은 끄고 파이프라인 자체를 측정)
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ["chat", "chat_stream", "search", "perform_search", "hybrid_retriever"]
+
+
+def percentile_row(samples, wall):
+    ms = np.asarray(samples) * 1000
+    return {
+        "throughput": len(samples) / wall if wall else 0.0,
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+    }
+
+
+async def run_endpoint(A, client, endpoint, query):
+    """요청 하나 실행 (성공 여부 반환)"""
+    if endpoint == "chat":
+        response = await client.post("/chat", json={"message": query})
+        return response.status_code == 200
+    if endpoint == "chat_stream":
+        response = await client.post("/chat/stream", json={"message": query})
+        return response.status_code == 200 and "event: done" in response.text
+    if endpoint == "search":
+        response = await client.post("/search", json={"query": query})
+        return response.status_code == 200
+    if endpoint == "perform_search":
+        _, debug_info = await A.run_blocking(A.perform_search, query)
+        return "error" not in debug_info
+    if endpoint == "hybrid_retriever":
+        docs = await A.run_blocking(A.hybrid_retriever.invoke, query)
+        return bool(docs)
+    raise ValueError(f"알 수 없는 엔드포인트: {endpoint}")
+
+
+async def measure(A, client, endpoint, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+
+    async def one(query):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await run_endpoint(A, client, endpoint, query)
+            except Exception:
+                ok = False
+            samples.append(time.perf_counter() - started)
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    row = percentile_row(samples, time.perf_counter() - started)
+    row["errors"] = errors
+    return row
+
+
+async def child_main(args):
+    sys.path.insert(0, ROOT)
+    from benchmarks import fakes
+
+    scale = args.latency_scale
+    fakes.install(pages=args.pages, latency={key: value * scale for key, value in fakes.LATENCY.items()})
+    import httpx
+    import app as A  # noqa: E402 - 가짜 구현 설치 후 임포트
+    import galaxy_chatbot as G  # noqa: E402
+
+    logging.getLogger().setLevel(logging.WARNING)  # 요청별 메모리/HTTP 로그 생략
+
+    await A.preload_indexes()
+    transport = httpx.ASGITransport(app=A.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for endpoint in args.endpoints.split(","):
+            await run_endpoint(A, client, endpoint, "배터리 충전 방법 준비")  # 워밍업
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                queries = fakes.make_queries(args.requests, seed=concurrency * 100 + len(endpoint))
+                row = await measure(A, client, endpoint, queries, concurrency)
+                row.update({"docs": len(G.bm25_index), "endpoint": endpoint, "concurrency": concurrency, "calls": dict(fakes.CALLS)})
+                print(json.dumps(row, ensure_ascii=False), flush=True)
+    A.bm25_refresher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="60,600", help="매뉴얼 페이지 수 목록 (페이지당 텍스트 3개, 이미지 2개)")
+    parser.add_argument("--concurrency", default="1,4,16", help="동시 요청 수 목록")
+    parser.add_argument("--requests", type=int, default=32, help="측정 구간별 요청 수")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="모의 네트워크 지연 배수 (0이면 지연 없음)")
+    parser.add_argument("--with-caches", action="store_true", help="검색 결과/답변 캐시 사용")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.pages = int(args.pages)
+        asyncio.run(child_main(args))
+        return
+
+    print(f"{'문서 수':>8} | {'엔드포인트':<16} | {'동시성':>6} | {'처리량(req/s)':>13} | {'p50(ms)':>8} | {'p95(ms)':>8} | {'p99(ms)':>8} | {'오류':>4}")
+    for pages in args.pages.split(","):
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            env = dict(os.environ, BM25_SNAPSHOT_DIR=snapshot_dir, PYTHONPATH=ROOT)
+            if not args.with_caches:
+                env.update(RETRIEVAL_CACHE_SIZE="0", ANSWER_CACHE_SIZE="0")
+            command = [sys.executable, os.path.abspath(__file__), "--child", "--pages", pages, "--concurrency", args.concurrency,
+                       "--requests", str(args.requests), "--endpoints", args.endpoints, "--latency-scale", str(args.latency_scale)]
+            process = subprocess.run(command, env=env, cwd=snapshot_dir, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(process.stderr[-2000:], file=sys.stderr)
+                sys.exit(process.returncode)
+            for line in process.stdout.splitlines():
+                if not line.startswith("{"):
+                    continue
+                row = json.loads(line)
+                print(f"{row['docs']:>8} | {row['endpoint']:<16} | {row['concurrency']:>6} | {row['throughput']:>13.1f} | "
+                      f"{row['p50']:>8.1f} | {row['p95']:>8.1f} | {row['p99']:>8.1f} | {row['errors']:>4}")
+
+
+if __name__ == "__main__":
+    main()
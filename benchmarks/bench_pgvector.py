@@ -0,0 +1,141 @@
+# pgvector 인덱스 벤치마크 (Supabase Postgres에 직접 연결)
+# 현재 설정인 ivfflat(lists=100)과 HNSW 인덱스의 재현율(recall@k)과 질의 지연 시간을 검색 범위(probes / ef_search)별로 비교한다.
+# text_embeddings(또는 --synthetic 합성 벡터)를 임시 테이블 두 개로 복사해 각각 인덱스를 만들므로 운영 테이블은 바뀌지 않는다.
+# 정답은 인덱스를 만들기 전 전체 스캔(정확한 거리 정렬) 결과다.
+#
+# 실행: DATABASE_URL=postgresql://... python benchmarks/bench_pgvector.py [--queries 100] [--k 5]
+#                                           [--probes 1,5,10,20] [--ef-search 40,100,200] [--synthetic 50000]
+# psycopg(3) 또는 psycopg2가 필요하다 (pip install psycopg[binary]).
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+try:
+    import psycopg as pg
+except ImportError:  # psycopg2만 설치된 환경
+    try:
+        import psycopg2 as pg
+    except ImportError:
+        pg = None
+
+
+def vector_text(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"  # pgvector 텍스트 형식
+
+
+def parse_vector(value) -> np.ndarray:
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def create_tables(cur, args, rng):
+    """임시 테이블 bench_ivfflat / bench_hnsw 생성 후 질의 벡터 반환"""
+    for name in ("bench_ivfflat", "bench_hnsw"):
+        if args.synthetic:
+            cur.execute(f"CREATE TEMP TABLE {name} (id int PRIMARY KEY, embedding vector({args.dim}))")
+        else:
+            cur.execute(f"CREATE TEMP TABLE {name} AS SELECT id, embedding FROM {args.table} WHERE embedding IS NOT NULL")
+
+    if args.synthetic:  # 주제별로 모여 있는 합성 벡터
+        centers = rng.standard_normal((max(8, args.synthetic // 500), args.dim)).astype(np.float32)
+        for start in range(0, args.synthetic, 1000):
+            count = min(1000, args.synthetic - start)
+            vectors = centers[rng.integers(len(centers), size=count)] + 0.8 * rng.standard_normal((count, args.dim)).astype(np.float32)
+            rows = [(start + i, vector_text(vector / np.linalg.norm(vector))) for i, vector in enumerate(vectors)]
+            for name in ("bench_ivfflat", "bench_hnsw"):
+                cur.executemany(f"INSERT INTO {name} (id, embedding) VALUES (%s, %s::vector)", rows)
+
+    # 질의: 저장된 벡터에 잡음을 더한 벡터 (실제 질문처럼 문서와 가깝지만 같지는 않음)
+    cur.execute("SELECT embedding::text FROM bench_ivfflat ORDER BY random() LIMIT %s", (args.queries,))
+    queries = []
+    for (value,) in cur.fetchall():
+        vector = parse_vector(value)
+        vector = vector + args.noise * rng.standard_normal(vector.shape).astype(np.float32) / np.sqrt(vector.shape[0])
+        queries.append(vector_text(vector / np.linalg.norm(vector)))
+    for name in ("bench_ivfflat", "bench_hnsw"):
+        cur.execute(f"ANALYZE {name}")
+    return queries
+
+
+def run_queries(cur, table, queries, k):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        cur.execute(f"SELECT id FROM {table} ORDER BY embedding <=> %s::vector LIMIT %s", (query, k))
+        rows = cur.fetchall()
+        latencies.append(time.perf_counter() - started)
+        results.append({row[0] for row in rows})
+    ms = np.asarray(latencies) * 1000
+    return results, float(np.percentile(ms, 50)), float(np.percentile(ms, 95))
+
+
+def report(label, param, build_ms, results, truth, p50, p95):
+    recall = np.mean([len(found & expected) / max(1, len(expected)) for found, expected in zip(results, truth)])
+    build = f"{build_ms:.0f}" if build_ms is not None else ""
+    print(f"{label:<22} | {param:<14} | {build:>9} | {p50:>8.2f} | {p95:>8.2f} | {recall:>9.3f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", ""), help="Postgres 연결 문자열 (기본: DATABASE_URL)")
+    parser.add_argument("--table", default="text_embeddings", help="복사할 임베딩 테이블")
+    parser.add_argument("--synthetic", type=int, default=0, help="테이블 대신 사용할 합성 벡터 수 (0이면 테이블 복사)")
+    parser.add_argument("--dim", type=int, default=1536, help="합성 벡터 차원")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.5, help="질의 벡터에 더할 잡음 크기")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--lists", type=int, default=100, help="ivfflat lists (현재 스키마: 100)")
+    parser.add_argument("--probes", default="1,5,10,20", help="ivfflat.probes 목록")
+    parser.add_argument("--m", type=int, default=16, help="HNSW m")
+    parser.add_argument("--ef-construction", type=int, default=64, help="HNSW ef_construction")
+    parser.add_argument("--ef-search", default="40,100,200", help="hnsw.ef_search 목록")
+    args = parser.parse_args()
+
+    if pg is None:
+        raise SystemExit("psycopg 또는 psycopg2가 필요합니다: pip install 'psycopg[binary]'")
+    if not args.dsn:
+        raise SystemExit("--dsn 또는 DATABASE_URL을 지정하세요 (Supabase 프로젝트 설정 > Database > Connection string)")
+
+    rng = np.random.default_rng(0)
+    conn = pg.connect(args.dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SET maintenance_work_mem = '512MB'")  # HNSW 생성 시간 단축
+
+    queries = create_tables(cur, args, rng)
+    cur.execute("SELECT count(*) FROM bench_ivfflat")
+    rows = cur.fetchone()[0]
+    print(f"행 수 {rows}, 질의 {len(queries)}개, k={args.k}")
+    print(f"{'인덱스':<22} | {'검색 범위':<14} | {'생성(ms)':>9} | {'p50(ms)':>8} | {'p95(ms)':>8} | {'recall@' + str(args.k):>9}")
+
+    truth, p50, p95 = run_queries(cur, "bench_ivfflat", queries, args.k)  # 인덱스 생성 전: 전체 스캔 = 정답
+    report("exact (seq scan)", "-", None, truth, truth, p50, p95)
+
+    cur.execute("SET enable_seqscan = off")  # 작은 테이블에서도 인덱스를 사용하도록 강제
+    started = time.perf_counter()
+    cur.execute(f"CREATE INDEX ON bench_ivfflat USING ivfflat (embedding vector_cosine_ops) WITH (lists = {args.lists})")
+    build_ms = (time.perf_counter() - started) * 1000
+    for probes in (int(p) for p in args.probes.split(",")):
+        cur.execute(f"SET ivfflat.probes = {probes}")
+        results, p50, p95 = run_queries(cur, "bench_ivfflat", queries, args.k)
+        report(f"ivfflat(lists={args.lists})", f"probes={probes}", build_ms, results, truth, p50, p95)
+        build_ms = None
+
+    started = time.perf_counter()
+    cur.execute(f"CREATE INDEX ON bench_hnsw USING hnsw (embedding vector_cosine_ops) WITH (m = {args.m}, ef_construction = {args.ef_construction})")
+    build_ms = (time.perf_counter() - started) * 1000
+    for ef_search in (int(e) for e in args.ef_search.split(",")):
+        cur.execute(f"SET hnsw.ef_search = {ef_search}")
+        results, p50, p95 = run_queries(cur, "bench_hnsw", queries, args.k)
+        report(f"hnsw(m={args.m},efc={args.ef_construction})", f"ef_search={ef_search}", build_ms, results, truth, p50, p95)
+        build_ms = None
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
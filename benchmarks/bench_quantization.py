@@ -0,0 +1,72 @@
+# 임베딩 양자화 벤치마크 (외부 서비스 불필요)
+# 같은 임베딩을 float32 / int8로 저장한 FlatIndex의 상주 메모리, 질의 지연 시간(p50),
+# float32 정확 검색 대비 recall@k를 재점수화(원본 float32 메모리 매핑) 유무별로 비교한다.
+# 기본은 매뉴얼 규모(텍스트 청크 수천 개)의 군집형 합성 임베딩이며,
+# --vectors로 text_embeddings를 내보낸 .npy 파일(행 = 임베딩)을 주면 실제 매뉴얼 코퍼스로 측정한다.
+#
+# 실행: python benchmarks/bench_quantization.py [--rows 3000,30000] [--dim 1536] [--queries 200] [--vectors embeddings.npy]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_vector_index import make_vectors  # noqa: E402
+from quantization import QuantizedMatrix  # noqa: E402
+from vector_index import FlatIndex, normalize_rows  # noqa: E402
+
+CONFIGS = [("float32", 0), ("int8", 0), ("int8", 4)]  # (저장 형식, 재점수화 배수)
+
+
+def measure(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = index.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        results.append({row for row, _ in hits})
+    return results, float(np.percentile(np.asarray(latencies) * 1000, 50))
+
+
+def corpora(args):
+    if args.vectors:  # 실제 임베딩: 코퍼스 일부를 질의로 사용 (질의와 같은 행은 결과에서 자기 자신이 됨)
+        vectors = normalize_rows(np.load(args.vectors))
+        rng = np.random.default_rng(0)
+        picked = rng.choice(vectors.shape[0], min(args.queries, vectors.shape[0]), replace=False)
+        queries = normalize_rows(vectors[picked] + 0.05 * rng.standard_normal((len(picked), vectors.shape[1])).astype(np.float32))
+        yield vectors, queries
+        return
+    for rows in (int(r) for r in args.rows.split(",")):
+        matrix = make_vectors(rows + args.queries, args.dim, max(8, rows // 500))
+        yield matrix[:rows], matrix[rows:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="3000,30000", help="합성 임베딩 수 목록")
+    parser.add_argument("--dim", type=int, default=1536, help="임베딩 차원")
+    parser.add_argument("--queries", type=int, default=200, help="질의 수")
+    parser.add_argument("--vectors", default=None, help="실제 임베딩 .npy 파일 (행 = 임베딩)")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'행 수':>7} | {'형식':<8} | {'재점수화':>8} | {'메모리(MB)':>10} | {'절감':>6} | {'p50(ms)':>8} | {'recall@' + str(args.k):>9}")
+    with tempfile.TemporaryDirectory() as exact_dir:
+        for matrix, queries in corpora(args):
+            exact, _ = measure(FlatIndex(matrix), queries, args.k)
+            baseline = matrix.nbytes
+            for dtype, rescore in CONFIGS:
+                index = FlatIndex(QuantizedMatrix(matrix, dtype, rescore=rescore, exact_dir=exact_dir))
+                results, p50 = measure(index, queries, args.k)
+                recall = np.mean([len(r & e) / max(1, len(e)) for r, e in zip(results, exact)])
+                resident = index.matrix.nbytes
+                print(f"{matrix.shape[0]:>7} | {dtype:<8} | {('x' + str(rescore)) if rescore else '-':>8} | "
+                      f"{resident / 1048576:>10.1f} | {1 - resident / baseline:>6.0%} | {p50:>8.3f} | {recall:>9.4f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
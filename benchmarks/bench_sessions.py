@@ -0,0 +1,73 @@
+# 대화 세션 벤치마크 (외부 서비스 불필요)
+#  1) 대화가 길어질 때 /chat 요청 본문 크기와 프롬프트에 들어가는 이전 대화 문자 수를
+#     history 전송 방식(클라이언트가 전체 이력 전송, 최근 5개 대화의 답변 전체 사용)과 session_id 방식으로 비교
+#  2) 세션 저장소 백엔드(memory / sqlite)별 대화 1회(get + append)의 p50/p99 지연 시간
+#
+# 실행: python benchmarks/bench_sessions.py [--turns 1,10,50] [--answer-chars 1500] [--sessions 1000] [--ops 5000]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_store import SESSION_BACKENDS, create_session_store  # noqa: E402
+
+QUESTION = "갤럭시 S25에서 배터리 보호 기능은 어떻게 켜나요?"
+
+
+def history_chars(history):
+    return sum(len(turn["user"]) + len(turn["ai"]) for turn in history)
+
+
+def payloads(args):
+    answer = ("배터리 보호 기능은 설정 > 배터리 > 추가 배터리 설정에서 켤 수 있습니다. " * 100)[:args.answer_chars]
+    store = create_session_store("memory", max_turns=5, max_answer_chars=1000)
+    session_id = uuid.uuid4().hex
+    history = []
+    print(f"{'대화 수':>7} | {'history 본문(B)':>15} | {'session 본문(B)':>15} | {'history 이전 대화(자)':>20} | {'session 이전 대화(자)':>20}")
+    turns = sorted(int(t) for t in args.turns.split(","))
+    for turn in range(1, turns[-1] + 1):
+        if turn in turns:
+            legacy = len(json.dumps({"message": QUESTION, "history": history}, ensure_ascii=False).encode())
+            session = len(json.dumps({"message": QUESTION, "session_id": session_id}, ensure_ascii=False).encode())
+            print(f"{turn:>7} | {legacy:>15} | {session:>15} | {history_chars(history[-5:]):>20} | {history_chars(store.get(session_id)):>20}")
+        history.append({"user": QUESTION, "ai": answer})
+        store.append(session_id, QUESTION, answer)
+
+
+def latency(args):
+    print(f"\n{'백엔드':<8} | {'세션 수':>7} | {'p50(ms)':>8} | {'p99(ms)':>8}")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in SESSION_BACKENDS:
+            store = create_session_store(backend, sqlite_path=os.path.join(directory, "sessions.sqlite3"), max_turns=5)
+            session_ids = [uuid.uuid4().hex for _ in range(args.sessions)]
+            samples = []
+            for index in rng.integers(0, len(session_ids), size=args.ops):
+                started = time.perf_counter()
+                store.get(session_ids[index])
+                store.append(session_ids[index], QUESTION, "답변" * 200)
+                samples.append(time.perf_counter() - started)
+            ms = np.asarray(samples) * 1000
+            print(f"{backend:<8} | {len(store):>7} | {np.percentile(ms, 50):>8.3f} | {np.percentile(ms, 99):>8.3f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", default="1,10,50", help="측정할 대화 수 목록")
+    parser.add_argument("--answer-chars", type=int, default=1500, help="답변 길이 (자)")
+    parser.add_argument("--sessions", type=int, default=1000, help="지연 시간 측정 세션 수")
+    parser.add_argument("--ops", type=int, default=5000, help="지연 시간 측정 대화 수")
+    args = parser.parse_args()
+    payloads(args)
+    latency(args)
+
+
+if __name__ == "__main__":
+    main()
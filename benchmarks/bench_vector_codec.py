@@ -0,0 +1,74 @@
+# pgvector 임베딩 디코딩 마이크로 벤치마크
+# 기존 방식(공백 제거 + ast.literal_eval)과 vector_codec의 텍스트/바이너리 디코더를 비교한다.
+#
+# 실행: python benchmarks/bench_vector_codec.py [--dim 1536] [--count 200] [--repeat 5]
+
+import argparse
+import ast
+import base64
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_codec import decode_vector  # noqa: E402
+
+
+def legacy_decode(embedding_str):
+    """analyze_image_relevance의 기존 파싱 경로"""
+    embedding_str = embedding_str.replace(" ", "")
+    return ast.literal_eval(embedding_str)
+
+
+def make_payloads(dim, count, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # PostgREST가 돌려주는 pgvector 텍스트 형식과 vector_send() + base64 형식
+    text_payloads = ["[" + ",".join(repr(float(x)) for x in v) + "]" for v in vectors]
+    binary_payloads = [base64.b64encode(struct.pack(">HH", dim, 0) + v.astype(">f4").tobytes()).decode() for v in vectors]
+    return vectors, text_payloads, binary_payloads
+
+
+def bench(name, fn, payloads, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - started)
+    per_item_us = best / len(payloads) * 1e6
+    print(f"{name:<36} {per_item_us:10.1f} us/벡터")
+    return per_item_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pgvector 디코딩 마이크로 벤치마크")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors, text_payloads, binary_payloads = make_payloads(args.dim, args.count)
+
+    # 정확도 확인
+    assert np.allclose(np.asarray(legacy_decode(text_payloads[0]), dtype=np.float32), vectors[0])
+    assert np.allclose(decode_vector(text_payloads[0]), vectors[0])
+    assert np.array_equal(decode_vector(binary_payloads[0]), vectors[0])
+
+    print(f"차원 {args.dim}, 벡터 {args.count}개, 최선 {args.repeat}회 기준")
+    print(f"평균 전송 크기: 텍스트 {sum(map(len, text_payloads)) / args.count / 1024:.1f} KB, "
+          f"base64 바이너리 {sum(map(len, binary_payloads)) / args.count / 1024:.1f} KB")
+    legacy = bench("ast.literal_eval (기존)", legacy_decode, text_payloads, args.repeat)
+    legacy_np = bench("ast.literal_eval + np.asarray", lambda s: np.asarray(legacy_decode(s), dtype=np.float32), text_payloads, args.repeat)
+    text = bench("decode_vector (텍스트)", decode_vector, text_payloads, args.repeat)
+    binary = bench("decode_vector (base64 바이너리)", decode_vector, binary_payloads, args.repeat)
+    print(f"속도 향상: 텍스트 {legacy_np / text:.1f}x, 바이너리 {legacy_np / binary:.1f}x (numpy 배열 변환 기준)")
+
+
+if __name__ == "__main__":
+    main()
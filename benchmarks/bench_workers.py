@@ -0,0 +1,152 @@
+# 다중 워커 메모리 벤치마크 (외부 서비스 없이 실행, 리눅스 전용)
+# 같은 합성 코퍼스로 워커 N개를 띄워 프로세스 트리 전체의 메모리(PSS 합 = 실제 사용량)를 비교한다.
+#  - uvicorn: uvicorn --workers N (워커마다 앱을 새로 임포트해 인덱스를 각자 생성)
+#  - fork: serve.py (부모가 인덱스를 한 번 만들고 공유 메모리로 옮긴 뒤 fork)
+# 서버가 뜬 뒤 요청을 보내 워커들이 실제로 검색을 수행하게 한 다음 측정한다.
+#
+# 실행: python benchmarks/bench_workers.py [--pages 2000] [--workers 1,2,4] [--modes uvicorn,fork] [--requests 40]
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def __getattr__(name):
+    """uvicorn --workers 모드에서 워커가 "benchmarks.bench_workers:app"을 임포트할 때 가짜 구현 설치 후 앱 반환"""
+    if name != "app":
+        raise AttributeError(name)
+    install_fakes()
+    import app as application
+    return application.app
+
+
+def install_fakes():
+    sys.path.insert(0, ROOT)
+    from benchmarks import fakes
+
+    fakes.install(pages=int(os.environ["BENCH_PAGES"]), latency={key: 0.0 for key in fakes.LATENCY})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(root_pid: int):
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def memory_of(pid: int):
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def post(port: int, query: str) -> bool:
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/search", data=json.dumps({"query": query}).encode(),
+                                     headers={"content-type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def run(mode: str, workers: int, args) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, BENCH_PAGES=str(args.pages), WEB_WORKERS=str(workers), PORT=str(port), HOST="127.0.0.1",
+                   PYTHONPATH=ROOT, BM25_SNAPSHOT_DIR=os.path.join(workdir, "bm25"), VECTOR_BACKEND=args.vector_backend,
+                   RETRIEVAL_CACHE_SIZE="0", ANSWER_CACHE_SIZE="0")
+        if mode == "fork":
+            command = [sys.executable, os.path.abspath(__file__), "--child"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "benchmarks.bench_workers:app", "--host", "127.0.0.1",
+                       "--port", str(port), "--workers", str(workers)]
+        log_path = os.path.join(workdir, "server.log")
+        started = time.perf_counter()
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(command, env=env, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            deadline = time.time() + args.timeout
+            while time.time() < deadline:  # 모든 워커가 시작을 마칠 때까지 대기
+                with open(log_path) as f:
+                    if f.read().count("Application startup complete") >= workers:
+                        break
+                if process.poll() is not None:
+                    raise RuntimeError(open(log_path).read()[-2000:])
+                time.sleep(0.2)
+            ready_s = time.perf_counter() - started
+            ok = sum(post(port, f"배터리 충전 방법 {i}") for i in range(args.requests))
+            time.sleep(0.5)
+            pids = process_tree(process.pid)
+            memories = [memory_of(pid) for pid in pids]
+            return {"mode": mode, "workers": workers, "ready_s": ready_s, "ok": ok, "processes": len(pids),
+                    "rss_mb": sum(m.get("Rss", 0) for m in memories) / 1048576,
+                    "pss_mb": sum(m.get("Pss", 0) for m in memories) / 1048576}
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=20)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000, help="매뉴얼 페이지 수 (페이지당 텍스트 3개, 이미지 2개)")
+    parser.add_argument("--workers", default="1,2,4", help="워커 수 목록")
+    parser.add_argument("--modes", default="uvicorn,fork")
+    parser.add_argument("--vector-backend", default="flat", help="텍스트 벡터 검색 백엔드 (flat이면 임베딩 행렬도 공유 대상)")
+    parser.add_argument("--requests", type=int, default=40, help="측정 전 보낼 검색 요청 수")
+    parser.add_argument("--timeout", type=float, default=300, help="서버 시작 대기 시간 (초)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:  # serve.py를 가짜 구현으로 실행
+        install_fakes()
+        import serve
+        serve.main()
+        return
+
+    print(f"{'모드':<8} | {'워커':>4} | {'시작(s)':>7} | {'성공':>4} | {'프로세스':>6} | {'RSS 합(MB)':>10} | {'PSS 합(MB)':>10}")
+    for mode in args.modes.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            row = run(mode, workers, args)
+            print(f"{row['mode']:<8} | {row['workers']:>4} | {row['ready_s']:>7.1f} | {row['ok']:>4} | {row['processes']:>6} | "
+                  f"{row['rss_mb']:>10.1f} | {row['pss_mb']:>10.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# 벤치마크용 Supabase / Cohere / OpenAI 대체 구현
+# 유료 외부 서비스 없이 galaxy_chatbot / app을 그대로 임포트해 측정할 수 있도록
+# 결정적인(항상 같은 결과를 내는) 가짜 구현으로 바꿔 끼운다.
+#  - FakeEmbeddings: 단어 해시 기반 임베딩 (같은 텍스트 -> 같은 벡터, 단어가 겹치면 코사인 유사도가 높음)
+#  - FakeSupabase: 메모리 테이블 + match_text_embeddings / match_image_embeddings / *_batch / *_filtered /
+#                  get_image_embeddings_compact / get_text_embeddings_compact RPC 에뮬레이터
+#  - FakeChatModel: 정해진 답변을 토큰 단위로 스트리밍하는 LLM
+# 네트워크 지연은 time.sleep으로 흉내 내며(GIL 해제), 호출 수는 CALLS에 기록된다.
+#
+# 사용법 (galaxy_chatbot 임포트 전에 호출):
+#   from benchmarks import fakes
+#   fakes.install(pages=60)
+#   import app
+
+import base64
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DIM = 1536  # embed-v4.0 임베딩 차원
+CALLS: Counter = Counter()  # 외부 호출 수 (embed / rpc / table / llm)
+
+# 모의 네트워크 지연 (초) - install()에서 변경
+LATENCY = {"embed": 0.08, "rpc": 0.05, "table": 0.03, "llm_first_token": 0.3, "llm_token": 0.02}
+
+TOPICS = ["배터리 충전", "스크린샷 캡처", "빅스비 음성", "카메라 촬영", "와이파이 연결", "블루투스 페어링", "지문 인식", "화면 밝기",
+          "알림 설정", "삼성 계정", "홈 화면", "잠금 화면", "동영상 편집", "저장 공간", "보안 폴더", "키보드 언어"]
+ANSWER = "설정 메뉴에서 해당 기능을 켜거나 끌 수 있습니다. 자세한 방법은 매뉴얼을 참고하세요."
+
+
+def _sleep(kind: str) -> None:
+    delay = LATENCY.get(kind, 0.0)
+    if delay > 0:
+        time.sleep(delay)
+
+
+# 1. 임베딩
+def hash_embedding(text: str, dim: int = DIM) -> np.ndarray:
+    """단어마다 해시로 정한 차원에 +1/-1을 더한 정규화 벡터"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r"\w+", (text or "").lower()):
+        digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vector[digest % dim] += 1.0 if (digest >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FakeEmbeddings(Embeddings):
+    """CohereEmbeddings 대체 (embed(texts, input_type=...) 일괄 호출 지원)"""
+
+    def __init__(self, model: str = "fake", cohere_api_key: Optional[str] = None, **kwargs):
+        self.model = model
+
+    def embed(self, texts: List[str], *, input_type: Optional[str] = None) -> List[List[float]]:
+        CALLS["embed"] += 1
+        _sleep("embed")
+        return [hash_embedding(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text], input_type="search_query")[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts, input_type="search_document")
+
+
+# 2. 코퍼스
+def _vector_text(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"  # pgvector 텍스트 형식
+
+
+def make_corpus(pages: int = 60, chunks_per_page: int = 3, images_per_page: int = 2) -> Dict[str, List[Dict[str, Any]]]:
+    """매뉴얼 형태의 합성 테이블 (text_embeddings / embeddings / image_embeddings)"""
+    text_rows, doc_rows, image_rows = [], [], []
+    for page in range(1, pages + 1):
+        topic = TOPICS[page % len(TOPICS)]
+        for chunk in range(chunks_per_page):
+            row_id = len(text_rows) + 1
+            content = f"{topic} 방법 안내 {page}쪽 {chunk}번 설명입니다. 설정 메뉴에서 {topic} 기능을 사용하세요."
+            metadata = {"page": str(page), "category": f"p{page}", "section": topic}
+            text_rows.append({"id": row_id, "content": content, "metadata": metadata, "embedding": _vector_text(hash_embedding(content))})
+            doc_rows.append({"id": row_id, "content": content, "metadata": dict(metadata), "updated_at": "2025-01-01T00:00:00+00:00"})
+        for figure in range(images_per_page):
+            url = f"https://example.supabase.co/storage/v1/object/public/images/galaxy_s25_figure_p{page}_{figure}.jpg"
+            content = f"{topic} 그림 {page} {figure}"
+            image_rows.append({"id": len(image_rows) + 1, "content": content, "metadata": {"image_url": url, "page": str(page)},
+                               "page": page, "embedding": _vector_text(hash_embedding(content))})
+    return {"text_embeddings": text_rows, "embeddings": doc_rows, "image_embeddings": image_rows}
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """코퍼스 주제를 섞은 질문 목록 (임베딩 캐시 미스가 나도록 서로 다른 문장)"""
+    rng = np.random.default_rng(seed)
+    endings = ["방법 알려줘", "어떻게 해?", "설정은 어디서 해?", "안 될 때는?", "끄는 방법"]
+    return [f"{TOPICS[rng.integers(len(TOPICS))]} {endings[rng.integers(len(endings))]} {i}" for i in range(count)]
+
+
+# 3. Supabase
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _column(row: Dict[str, Any], column: str):
+    if "->>" in column:  # metadata->>page
+        outer, inner = column.split("->>")
+        value = (row.get(outer) or {}).get(inner)
+        return None if value is None else str(value)
+    return row.get(column)
+
+
+class FakeQuery:
+    """postgrest 테이블 쿼리 빌더 중 이 저장소에서 쓰는 부분"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.columns = "*"
+        self.count = None
+        self._limit = None
+        self._order = None
+        self._range = None
+
+    def select(self, columns: str = "*", count=None, **kwargs):
+        self.columns, self.count = columns, count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(_column(row, column)) == str(value))
+        return self
+
+    def neq(self, column, value):  # SQL과 같이 NULL 행은 제외
+        self.filters.append(lambda row: _column(row, column) is not None and str(_column(row, column)) != str(value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: _column(row, column) is not None and _column(row, column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: _column(row, column) is not None and _column(row, column) >= value)
+        return self
+
+    def in_(self, column, values):
+        values = {str(value) for value in values}
+        self.filters.append(lambda row: str(_column(row, column)) in values)
+        return self
+
+    def ilike(self, column, pattern):
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*") + "$", re.I)
+        self.filters.append(lambda row: _column(row, column) is not None and regex.match(str(_column(row, column))) is not None)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self) -> FakeResponse:
+        CALLS["table"] += 1
+        _sleep("table")
+        rows = [row for row in self.db.tables.get(self.table, []) if all(f(row) for f in self.filters)]
+        if self._order:
+            rows.sort(key=lambda row: row.get(self._order[0]), reverse=self._order[1])
+        total = len(rows)
+        if self._range:
+            rows = rows[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self.columns != "*":
+            columns = [column.strip() for column in self.columns.split(",")]
+            rows = [{column: row.get(column) for column in columns if column in row} for row in rows]
+        return FakeResponse([dict(row) for row in rows], total if self.count else None)
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict[str, Any]):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        CALLS["rpc"] += 1
+        _sleep("rpc")
+        if self.name == "get_image_embeddings_compact":
+            return FakeResponse(self.db.compact_rows(self.params["row_offset"], self.params["row_limit"]))
+        if self.name == "get_text_embeddings_compact":
+            return FakeResponse(self.db.compact_rows(self.params["row_offset"], self.params["row_limit"], "text_embeddings"))
+        table = "text_embeddings" if "text" in self.name else "image_embeddings"
+        threshold = self.params.get("match_threshold", 0.5)
+        count = self.params.get("match_count", 10)
+        if self.name.endswith("_batch"):  # 쿼리 순번(query_index)을 붙여 한 번에 반환
+            rows = []
+            for index, embedding in enumerate(self.params["query_embeddings"]):
+                rows.extend(dict(row, query_index=index) for row in self.db.match(table, embedding, threshold, count, self.params))
+            return FakeResponse(rows)
+        return FakeResponse(self.db.match(table, self.params["query_embedding"], threshold, count, self.params))
+
+
+class FakeSupabase:
+    """supabase.Client 대체 (테이블 조회와 벡터 검색 RPC)"""
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]]):
+        self.tables = tables
+        self._matrices: Dict[str, np.ndarray] = {}  # 테이블별 임베딩 행렬 (벡터 검색용)
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def _matrix(self, table: str) -> np.ndarray:
+        with self._lock:
+            if table not in self._matrices:
+                rows = self.tables[table]
+                self._matrices[table] = np.array([json.loads(row["embedding"]) for row in rows], dtype=np.float32).reshape(len(rows), -1)
+            return self._matrices[table]
+
+    def match(self, table: str, embedding, threshold: float, count: int, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        query = np.asarray(json.loads(embedding) if isinstance(embedding, str) else embedding, dtype=np.float32)
+        matrix = self._matrix(table)
+        if not len(matrix):
+            return []
+        similarities = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-9)
+        rows = []
+        page = params.get("filter_page")
+        for index in np.argsort(-similarities):
+            if similarities[index] <= threshold or len(rows) >= count:
+                break
+            row = self.tables[table][index]
+            if page and str(row["metadata"].get("page")) != str(page):
+                continue
+            if any(row["metadata"].get(key) != value for key, value in (params.get("filter") or {}).items()):
+                continue
+            result = {key: value for key, value in row.items() if key != "embedding"}
+            result["similarity"] = float(similarities[index])
+            rows.append(result)
+        return rows
+
+    def compact_rows(self, offset: int, limit: int, table: str = "image_embeddings") -> List[Dict[str, Any]]:
+        """get_*_embeddings_compact: 임베딩을 pgvector 바이너리(base64)로 반환"""
+        columns = ("id", "content", "metadata") if table == "text_embeddings" else ("id", "metadata")
+        rows = []
+        for row in self.tables[table][offset:offset + limit]:
+            vector = np.array(json.loads(row["embedding"]), dtype=">f4")
+            payload = struct.pack(">HH", len(vector), 0) + vector.tobytes()
+            compact = {key: value for key, value in row.items() if key in columns}
+            compact["embedding"] = base64.b64encode(payload).decode()
+            rows.append(compact)
+        return rows
+
+
+# 4. LLM
+class FakeChatModel(BaseChatModel):
+    """ChatOpenAI 대체 - 첫 토큰 지연 후 정해진 답변을 토큰 단위로 반환"""
+
+    model_name: str = "fake"
+    temperature: float = 0.0
+    api_key: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _tokens(self) -> List[str]:
+        return [word + " " for word in ANSWER.split(" ")]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        CALLS["llm"] += 1
+        _sleep("llm_first_token")
+        time.sleep(LATENCY["llm_token"] * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens()).strip()))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        CALLS["llm"] += 1
+        _sleep("llm_first_token")
+        for token in self._tokens():
+            _sleep("llm_token")
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+# 5. 설치
+def install(pages: int = 60, latency: Optional[Dict[str, float]] = None) -> FakeSupabase:
+    """supabase.create_client / CohereEmbeddings / ChatOpenAI를 가짜 구현으로 교체 (galaxy_chatbot 임포트 전에 호출)"""
+    import langchain_cohere
+    import langchain_openai
+    import supabase
+
+    if latency:
+        LATENCY.update(latency)
+    db = FakeSupabase(make_corpus(pages))
+    supabase.create_client = lambda *args, **kwargs: db
+    langchain_cohere.CohereEmbeddings = FakeEmbeddings
+    langchain_openai.ChatOpenAI = FakeChatModel
+    return db
@@ -0,0 +1,636 @@
+# BM25 인덱스 디스크 스냅샷 / 증분 갱신 모듈
+# embeddings 테이블 전체 조회와 BM25 인덱스 생성을 서버 시작마다 반복하지 않도록
+# BM25 통계(역색인)와 문서 저장소를 디스크에 저장하고, 시작 시 메모리 매핑으로 불러온다.
+# 서버 실행 중에는 워터마크(updated_at 또는 id) 이후 변경된 행만 읽어 인덱스를 증분 갱신한다.
+#
+# 스냅샷 디렉터리 구조:
+#   <root>/CURRENT                  현재 스냅샷 이름 (원자적으로 교체)
+#   <root>/snapshot-<시각>/manifest.json   버전, 생성 시각, 문서/단어 수, 워터마크
+#   <root>/snapshot-<시각>/documents.json  문서 행 ID
+#   <root>/snapshot-<시각>/vocab.json      단어 목록 (단어 번호 순)
+#   <root>/snapshot-<시각>/*.npy           역색인 배열 (indptr, doc_ids, tfs, doc_len)
+#   <root>/snapshot-<시각>/content.bin 등   문서 본문 버퍼 / 메타데이터 코드 (document_store.py 참고)
+#
+# 빌드: python bm25_index.py build [--dir .cache/bm25]
+
+import json  # 문서/매니페스트 저장
+import logging  # 로딩 로그
+import os  # 파일 경로
+import shutil  # 오래된 스냅샷 정리
+import threading  # 백그라운드 갱신
+import time  # 생성 시각 기록
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple  # 타입 힌트
+
+import numpy as np  # 역색인 배열
+
+from document_store import DocumentStore  # 본문 버퍼 / 메타데이터 코드 배열 문서 저장소
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 3  # 스냅샷 형식 버전 (형식이 바뀌면 올려서 기존 스냅샷을 무효화)
+_ARRAYS = ("indptr", "doc_ids", "tfs", "doc_len")  # 저장할 역색인 배열 이름
+
+
+def default_tokenizer(text: str) -> List[str]:
+    """BM25Retriever 기본 전처리와 동일한 공백 분리"""
+    return text.split()
+
+
+def tokenizer_name(tokenizer: Callable[[str], List[str]]) -> str:
+    """스냅샷 호환성 확인에 사용하는 토크나이저 이름"""
+    return getattr(tokenizer, "name", None) or getattr(tokenizer, "__name__", "custom")
+
+
+def _snapshot_time(name: str) -> Optional[int]:
+    """스냅샷 디렉터리 이름(snapshot-{밀리초}-{pid})의 생성 시각 (형식이 다르면 None)"""
+    parts = name.split("-")
+    if len(parts) != 3 or parts[0] != "snapshot" or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def _term_frequencies(tokens: List[str]) -> Dict[str, int]:
+    frequencies: Dict[str, int] = {}
+    for token in tokens:
+        frequencies[token] = frequencies.get(token, 0) + 1
+    return frequencies
+
+
+class BM25Snapshot:
+    """BM25 통계(단어별 포스팅 목록)와 문서 저장소
+
+    역색인은 CSR 형식으로 저장한다. 단어 t의 포스팅은
+    doc_ids[indptr[t]:indptr[t+1]] (문서 번호), tfs[...] (단어 빈도)이다.
+    문서 본문과 메타데이터는 DocumentStore(본문 버퍼 + 메타데이터 코드 배열)에 보관한다.
+    """
+
+    def __init__(self, store: DocumentStore, vocab: List[str],
+                 indptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray,
+                 manifest: Optional[Dict[str, Any]] = None, row_ids: Optional[List[Any]] = None):
+        self.store = store  # 문서 본문 / 메타데이터 저장소
+        self.vocab = vocab  # 단어 목록
+        self.indptr = indptr  # 단어별 포스팅 시작 위치 (단어 수 + 1)
+        self.doc_ids = doc_ids  # 포스팅 문서 번호
+        self.tfs = tfs  # 포스팅 단어 빈도
+        self.doc_len = doc_len  # 문서별 토큰 수
+        self.manifest = manifest or {}  # 버전, 생성 시각, 워터마크 등
+        self.row_ids = row_ids if row_ids is not None else [None] * len(store)  # 원본 테이블 행 ID
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    # 1. 생성
+    @classmethod
+    def build(cls, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+              tokenizer: Callable[[str], List[str]] = default_tokenizer, row_ids: Optional[List[Any]] = None,
+              **manifest) -> "BM25Snapshot":
+        doc_freqs = [_term_frequencies(tokenizer(text)) for text in texts]
+        doc_len = [sum(frequencies.values()) for frequencies in doc_freqs]
+        manifest.setdefault("tokenizer", tokenizer_name(tokenizer))
+        store = DocumentStore.build(texts, metadatas if metadatas is not None else [None] * len(texts))
+        return cls.from_frequencies(store, doc_freqs, doc_len, row_ids=row_ids, **manifest)
+
+    @classmethod
+    def from_frequencies(cls, store: DocumentStore, doc_freqs: List[Dict[str, int]], doc_len: List[int],
+                         row_ids: Optional[List[Any]] = None, **manifest) -> "BM25Snapshot":
+        """문서별 단어 빈도로부터 CSR 역색인 생성 (토큰화 없이)"""
+        term_ids: Dict[str, int] = {}  # 단어 -> 단어 번호
+        postings: List[List[int]] = []  # 단어 번호별 [문서 번호, 빈도, 문서 번호, 빈도, ...]
+        for doc_id, frequencies in enumerate(doc_freqs):
+            for token, freq in frequencies.items():
+                term_id = term_ids.setdefault(token, len(term_ids))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].extend((doc_id, freq))
+
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) // 2 for p in postings])
+        flat = np.fromiter((x for p in postings for x in p), dtype=np.int32, count=int(indptr[-1]) * 2)
+        vocab = [None] * len(term_ids)
+        for token, term_id in term_ids.items():
+            vocab[term_id] = token
+
+        manifest.update({
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "doc_count": len(store),
+            "term_count": len(vocab),
+        })
+        manifest.setdefault("tokenizer", default_tokenizer.__name__)
+        return cls(store, vocab, indptr, flat[0::2].copy(), flat[1::2].copy(),
+                   np.asarray(doc_len, dtype=np.int32), manifest, row_ids=list(row_ids) if row_ids is not None else None)
+
+    # 2. 저장 / 로딩
+    def save(self, root: str) -> str:
+        """새 스냅샷 디렉터리에 저장한 뒤 CURRENT 포인터를 원자적으로 교체"""
+        os.makedirs(root, exist_ok=True)
+        name = f"snapshot-{int(time.time() * 1000)}-{os.getpid()}"
+        path = os.path.join(root, name)
+        os.makedirs(path)
+
+        for array_name in _ARRAYS:
+            np.save(os.path.join(path, f"{array_name}.npy"), getattr(self, array_name))
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        self.store.save(path)
+        with open(os.path.join(path, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump({"row_ids": self.row_ids}, f, ensure_ascii=False)
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+
+        previous = None  # 교체되는 스냅샷 (다른 프로세스가 아직 읽는 중일 수 있어 유예 사본으로 남김)
+        try:
+            with open(os.path.join(root, "CURRENT")) as f:
+                previous = f.read().strip()
+        except OSError:
+            pass
+        pointer_tmp = os.path.join(root, f"CURRENT.{os.getpid()}.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(name)
+        os.replace(pointer_tmp, os.path.join(root, "CURRENT"))  # 원자적 교체
+
+        # 교체되는 스냅샷보다 오래된 스냅샷만 정리 (자신보다 새로운 디렉터리는 다른 프로세스가 쓰는 중일 수 있어 건드리지 않음)
+        cutoff = _snapshot_time(previous) if previous else None
+        if cutoff is not None:
+            for entry in os.listdir(root):
+                created = _snapshot_time(entry)
+                if created is not None and created < cutoff and entry not in (name, previous):
+                    shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, root: str, mmap: bool = True) -> Optional["BM25Snapshot"]:
+        """CURRENT가 가리키는 스냅샷을 로딩 (없거나 버전이 다르면 None)"""
+        try:
+            with open(os.path.join(root, "CURRENT")) as f:
+                path = os.path.join(root, f.read().strip())
+            with open(os.path.join(path, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        mmap_mode = "r" if mmap else None  # 역색인 배열과 문서 본문은 메모리 매핑 (필요한 페이지만 읽음)
+        try:  # 파일이 지워졌거나 덜 쓰인 스냅샷이면 None을 돌려 호출한 쪽에서 다시 생성
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS}
+            with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+                vocab = json.load(f)
+            with open(os.path.join(path, "documents.json"), encoding="utf-8") as f:
+                documents = json.load(f)
+            store = DocumentStore.load(path, mmap=mmap)
+        except (OSError, ValueError) as e:
+            logger.warning(f"BM25 스냅샷을 읽을 수 없습니다: {path} ({str(e)})")
+            return None
+
+        snapshot = cls(store, vocab, manifest=manifest, row_ids=documents.get("row_ids"), **arrays)
+        if len(snapshot.indptr) != len(vocab) + 1 or len(snapshot.doc_len) != len(store):
+            logger.warning(f"BM25 스냅샷이 손상되었습니다: {path}")
+            return None
+        return snapshot
+
+    def is_stale(self, max_age: Optional[float] = None, doc_count: Optional[int] = None,
+                 watermark_column: Optional[str] = None, tokenizer: Optional[str] = None) -> bool:
+        """생성 후 max_age초가 지났거나, 원본 문서 수, 워터마크 컬럼, 토크나이저가 달라졌으면 오래된 스냅샷"""
+        if max_age is not None and time.time() - self.manifest.get("created_at", 0) > max_age:
+            return True
+        if doc_count is not None and doc_count != len(self):
+            return True
+        if self.manifest.get("watermark_column") != watermark_column:
+            return True
+        if tokenizer is not None and self.manifest.get("tokenizer") != tokenizer:
+            return True
+        return False
+
+    def doc_frequencies(self) -> List[Dict[str, int]]:
+        """CSR 역색인을 문서별 단어 빈도 사전으로 변환"""
+        doc_freqs: List[Dict[str, int]] = [{} for _ in range(len(self))]
+        doc_ids = self.doc_ids.tolist()
+        tfs = self.tfs.tolist()
+        indptr = self.indptr.tolist()
+        for term_id, token in enumerate(self.vocab):
+            start, end = indptr[term_id], indptr[term_id + 1]
+            for doc_id, tf in zip(doc_ids[start:end], tfs[start:end]):
+                doc_freqs[doc_id][token] = tf
+        return doc_freqs
+
+    # 3. BM25 검색기 변환
+    def to_index(self, tokenizer: Callable[[str], List[str]] = default_tokenizer) -> "BM25Index":
+        """스냅샷을 그대로 쓰는 인덱스 (문서별 단어 빈도 사전은 증분 갱신 때 처음 만듦)"""
+        return BM25Index(self.row_ids, self.store, doc_len=self.doc_len, tokenizer=tokenizer,
+                         watermark=self.manifest.get("watermark"),
+                         watermark_column=self.manifest.get("watermark_column"), snapshot=self)
+
+    def to_bm25okapi(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        """토큰화를 다시 하지 않고 저장된 통계로 rank_bm25.BM25Okapi 객체 복원"""
+        return self.to_index().to_bm25okapi(k1=k1, b=b, epsilon=epsilon)
+
+    def to_retriever(self, k: int = 5, **bm25_params):
+        """langchain BM25Retriever로 변환 (BM25Retriever.from_texts와 동일한 결과)"""
+        return self.to_index().to_retriever(k=k, **bm25_params)
+
+
+class BM25Index:
+    """행 단위로 갱신 가능한 BM25 통계와 문서 저장소
+
+    apply()는 기존 객체를 수정하지 않고 변경된 문서만 교체한 새 객체를 돌려준다 (copy-on-write).
+    바뀌지 않은 문서의 단어 빈도 사전은 이전 인덱스와 공유하므로
+    갱신 중에도 이전 인덱스로 실행 중인 검색은 영향을 받지 않고, 전체 재토큰화도 일어나지 않는다.
+    스냅샷에서 만든 인덱스는 단어 빈도 사전과 단어별 문서 빈도를 처음 필요할 때 CSR 배열에서 만든다.
+    """
+
+    def __init__(self, row_ids: List[Any], store: DocumentStore,
+                 doc_freqs: Optional[List[Dict[str, int]]] = None, doc_len: Optional[List[int]] = None,
+                 tokenizer: Callable[[str], List[str]] = default_tokenizer,
+                 watermark: Any = None, watermark_column: Optional[str] = None,
+                 nd: Optional[Dict[str, int]] = None, snapshot: Optional[BM25Snapshot] = None):
+        self.row_ids = row_ids  # 원본 테이블 행 ID
+        self.store = store  # 문서 본문 / 메타데이터 저장소
+        self._doc_freqs = doc_freqs  # 문서별 단어 빈도 (인덱스 간 공유되므로 수정 금지, None이면 스냅샷에서 생성)
+        self.doc_len = doc_len if doc_len is not None else [sum(f.values()) for f in doc_freqs]  # 문서별 토큰 수
+        self.tokenizer = tokenizer  # 토큰화 함수
+        self.watermark = watermark  # 마지막으로 반영한 워터마크 값
+        self.watermark_column = watermark_column  # 워터마크 컬럼 이름 (None이면 증분 갱신 불가)
+        self._nd = nd  # 단어별 문서 빈도 (None이면 지연 생성)
+        self._snapshot = snapshot  # CSR 역색인 (None이면 to_snapshot()에서 생성 후 재사용)
+        self._positions: Optional[Dict[Any, int]] = None  # 행 ID -> 문서 번호 (지연 생성)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def doc_freqs(self) -> List[Dict[str, int]]:
+        if self._doc_freqs is None:
+            self._doc_freqs = self._snapshot.doc_frequencies()
+        return self._doc_freqs
+
+    @property
+    def nd(self) -> Dict[str, int]:
+        if self._nd is None:
+            if self._doc_freqs is None and self._snapshot is not None:  # CSR 포스팅 길이가 곧 문서 빈도
+                self._nd = dict(zip(self._snapshot.vocab, np.diff(self._snapshot.indptr).tolist()))
+            else:
+                self._nd = self._document_frequencies(self.doc_freqs)
+        return self._nd
+
+    @property
+    def term_count(self) -> int:
+        return len(self._snapshot.vocab) if self._snapshot is not None else len(self.nd)
+
+    @property
+    def positions(self) -> Dict[Any, int]:
+        if self._positions is None:
+            self._positions = {row_id: i for i, row_id in enumerate(self.row_ids) if row_id is not None}
+        return self._positions
+
+    @staticmethod
+    def _document_frequencies(doc_freqs: List[Dict[str, int]]) -> Dict[str, int]:
+        nd: Dict[str, int] = {}
+        for frequencies in doc_freqs:
+            for token in frequencies:
+                nd[token] = nd.get(token, 0) + 1
+        return nd
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], tokenizer: Callable[[str], List[str]] = default_tokenizer,
+                  key_column: str = "id", watermark_column: Optional[str] = None) -> "BM25Index":
+        empty = cls([], DocumentStore.build([], []), [], [], tokenizer=tokenizer, watermark_column=watermark_column)
+        index, _ = empty.apply(rows, key_column=key_column)
+        return index if index is not None else empty
+
+    # 1. 증분 갱신
+    def apply(self, rows: Iterable[Dict[str, Any]], key_column: str = "id") -> Tuple[Optional["BM25Index"], Any]:
+        """변경된 행을 반영한 (새 인덱스, 새 워터마크) 반환 (바뀐 내용이 없으면 인덱스는 None)
+
+        행 ID가 같은 문서는 교체하고, 새 행은 추가하며, 내용이 비어 있는 행은 삭제로 처리한다.
+        바뀌지 않은 문서의 본문은 디코딩하지 않고 바이트 그대로 새 저장소에 옮긴다.
+        공개된 인덱스는 수정하지 않으므로, 내용 변화 없이 워터마크만 전진한 경우는 호출한 쪽에서 기록한다.
+        """
+        store = self.store
+        row_ids = list(self.row_ids)
+        doc_freqs, doc_len = None, None  # 처음 변경될 때 복사
+        nd = None
+        positions = None
+        overrides: Dict[int, Any] = {}  # 문서 번호 -> 새 (내용, 메타데이터)
+        removed = set()  # 삭제된 문서 번호
+        watermark = self.watermark
+        changed = 0
+
+        for row in rows:
+            if self.watermark_column and row.get(self.watermark_column) is not None:
+                value = row[self.watermark_column]
+                watermark = value if watermark is None else max(watermark, value)
+
+            row_id = row.get(key_column)
+            content = row.get("content") or ""
+            metadata = row.get("metadata") or {}
+            position = (positions or self.positions).get(row_id) if row_id is not None else None
+            if position in removed:
+                position = None
+            if position is not None:
+                current = overrides.get(position)
+                if current is None:
+                    current = (store.text(position), store.metadata(position))
+                if current[0] == content and current[1] == metadata:
+                    continue  # 워터마크 경계에서 다시 읽은 동일한 행
+            elif not content:
+                continue  # 인덱스에 없는 빈 행 (삭제할 문서도 없음)
+
+            if nd is None:
+                nd = dict(self.nd)
+                doc_freqs, doc_len = list(self.doc_freqs), list(self.doc_len)
+                positions = dict(self.positions)
+            if position is not None:  # 기존 문서의 통계 제거
+                for token in doc_freqs[position]:
+                    nd[token] -= 1
+                    if nd[token] <= 0:
+                        del nd[token]
+            changed += 1
+
+            if not content:  # 내용이 비면 삭제
+                if position is not None:
+                    removed.add(position)
+                continue
+
+            frequencies = _term_frequencies(self.tokenizer(content))
+            for token in frequencies:
+                nd[token] = nd.get(token, 0) + 1
+            if position is None:  # 새 문서 추가
+                position = len(doc_freqs)
+                row_ids.append(row_id)
+                doc_freqs.append(frequencies)
+                doc_len.append(sum(frequencies.values()))
+                if row_id is not None:
+                    positions[row_id] = position
+            else:  # 기존 문서 교체 (새 사전으로 바꾸고 이전 객체는 수정하지 않음)
+                doc_freqs[position] = frequencies
+                doc_len[position] = sum(frequencies.values())
+            overrides[position] = (content, metadata)
+
+        if not changed:
+            return None, watermark  # 내용 변화 없이 워터마크만 전진
+
+        keep = [i for i in range(len(doc_freqs)) if i not in removed]
+        if removed:  # 삭제된 문서 제거 (문서 번호 재배열)
+            row_ids, doc_freqs, doc_len = [row_ids[i] for i in keep], [doc_freqs[i] for i in keep], [doc_len[i] for i in keep]
+        records = (overrides[i] if i in overrides else (store.text_bytes(i), store.metadata(i)) for i in keep)
+
+        return BM25Index(row_ids, DocumentStore.from_records(records), doc_freqs, doc_len, tokenizer=self.tokenizer,
+                         watermark=watermark, watermark_column=self.watermark_column, nd=nd), watermark
+
+    # 2. 변환
+    def documents(self) -> List[Any]:
+        """langchain Document 목록 (rank_bm25 엔진용 - 희소 행렬 엔진은 저장소 핸들을 사용)"""
+        return [self.store.document(i) for i in range(len(self))]
+
+    def to_bm25okapi(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        """토큰화를 다시 하지 않고 현재 통계로 rank_bm25.BM25Okapi 객체 생성"""
+        from rank_bm25 import BM25Okapi
+
+        vectorizer = BM25Okapi.__new__(BM25Okapi)
+        vectorizer.k1, vectorizer.b, vectorizer.epsilon = k1, b, epsilon
+        vectorizer.tokenizer = None
+        vectorizer.corpus_size = len(self)
+        vectorizer.doc_len = list(self.doc_len)
+        vectorizer.doc_freqs = self.doc_freqs
+        vectorizer.avgdl = (sum(vectorizer.doc_len) / vectorizer.corpus_size) if vectorizer.corpus_size else 0
+        vectorizer.idf = {}
+        vectorizer.average_idf = 0.0
+        if self.nd:  # 빈 코퍼스에서는 평균 IDF 계산을 건너뜀
+            vectorizer._calc_idf(self.nd)
+        return vectorizer
+
+    def to_retriever(self, k: int = 5, **bm25_params):
+        """langchain BM25Retriever로 변환 (BM25Retriever.from_texts와 동일한 결과)"""
+        from langchain_community.retrievers import BM25Retriever
+
+        return BM25Retriever(vectorizer=self.to_bm25okapi(**bm25_params), docs=self.documents(), k=k,
+                             preprocess_func=self.tokenizer)
+
+    def to_snapshot(self) -> BM25Snapshot:
+        """CSR 역색인 스냅샷 (한 번 만들면 검색기 생성과 디스크 저장에서 재사용)"""
+        if self._snapshot is None:
+            self._snapshot = BM25Snapshot.from_frequencies(self.store, self.doc_freqs, self.doc_len, row_ids=self.row_ids,
+                                                           watermark=self.watermark, watermark_column=self.watermark_column,
+                                                           tokenizer=tokenizer_name(self.tokenizer))
+        self._snapshot.manifest["watermark"] = self.watermark  # 내용 변화 없이 전진한 워터마크 반영
+        return self._snapshot
+
+
+# 4. Supabase 연동
+def fetch_corpus(client, table_name: str = "embeddings", page_size: int = 1000, columns: str = "content,metadata",
+                 watermark_column: Optional[str] = None, since: Any = None) -> Iterable[Dict[str, Any]]:
+    """문서 테이블을 페이지 단위로 조회 (since가 있으면 워터마크 이후 변경된 행만)"""
+    start = 0
+    while True:
+        query = client.table(table_name).select(columns)
+        if watermark_column:
+            if since is not None:
+                query = query.gte(watermark_column, since)  # 같은 시각에 커밋된 행을 놓치지 않도록 경계 포함
+            query = query.order(watermark_column)
+        rows = query.range(start, start + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+
+def count_corpus(client, table_name: str = "embeddings") -> Optional[int]:
+    """인덱스에 들어가는 문서 수 - content가 비어 있지 않은 행 수 (조회 실패 시 None)
+
+    build_index_from_supabase가 content가 없는 행을 건너뛰므로 같은 행만 세어야 스냅샷/인덱스 문서 수와 비교할 수 있다.
+    (content <> ''는 NULL 행도 제외)
+    """
+    try:
+        resp = client.table(table_name).select("content", count="exact").neq("content", "").limit(1).execute()
+        return resp.count
+    except Exception as e:
+        logger.warning(f"문서 수 조회 실패: {str(e)}")
+        return None
+
+
+def _corpus_columns(key_column: str, watermark_column: Optional[str]) -> str:
+    columns = [key_column, "content", "metadata"]
+    if watermark_column and watermark_column not in columns:
+        columns.append(watermark_column)
+    return ",".join(columns)
+
+
+def build_index_from_supabase(client, table_name: str = "embeddings", key_column: str = "id",
+                              watermark_column: Optional[str] = None,
+                              tokenizer: Callable[[str], List[str]] = default_tokenizer) -> BM25Index:
+    rows = fetch_corpus(client, table_name, columns=_corpus_columns(key_column, watermark_column), watermark_column=watermark_column)
+    return BM25Index.from_rows((row for row in rows if row.get("content")), tokenizer=tokenizer,
+                               key_column=key_column, watermark_column=watermark_column)
+
+
+def build_snapshot_from_supabase(client, table_name: str = "embeddings", key_column: str = "id",
+                                 watermark_column: Optional[str] = None,
+                                 tokenizer: Callable[[str], List[str]] = default_tokenizer) -> BM25Snapshot:
+    return build_index_from_supabase(client, table_name, key_column, watermark_column, tokenizer).to_snapshot()
+
+
+def load_or_build_index(client, root: str, table_name: str = "embeddings", max_age: Optional[float] = None,
+                        check_count: bool = True, key_column: str = "id", watermark_column: Optional[str] = None,
+                        tokenizer: Callable[[str], List[str]] = default_tokenizer) -> BM25Index:
+    """스냅샷이 있고 최신이면 로딩하고, 없거나 오래되었으면 다시 만들어 저장"""
+    started = time.perf_counter()
+    snapshot = BM25Snapshot.load(root)
+    if snapshot is not None:
+        doc_count = count_corpus(client, table_name) if check_count else None
+        if not snapshot.is_stale(max_age=max_age, doc_count=doc_count, watermark_column=watermark_column,
+                                 tokenizer=tokenizer_name(tokenizer)):
+            index = snapshot.to_index(tokenizer)
+            logger.info(f"BM25 스냅샷 로딩: 문서 {len(index)}개, {(time.perf_counter() - started) * 1000:.1f} ms")
+            return index
+        logger.info("BM25 스냅샷이 오래되어 다시 생성합니다.")
+
+    index = build_index_from_supabase(client, table_name, key_column, watermark_column, tokenizer)
+    try:
+        index.to_snapshot().save(root)
+    except OSError as e:  # 읽기 전용 파일 시스템 등 - 메모리 인덱스만 사용
+        logger.warning(f"BM25 스냅샷 저장 실패: {str(e)}")
+    logger.info(f"BM25 인덱스 생성: 문서 {len(index)}개, {(time.perf_counter() - started) * 1000:.1f} ms")
+    return index
+
+
+# 5. 백그라운드 증분 갱신
+class BM25Refresher:
+    """워터마크 이후 변경된 행만 주기적으로 읽어 BM25 검색기를 새로 만들고 원자적으로 교체
+
+    on_swap(retriever)은 새 검색기를 하이브리드 검색기에 반영하는 콜백이고,
+    retriever_factory(index)는 인덱스로 검색기를 만드는 함수이며 (기본값: BM25Retriever),
+    add_listener()로 등록한 함수는 교체 직후 호출된다 (결과 캐시 무효화 등).
+    """
+
+    def __init__(self, client, index: BM25Index, on_swap: Callable[[Any], None], table_name: str = "embeddings",
+                 key_column: str = "id", interval: float = 300.0, page_size: int = 1000, k: int = 5,
+                 snapshot_dir: Optional[str] = None, check_count: bool = True,
+                 retriever_factory: Optional[Callable[[BM25Index], Any]] = None):
+        self.client = client  # Supabase 클라이언트
+        self.index = index  # 현재 인덱스
+        self.on_swap = on_swap  # 검색기 교체 콜백
+        self.table_name = table_name  # 문서 테이블 이름
+        self.key_column = key_column  # 행 ID 컬럼
+        self.interval = interval  # 갱신 주기 (초, 0이면 비활성화)
+        self.page_size = page_size  # 한 번에 읽어올 행 수
+        self.k = k  # 검색 결과 수
+        self.snapshot_dir = snapshot_dir  # 갱신 후 스냅샷 저장 위치 (None이면 저장 안 함)
+        self.check_count = check_count  # 삭제된 행 감지를 위한 문서 수 비교 여부
+        self.retriever_factory = retriever_factory or (lambda index: index.to_retriever(k=self.k))  # 검색기 생성 함수
+        self.last_refresh: Optional[float] = None  # 마지막 갱신 시각
+        self.watermark = index.watermark  # 다음 갱신의 조회 기준 (내용 변화 없이 전진한 워터마크 포함)
+        self.refresh_count = 0  # 인덱스 교체 횟수
+        self._listeners: List[Callable[[], None]] = []  # 교체 후 호출할 함수
+        self._lock = threading.Lock()  # 갱신 중복 실행 방지
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def _swap(self, index: BM25Index) -> None:
+        retriever = self.retriever_factory(index)  # 새 검색기를 완성한 뒤 한 번에 교체
+        self.index = index
+        self.watermark = index.watermark
+        self.on_swap(retriever)
+        self.refresh_count += 1
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"BM25 갱신 리스너 오류: {str(e)}")
+        if self.snapshot_dir:
+            try:
+                index.to_snapshot().save(self.snapshot_dir)
+            except OSError as e:
+                logger.warning(f"BM25 스냅샷 저장 실패: {str(e)}")
+
+    def refresh_once(self) -> int:
+        """변경된 행을 반영하고 읽은 행 수를 반환 (워터마크 컬럼이 없으면 전체 재생성)"""
+        with self._lock:
+            started = time.perf_counter()
+            current = self.index
+            watermark_column = current.watermark_column
+            rows: List[Dict[str, Any]] = []
+            updated = None
+            if watermark_column:
+                rows = list(fetch_corpus(self.client, self.table_name, self.page_size,
+                                         columns=_corpus_columns(self.key_column, watermark_column),
+                                         watermark_column=watermark_column, since=self.watermark))
+                updated, watermark = current.apply(rows, key_column=self.key_column)
+                self.watermark = watermark  # 공개된 인덱스 대신 갱신기에 기록 (잠금 안)
+
+            # 워터마크로는 삭제를 알 수 없으므로 문서 수(content가 있는 행)가 다르면 전체 재생성
+            remote_count = count_corpus(self.client, self.table_name) if self.check_count and watermark_column else None
+            local_count = len(updated if updated is not None else current)
+            if not watermark_column or (remote_count is not None and remote_count != local_count):
+                updated = build_index_from_supabase(self.client, self.table_name, self.key_column, watermark_column, current.tokenizer)
+                rows = updated.row_ids
+                logger.info(f"BM25 인덱스 전체 재생성: 문서 {len(updated)}개")
+
+            self.last_refresh = time.time()
+            if updated is None:
+                return 0
+            self._swap(updated)
+            logger.info(f"BM25 인덱스 갱신: 읽은 행 {len(rows)}개, 문서 {len(updated)}개, {(time.perf_counter() - started) * 1000:.1f} ms")
+            return len(rows)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_once()
+            except Exception as e:  # 갱신 실패 시 기존 인덱스 유지
+                logger.error(f"BM25 인덱스 갱신 오류: {str(e)}")
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="bm25-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "documents": len(index),
+            "terms": index.term_count,
+            "watermark": self.watermark,
+            "watermark_column": index.watermark_column,
+            "interval": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "refresh_count": self.refresh_count,
+            "last_refresh": self.last_refresh,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(description="BM25 인덱스 스냅샷 관리")
+    parser.add_argument("command", choices=["build", "info"], help="build: Supabase에서 새로 생성, info: 현재 스냅샷 정보")
+    parser.add_argument("--dir", default=os.environ.get("BM25_SNAPSHOT_DIR", ".cache/bm25"), help="스냅샷 디렉터리")
+    parser.add_argument("--table", default="embeddings", help="문서 테이블 이름")
+    parser.add_argument("--watermark-column", default=os.environ.get("BM25_WATERMARK_COLUMN") or None, help="증분 갱신 워터마크 컬럼")
+    parser.add_argument("--tokenizer", choices=["korean", "whitespace"], default=os.environ.get("BM25_TOKENIZER", "korean"), help="토크나이저 (서버 설정과 같아야 함)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        load_dotenv()
+        supabase_client = create_client(os.environ.get("SUPABASE_URL", ""), os.environ.get("SUPABASE_SERVICE_ROLE_KEY", ""))
+        if args.tokenizer == "korean":
+            from sparse_bm25 import korean_tokenizer as cli_tokenizer
+        else:
+            cli_tokenizer = default_tokenizer
+        built = build_snapshot_from_supabase(supabase_client, args.table, watermark_column=args.watermark_column, tokenizer=cli_tokenizer)
+        print(f"스냅샷 저장: {built.save(args.dir)} (문서 {len(built)}개, 단어 {len(built.vocab)}개)")
+    else:
+        current = BM25Snapshot.load(args.dir)
+        print(json.dumps(current.manifest, indent=2) if current else "스냅샷이 없습니다.")
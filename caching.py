@@ -0,0 +1,266 @@
+# 프로세스 전역 캐시 모듈 (임베딩 캐시, 의미 기반 답변 캐시 등)
+
+import threading  # 캐시 동시 접근 보호
+import time  # TTL 계산용
+import unicodedata  # 텍스트 정규화
+from collections import OrderedDict  # LRU 순서 유지
+from typing import Any, Dict, Hashable, List, Optional, Tuple  # 타입 힌트
+
+import numpy as np  # 임베딩 저장 (float32)
+from langchain_core.embeddings import Embeddings  # 임베딩 인터페이스
+
+from tracing import external_call  # 요청 구간의 외부 호출 수 기록
+
+
+# 1. LRU + TTL 캐시
+class LRUTTLCache:
+    """크기(LRU)와 유효 시간(TTL)으로 제한되는 스레드 안전 캐시"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600.0):
+        self.max_size = max(1, int(max_size))  # 최대 항목 수
+        self.ttl = ttl if ttl and ttl > 0 else None  # 유효 시간 (초, None이면 무제한)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # 키 -> (만료 시각, 값)
+        self._lock = threading.Lock()  # 동시 접근 보호
+        self.hits = 0  # 캐시 적중 수
+        self.misses = 0  # 캐시 미스 수
+        self.evictions = 0  # 크기/만료로 제거된 항목 수
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:  # 캐시에 없으면 미스
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():  # 만료된 항목은 제거 후 미스 처리
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)  # 최근 사용 항목으로 이동
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0  # 만료 시각 계산
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:  # 최대 크기 초과 시 가장 오래된 항목 제거
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 2. 임베딩 캐시 키 정규화
+def normalize_text(text: str) -> str:
+    """유니코드(NFC)와 공백을 정규화하여 같은 질문이 같은 키를 갖도록 함"""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+# 3. 임베딩 캐시 래퍼
+class CachedEmbeddings(Embeddings):
+    """임베딩 모델을 감싸 동일 텍스트에 대한 API 호출을 재사용하는 래퍼
+
+    키는 (모델 이름, 입력 종류, 정규화된 텍스트)이며, 쿼리 임베딩과 문서 임베딩은
+    Cohere에서 input_type이 다르므로 서로 다른 키로 저장한다.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: Optional[str] = None, max_size: int = 1024, ttl: Optional[float] = 3600.0):
+        self.embeddings = embeddings  # 실제 임베딩 모델
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__  # 모델 이름
+        self.cache = LRUTTLCache(max_size=max_size, ttl=ttl)  # 임베딩 저장소 (float32 배열)
+
+    def __getattr__(self, name):  # 그 밖의 속성은 원래 모델로 위임
+        embeddings = self.__dict__.get("embeddings")
+        if embeddings is None:
+            raise AttributeError(name)
+        return getattr(embeddings, name)
+
+    def _key(self, text: str, input_type: str) -> Tuple[str, str, str]:
+        return (self.model_name, input_type, normalize_text(text))
+
+    def _embed_many(self, texts: List[str], input_type: str, embed_fn) -> List[List[float]]:
+        keys = [self._key(text, input_type) for text in texts]  # 캐시 키 생성
+        vectors: Dict[Tuple[str, str, str], np.ndarray] = {}
+        missing: List[str] = []  # 임베딩이 필요한 텍스트 (중복 제거)
+        missing_keys = set()
+
+        for text, key in zip(texts, keys):
+            if key in vectors or key in missing_keys:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing.append(text)
+                missing_keys.add(key)
+
+        if missing:  # 미스된 텍스트만 한 번에 임베딩
+            external_call()
+            for text, vector in zip(missing, embed_fn(missing)):
+                array = np.asarray(vector, dtype=np.float32)
+                key = self._key(text, input_type)
+                self.cache.set(key, array)
+                vectors[key] = array
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, "search_query")
+        cached = self.cache.get(key)
+        if cached is not None:  # 캐시 적중
+            return cached.tolist()
+
+        external_call()
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)  # 실제 API 호출
+        self.cache.set(key, vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_many(texts, "search_document", self.embeddings.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """여러 검색 쿼리를 한 번의 API 호출로 임베딩 (embed_query와 같은 캐시 키 사용)"""
+        def embed_fn(missing: List[str]) -> List[List[float]]:
+            if hasattr(self.embeddings, "embed"):  # Cohere: input_type을 지정한 일괄 임베딩
+                return self.embeddings.embed(missing, input_type="search_query")
+            return [self.embeddings.embed_query(text) for text in missing]
+
+        return self._embed_many(texts, "search_query", embed_fn)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats["model"] = self.model_name
+        return stats
+
+
+# 4. 의미 기반 답변 캐시
+class SemanticCache:
+    """질문 임베딩의 코사인 유사도로 이전 답변을 재사용하는 캐시
+
+    임베딩은 정규화하여 (최대 크기, 차원) 행렬의 슬롯에 보관하고, 조회 시 행렬-벡터 곱 한 번으로
+    가장 비슷한 질문을 찾는다. 크기(LRU)와 유효 시간(TTL)으로 제한되며, clear()로 전체 무효화한다.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = 21600.0, threshold: float = 0.95):
+        self.max_size = max(1, int(max_size))  # 최대 항목 수
+        self.ttl = ttl if ttl and ttl > 0 else None  # 유효 시간 (초, None이면 무제한)
+        self.threshold = threshold  # 재사용 최소 코사인 유사도
+        self._matrix: Optional[np.ndarray] = None  # (최대 크기, 차원) 정규화된 질문 임베딩
+        self._entries: "OrderedDict[int, Tuple[float, str, Any]]" = OrderedDict()  # 슬롯 -> (만료 시각, 질문, 값), LRU 순서
+        self._exact: Dict[str, int] = {}  # 정규화된 질문 -> 슬롯 (완전히 같은 질문은 행렬 연산 없이 조회)
+        self._lock = threading.Lock()  # 동시 접근 보호
+        self.hits = 0  # 캐시 적중 수
+        self.misses = 0  # 캐시 미스 수
+        self.evictions = 0  # 크기/만료로 제거된 항목 수
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _remove(self, slot: int) -> None:
+        _, text, _ = self._entries.pop(slot)
+        if self._exact.get(text) == slot:
+            del self._exact[text]
+
+    def get(self, text: str, embedding) -> Optional[Tuple[Any, float, str]]:
+        """가장 비슷한 이전 질문의 (값, 유사도, 질문) 반환 (임계치 미만이면 None)"""
+        query = self._normalize(embedding)
+        key = normalize_text(text)
+        with self._lock:
+            now = time.monotonic()
+            for slot in [slot for slot, (expires_at, _, _) in self._entries.items() if expires_at and expires_at < now]:
+                self._remove(slot)  # 만료 항목 정리
+                self.evictions += 1
+
+            best_slot, best_similarity = self._exact.get(key), 1.0
+            if best_slot is None and query is not None and self._entries and self._matrix is not None \
+                    and query.shape[0] == self._matrix.shape[1]:
+                slots = np.fromiter(self._entries.keys(), dtype=np.intp, count=len(self._entries))
+                similarities = self._matrix[slots] @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    best_slot, best_similarity = int(slots[best]), float(similarities[best])
+
+            if best_slot is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_slot)  # 최근 사용 항목으로 이동
+            self.hits += 1
+            _, matched_text, value = self._entries[best_slot]
+            return value, best_similarity, matched_text
+
+    def set(self, text: str, embedding, value: Any) -> None:
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        key = normalize_text(text)
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:  # 최초 저장 또는 차원 변경
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._exact.clear()
+
+            slot = self._exact.get(key)
+            if slot is None:
+                if len(self._entries) >= self.max_size:  # 가장 오래 사용하지 않은 항목의 슬롯 재사용
+                    slot = next(iter(self._entries))
+                    self._remove(slot)
+                    self.evictions += 1
+                else:
+                    used = set(self._entries)
+                    slot = next(i for i in range(self.max_size) if i not in used)
+            self._matrix[slot] = vector
+            self._entries[slot] = (expires_at, key, value)
+            self._entries.move_to_end(slot)
+            self._exact[key] = slot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -40,15 +40,20 @@ USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
   )
   LANGUAGE sql STABLE
   AS $$
+    -- 벡터 인덱스는 ORDER BY 거리 + LIMIT에서만 사용되므로, 가까운 행을 먼저 가져온 뒤 임계치를 적용
     SELECT
-      id,
-      content,
-      metadata,
-      1 - (embedding <=> query_embedding) AS similarity
-    FROM text_embeddings
-    WHERE 1 - (embedding <=> query_embedding) > match_threshold
-    ORDER BY embedding <=> query_embedding
-    LIMIT match_count;
+      n.id,
+      n.content,
+      n.metadata,
+      1 - n.distance AS similarity
+    FROM (
+      SELECT id, content, metadata, embedding <=> query_embedding AS distance
+      FROM text_embeddings
+      ORDER BY embedding <=> query_embedding
+      LIMIT match_count
+    ) n
+    WHERE 1 - n.distance > match_threshold
+    ORDER BY n.distance;
   $$; 
 
   -- 이미지 임베딩 검색 함수
@@ -67,15 +72,19 @@ USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
   LANGUAGE sql STABLE
   AS $$
     SELECT
-      id,
-      content,
-      metadata,
-      image_url,
-      1 - (embedding <=> query_embedding) AS similarity
-    FROM image_embeddings
-    WHERE 1 - (embedding <=> query_embedding) > match_threshold
-    ORDER BY embedding <=> query_embedding
-    LIMIT match_count;
+      n.id,
+      n.content,
+      n.metadata,
+      n.image_url,
+      1 - n.distance AS similarity
+    FROM (
+      SELECT id, content, metadata, image_url, embedding <=> query_embedding AS distance
+      FROM image_embeddings
+      ORDER BY embedding <=> query_embedding
+      LIMIT match_count
+    ) n
+    WHERE 1 - n.distance > match_threshold
+    ORDER BY n.distance;
   $$; 
 
   -- 이미지 메타데이터 필터링을 포함한 검색 함수
@@ -412,4 +421,278 @@ CREATE POLICY "Allow public update access for image_embeddings"
 CREATE POLICY "Allow public delete access for image_embeddings" 
   ON image_embeddings 
   FOR DELETE 
-  USING (true); 
\ No newline at end of file
+  USING (true); 
+
+-- 이미지 임베딩 일괄 조회 함수 (압축 전송 형식)
+-- 임베딩을 pgvector 바이너리(vector_send) + base64 문자열로 돌려주어
+-- 텍스트 형식("[0.1,0.2,...]") 대비 전송량과 클라이언트 파싱 비용을 줄인다.
+CREATE OR REPLACE FUNCTION get_image_embeddings_compact(
+  row_offset int DEFAULT 0,
+  row_limit int DEFAULT 500
+)
+RETURNS TABLE (
+  id uuid,
+  metadata jsonb,
+  embedding text
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT
+    ie.id,
+    ie.metadata,
+    translate(encode(vector_send(ie.embedding), 'base64'), E'\n', '') AS embedding
+  FROM image_embeddings ie
+  ORDER BY ie.id
+  OFFSET row_offset
+  LIMIT row_limit;
+$$;
+
+-- BM25 증분 갱신용 워터마크 컬럼 (BM25_WATERMARK_COLUMN=updated_at)
+-- 행이 추가/수정될 때마다 updated_at이 갱신되어, 서버는 마지막 동기화 이후 변경된 행만 읽어 온다.
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS embeddings_touch_updated_at ON embeddings;
+CREATE TRIGGER embeddings_touch_updated_at
+  BEFORE UPDATE ON embeddings
+  FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS on_embeddings_updated_at ON embeddings (updated_at);
+
+
+-- 이미지 페이지 컬럼 (페이지별 이미지 조회용)
+-- metadata->>'page'를 정수로 저장하는 생성 컬럼과 btree 인덱스.
+-- JSON 조회나 image_url ILIKE 검색(전체 스캔) 대신 인덱스 조회 한 번으로 페이지의 이미지를 찾는다.
+ALTER TABLE image_embeddings
+  ADD COLUMN IF NOT EXISTS page int GENERATED ALWAYS AS (
+    CASE WHEN metadata->>'page' ~ '^[0-9]+$' THEN (metadata->>'page')::int END
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS on_image_embeddings_page ON image_embeddings (page);
+
+-- 텍스트 임베딩 일괄 조회 함수 (압축 전송 형식, VECTOR_BACKEND=flat/ivf/auto의 인프로세스 인덱스 로딩용)
+-- match_text_embeddings와 같이 본문이 있는 행만 돌려준다.
+CREATE OR REPLACE FUNCTION get_text_embeddings_compact(
+  row_offset int DEFAULT 0,
+  row_limit int DEFAULT 1000
+)
+RETURNS TABLE (
+  id uuid,
+  content text,
+  metadata jsonb,
+  embedding text
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT
+    te.id,
+    te.content,
+    te.metadata,
+    translate(encode(vector_send(te.embedding), 'base64'), E'\n', '') AS embedding
+  FROM text_embeddings te
+  WHERE te.content IS NOT NULL AND te.content != ''
+  ORDER BY te.id
+  OFFSET row_offset
+  LIMIT row_limit;
+$$;
+
+-- 벡터 인덱스 검색 범위 설정 (이 트랜잭션에 한해 적용, NULL이나 0이면 DB 기본값 유지)
+--  - hnsw.ef_search: HNSW 검색 후보 수 (기본 40, 클수록 재현율이 높고 느림, match_count 이상이어야 함)
+--  - ivfflat.probes: ivfflat 검색 목록 수 (기본 1, lists=100이면 10 안팎 권장)
+CREATE OR REPLACE FUNCTION set_vector_search_params(
+  ef_search int DEFAULT NULL,
+  probes int DEFAULT NULL
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF ef_search IS NOT NULL AND ef_search > 0 THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+  IF probes IS NOT NULL AND probes > 0 THEN
+    PERFORM set_config('ivfflat.probes', probes::text, true);
+  END IF;
+END;
+$$;
+
+-- 텍스트 페이지 컬럼 (페이지 필터 검색용, 이미지 테이블의 page 컬럼과 같은 형식)
+ALTER TABLE text_embeddings
+  ADD COLUMN IF NOT EXISTS page int GENERATED ALWAYS AS (
+    CASE WHEN metadata->>'page' ~ '^[0-9]+$' THEN (metadata->>'page')::int END
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS on_text_embeddings_page ON text_embeddings (page);
+
+-- 페이지/메타데이터 필터를 SQL 안에서 적용하는 텍스트 검색 함수
+-- 기존 방식(상위 k개를 받은 뒤 클라이언트에서 페이지로 거름)은 해당 페이지 결과가 상위 k개에 없으면 빈 결과가 된다.
+--  - filter_page가 있으면: 페이지 btree 인덱스로 후보를 좁힌 뒤 정확한 거리로 정렬 (페이지당 행이 적으므로 빠르고 결과 누락 없음)
+--  - 없으면: 벡터 인덱스(ORDER BY 거리 + LIMIT)로 가까운 행을 가져온 뒤 임계치 적용, filter(jsonb 포함 조건)도 함께 적용
+CREATE OR REPLACE FUNCTION match_text_embeddings_filtered(
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 10,
+  filter_page int DEFAULT NULL,
+  filter jsonb DEFAULT '{}',
+  ef_search int DEFAULT NULL,
+  probes int DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  IF filter_page IS NOT NULL THEN
+    RETURN QUERY
+    WITH candidates AS MATERIALIZED (
+      SELECT te.id, te.content, te.metadata, te.embedding <=> query_embedding AS distance
+      FROM text_embeddings te
+      WHERE te.page = filter_page
+        AND te.metadata @> filter
+    )
+    SELECT c.id, c.content, c.metadata, 1 - c.distance AS similarity
+    FROM candidates c
+    WHERE 1 - c.distance > match_threshold
+    ORDER BY c.distance
+    LIMIT match_count;
+    RETURN;
+  END IF;
+
+  PERFORM set_vector_search_params(ef_search, probes);
+  RETURN QUERY
+  SELECT n.id, n.content, n.metadata, 1 - n.distance AS similarity
+  FROM (
+    SELECT te.id, te.content, te.metadata, te.embedding <=> query_embedding AS distance
+    FROM text_embeddings te
+    WHERE te.metadata @> filter
+    ORDER BY te.embedding <=> query_embedding
+    LIMIT match_count
+  ) n
+  WHERE 1 - n.distance > match_threshold
+  ORDER BY n.distance;
+END;
+$$;
+
+-- 페이지/메타데이터 필터를 SQL 안에서 적용하는 이미지 검색 함수 (match_text_embeddings_filtered와 같은 방식)
+CREATE OR REPLACE FUNCTION match_image_embeddings_filtered(
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 10,
+  filter_page int DEFAULT NULL,
+  filter jsonb DEFAULT '{}',
+  ef_search int DEFAULT NULL,
+  probes int DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  content text,
+  metadata jsonb,
+  image_url text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  IF filter_page IS NOT NULL THEN
+    RETURN QUERY
+    WITH candidates AS MATERIALIZED (
+      SELECT ie.id, ie.content, ie.metadata, ie.image_url, ie.embedding <=> query_embedding AS distance
+      FROM image_embeddings ie
+      WHERE ie.page = filter_page
+        AND ie.metadata @> filter
+    )
+    SELECT c.id, c.content, c.metadata, c.image_url, 1 - c.distance AS similarity
+    FROM candidates c
+    WHERE 1 - c.distance > match_threshold
+    ORDER BY c.distance
+    LIMIT match_count;
+    RETURN;
+  END IF;
+
+  PERFORM set_vector_search_params(ef_search, probes);
+  RETURN QUERY
+  SELECT n.id, n.content, n.metadata, n.image_url, 1 - n.distance AS similarity
+  FROM (
+    SELECT ie.id, ie.content, ie.metadata, ie.image_url, ie.embedding <=> query_embedding AS distance
+    FROM image_embeddings ie
+    WHERE ie.metadata @> filter
+    ORDER BY ie.embedding <=> query_embedding
+    LIMIT match_count
+  ) n
+  WHERE 1 - n.distance > match_threshold
+  ORDER BY n.distance;
+END;
+$$;
+
+-- 텍스트 임베딩 일괄 검색 함수 (/search/batch, /chat/batch)
+-- 여러 쿼리 임베딩을 한 번의 RPC로 검색하고 쿼리 순번(0부터)별 결과를 반환한다.
+-- ef_search / probes를 주면 이 호출(트랜잭션)에 한해 벡터 인덱스 검색 범위를 바꾼다.
+DROP FUNCTION IF EXISTS match_text_embeddings_batch(text[], float, int);
+CREATE OR REPLACE FUNCTION match_text_embeddings_batch(
+  query_embeddings text[],
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 10,
+  ef_search int DEFAULT NULL,
+  probes int DEFAULT NULL
+)
+RETURNS TABLE (
+  query_index int,
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  PERFORM set_vector_search_params(ef_search, probes);
+  RETURN QUERY
+  SELECT
+    (q.ord - 1)::int AS query_index,
+    m.id,
+    m.content,
+    m.metadata,
+    1 - m.distance AS similarity
+  FROM unnest(query_embeddings) WITH ORDINALITY AS q(embedding_text, ord)
+  CROSS JOIN LATERAL (
+    SELECT
+      te.id,
+      te.content,
+      te.metadata,
+      te.embedding <=> q.embedding_text::vector(1536) AS distance
+    FROM text_embeddings te
+    ORDER BY te.embedding <=> q.embedding_text::vector(1536)
+    LIMIT match_count
+  ) m
+  WHERE 1 - m.distance > match_threshold
+  ORDER BY query_index, m.distance;
+END;
+$$;
+
+-- (선택) ivfflat 대신 HNSW 인덱스 사용 (pgvector 0.5.0 이상)
+-- HNSW는 학습 단계가 없어 데이터가 늘어도 재현율이 유지되고, 같은 재현율에서 ivfflat보다 지연 시간이 짧다 (대신 생성 시간과 메모리가 더 듦).
+-- 전환 전 benchmarks/bench_pgvector.py로 두 인덱스의 재현율/지연 시간을 비교할 수 있다.
+-- 검색 범위는 VECTOR_EF_SEARCH(hnsw.ef_search) / VECTOR_PROBES(ivfflat.probes) 환경 변수로 조정한다.
+--
+-- DROP INDEX IF EXISTS on_text_embeddings_embedding;
+-- CREATE INDEX on_text_embeddings_embedding ON text_embeddings
+--   USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+-- DROP INDEX IF EXISTS on_image_embeddings_embedding;
+-- CREATE INDEX on_image_embeddings_embedding ON image_embeddings
+--   USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,226 @@
+# 배열 기반 문서 저장소 모듈
+# 코퍼스 전체를 langchain Document 목록(문서마다 본문 문자열 + 메타데이터 사전 + Document 객체)으로 들고 있는 대신
+#  - 본문: UTF-8로 이어 붙인 하나의 버퍼 + 문서별 시작 위치(offsets) 배열
+#  - 메타데이터: page / category / section은 값 목록에 한 번만 저장하고 문서별 코드(int32) 배열로 참조,
+#    나머지 키와 키 순서는 같은 모양끼리 공유하는 "형태(shape)" 목록에 한 번만 저장
+# 으로 보관한다. 검색기는 문서 번호만 담은 DocHandle(__slots__)을 돌려주고,
+# 본문 디코딩과 메타데이터 사전 생성은 하이브리드 검색기가 최종 상위 k개를 Document로 만들 때만 일어난다.
+#
+# 저장 형식 (BM25 스냅샷 디렉터리 안):
+#   content.bin         본문 UTF-8 버퍼 (로딩 시 메모리 매핑)
+#   offsets.npy         문서별 본문 시작 위치 (문서 수 + 1)
+#   meta-<열>.npy       메타데이터 열 코드 (-1이면 키 없음), meta-shapes.npy 문서별 형태 번호
+#   metadata.json       열별 값 목록, 형태 목록
+
+import json  # 메타데이터 값 / 형태 저장
+import os  # 파일 경로
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union  # 타입 힌트
+
+import numpy as np  # 위치 / 코드 배열
+
+COLUMNS = ("page", "category", "section")  # 코드 배열로 보관하는 메타데이터 키
+
+
+def _intern_key(value: Any) -> Any:
+    """값 목록에서 같은 값을 찾기 위한 키 (1과 "1"은 다른 값)"""
+    try:
+        hash(value)
+        return (type(value).__name__, value)
+    except TypeError:  # 목록/사전 값
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class DocHandle:
+    """저장소의 문서 하나를 가리키는 가벼운 참조 (Document와 같은 page_content / metadata 속성 제공)
+
+    extra는 검색기가 덧붙이는 값(유사도 등)이며, metadata는 처음 접근할 때 새 사전으로 만들어 캐시한다.
+    """
+    __slots__ = ("store", "row", "extra", "_metadata")
+
+    def __init__(self, store: "DocumentStore", row: int, extra: Optional[Dict[str, Any]] = None):
+        self.store = store  # 문서 저장소
+        self.row = row  # 문서 번호
+        self.extra = extra  # 메타데이터에 덧붙일 값
+        self._metadata: Optional[Dict[str, Any]] = None  # 생성한 메타데이터 사전
+
+    @property
+    def page_content(self) -> str:
+        return self.store.text(self.row)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            metadata = self.store.metadata(self.row)
+            if self.extra:
+                metadata.update(self.extra)
+            self._metadata = metadata
+        return self._metadata
+
+    def to_document(self):
+        """langchain Document로 변환 (메타데이터는 사본)"""
+        from langchain.schema import Document
+
+        return Document(page_content=self.page_content, metadata=dict(self.metadata))
+
+    def __repr__(self) -> str:
+        return f"DocHandle(row={self.row}, metadata={self.metadata!r})"
+
+
+def as_document(doc):
+    """DocHandle 또는 Document를 메타데이터 사본을 가진 새 Document로 변환"""
+    if isinstance(doc, DocHandle):
+        return doc.to_document()
+    from langchain.schema import Document
+
+    return Document(page_content=doc.page_content, metadata=dict(doc.metadata or {}))
+
+
+class DocumentStore:
+    """본문 버퍼 + 위치 배열 + 메타데이터 코드 배열로 된 읽기 전용 문서 저장소"""
+    __slots__ = ("buffer", "offsets", "codes", "values", "shape_codes", "shapes", "_view")
+
+    def __init__(self, buffer: Union[bytes, np.ndarray], offsets: np.ndarray, codes: Dict[str, np.ndarray],
+                 values: Dict[str, List[Any]], shape_codes: np.ndarray, shapes: List[Tuple[Tuple[str, ...], Dict[str, Any]]]):
+        self.buffer = buffer  # 본문 UTF-8 버퍼 (bytes 또는 메모리 매핑된 uint8 배열)
+        self.offsets = offsets  # 문서별 본문 시작 위치 (int64, 문서 수 + 1)
+        self.codes = codes  # 열 이름 -> 문서별 값 코드 (int32, -1이면 키 없음)
+        self.values = values  # 열 이름 -> 값 목록
+        self.shape_codes = shape_codes  # 문서별 형태 번호 (int32)
+        self.shapes = shapes  # 형태 목록: (키 순서, 열이 아닌 키의 값)
+        self._view = memoryview(buffer)
+
+    # 1. 생성
+    @classmethod
+    def build(cls, texts: Iterable[Union[str, bytes]], metadatas: Iterable[Optional[Dict[str, Any]]]) -> "DocumentStore":
+        """본문(문자열 또는 UTF-8 바이트)과 메타데이터로 저장소 생성"""
+        return cls.from_records(zip(texts, metadatas))
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[Union[str, bytes], Optional[Dict[str, Any]]]]) -> "DocumentStore":
+        """(본문, 메타데이터) 순회로 저장소 생성 (본문을 한 번에 목록으로 들고 있지 않음)"""
+        chunks: List[bytes] = []
+        offsets = [0]
+        codes: Dict[str, List[int]] = {column: [] for column in COLUMNS}
+        values: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+        value_ids: Dict[str, Dict[Any, int]] = {column: {} for column in COLUMNS}
+        shape_codes: List[int] = []
+        shapes: List[Tuple[Tuple[str, ...], Dict[str, Any]]] = []
+        shape_ids: Dict[str, int] = {}
+
+        for text, metadata in records:
+            data = text if isinstance(text, bytes) else (text or "").encode("utf-8")
+            chunks.append(data)
+            offsets.append(offsets[-1] + len(data))
+
+            metadata = metadata or {}
+            for column in COLUMNS:
+                if column in metadata:
+                    value = metadata[column]
+                    key = _intern_key(value)
+                    code = value_ids[column].get(key)
+                    if code is None:
+                        code = value_ids[column][key] = len(values[column])
+                        values[column].append(value)
+                    codes[column].append(code)
+                else:
+                    codes[column].append(-1)
+
+            keys = tuple(metadata)
+            extras = {key: value for key, value in metadata.items() if key not in COLUMNS}
+            shape_key = json.dumps([keys, extras], sort_keys=True, ensure_ascii=False, default=str)
+            shape = shape_ids.get(shape_key)
+            if shape is None:
+                shape = shape_ids[shape_key] = len(shapes)
+                shapes.append((keys, extras))
+            shape_codes.append(shape)
+
+        return cls(b"".join(chunks), np.asarray(offsets, dtype=np.int64),
+                   {column: np.asarray(codes[column], dtype=np.int32) for column in COLUMNS}, values,
+                   np.asarray(shape_codes, dtype=np.int32), shapes)
+
+    # 2. 조회
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def text_bytes(self, row: int) -> bytes:
+        return bytes(self._view[self.offsets[row]:self.offsets[row + 1]])
+
+    def text(self, row: int) -> str:
+        return str(self._view[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+    def get(self, row: int, key: str, default: Any = None) -> Any:
+        """메타데이터 값 하나 (사전을 만들지 않음)"""
+        codes = self.codes.get(key)
+        if codes is not None:
+            code = codes[row]
+            return self.values[key][code] if code >= 0 else default
+        return self.shapes[self.shape_codes[row]][1].get(key, default)
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """원래 키 순서대로 만든 새 메타데이터 사전"""
+        keys, extras = self.shapes[self.shape_codes[row]]
+        metadata = {}
+        for key in keys:
+            codes = self.codes.get(key)
+            metadata[key] = self.values[key][codes[row]] if codes is not None else extras[key]
+        return metadata
+
+    def records(self) -> Iterator[Tuple[bytes, Dict[str, Any]]]:
+        """(본문 바이트, 메타데이터) 순회 (다른 저장소를 만들 때 본문을 디코딩하지 않음)"""
+        for row in range(len(self)):
+            yield self.text_bytes(row), self.metadata(row)
+
+    def handle(self, row: int, **extra) -> DocHandle:
+        return DocHandle(self, row, extra or None)
+
+    def document(self, row: int):
+        return DocHandle(self, row).to_document()
+
+    # 3. 저장 / 로딩 / 공유
+    def save(self, path: str) -> None:
+        with open(os.path.join(path, "content.bin"), "wb") as f:
+            f.write(self._view)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "meta-shapes.npy"), self.shape_codes)
+        for column, codes in self.codes.items():
+            np.save(os.path.join(path, f"meta-{column}.npy"), codes)
+        with open(os.path.join(path, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump({"columns": list(self.codes), "values": self.values, "shapes": self.shapes}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "DocumentStore":
+        """저장된 저장소 로딩 (mmap=True면 본문과 배열을 메모리 매핑 - 필요한 페이지만 읽음)"""
+        mmap_mode = "r" if mmap else None
+        content_path = os.path.join(path, "content.bin")
+        if mmap and os.path.getsize(content_path) > 0:
+            buffer = np.memmap(content_path, dtype=np.uint8, mode="r")
+        else:
+            with open(content_path, "rb") as f:
+                buffer = f.read()
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            metadata = json.load(f)
+        codes = {column: np.load(os.path.join(path, f"meta-{column}.npy"), mmap_mode=mmap_mode) for column in metadata["columns"]}
+        shapes = [(tuple(keys), extras) for keys, extras in metadata["shapes"]]
+        return cls(buffer, np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode), codes, metadata["values"],
+                   np.load(os.path.join(path, "meta-shapes.npy"), mmap_mode=mmap_mode), shapes)
+
+    def share(self, store, name: str = "documents") -> None:
+        """본문 버퍼와 배열을 공유 메모리(SharedArrayStore)로 이동 (fork 전 부모 프로세스에서 호출)"""
+        buffer = self.buffer if isinstance(self.buffer, np.ndarray) else np.frombuffer(self.buffer, dtype=np.uint8)
+        self.buffer = store.share(f"{name}-content", buffer)
+        self._view = memoryview(self.buffer)
+        self.offsets = store.share(f"{name}-offsets", self.offsets)
+        self.shape_codes = store.share(f"{name}-shapes", self.shape_codes)
+        self.codes = {column: store.share(f"{name}-{column}", codes) for column, codes in self.codes.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._view) + self.offsets.nbytes + self.shape_codes.nbytes + sum(codes.nbytes for codes in self.codes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self),
+            "bytes": self.nbytes,
+            "shapes": len(self.shapes),
+            "values": {column: len(values) for column, values in self.values.items()},
+        }
@@ -7,16 +7,31 @@ import numpy as np  # 수치 연산 모듈
 import json  # JSON 파싱용
 import re  # 정규표현식 사용
 import os  # 운영 체제 관련 함수 임포트
-import ast  # 문자열을 파이썬 객체로 변환
+import time  # 검색 시간 측정
+import contextvars  # 스레드 간 컨텍스트 전달
+import logging  # 검색기 경고 로그
+import threading  # 검색기별 동시 실행 수 보호
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError  # 검색기 동시 실행
 from dotenv import load_dotenv  # .env 파일 로드
 
 # 1-2. LangChain 라이브러리 임포트
 from langchain_cohere import CohereEmbeddings  # Cohere 임베딩 모델
 from langchain.schema import Document  # 문서 스키마
 from supabase import create_client  # Supabase 클라이언트
+from supabase.lib.client_options import ClientOptions  # Supabase 요청 제한 시간
 from langchain_community.vectorstores.supabase import SupabaseVectorStore  # Supabase 벡터 저장소
 from langchain_community.retrievers import BM25Retriever  # BM25 검색기
 from langchain_openai import ChatOpenAI  # OpenAI 챗봇 모델
+from caching import CachedEmbeddings, LRUTTLCache, normalize_text  # 프로세스 전역 임베딩 캐시 / 검색 결과 캐시
+from vector_codec import encode_vector  # pgvector 임베딩 인코딩
+from image_index import ImageEmbeddingIndex  # 이미지 임베딩 인메모리 인덱스
+from vector_index import LocalVectorRetriever  # 텍스트 임베딩 인프로세스 벡터 검색기
+from document_store import as_document  # 검색기 결과 핸들 -> Document 변환
+from bm25_index import BM25Refresher, default_tokenizer, load_or_build_index  # BM25 인덱스 디스크 스냅샷 / 증분 갱신
+from sparse_bm25 import SparseBM25Retriever, korean_tokenizer  # 희소 행렬 BM25 검색기 / 한국어 토크나이저
+from search_pipeline import DEFAULT_BUDGETS_MS, SearchPipeline  # 에이전트 / 앱 공용 단계별 검색 파이프라인
+from metrics import stage  # 단계별 지연 시간 메트릭 (진행 중인 트레이스에는 구간으로도 기록)
+from tracing import annotate, configure_slow_query_log, external_call, start_trace  # 요청별 구간 트리 / 느린 쿼리 로그
 
 # 1-4. LangGraph 라이브러리 임포트
 from typing import Dict, List, Optional, Any, Tuple  # 타입 힌트 임포트
@@ -26,19 +41,60 @@ from langgraph.checkpoint.memory import MemorySaver  # 메모리 저장 체크
 from langgraph.graph import START, END, MessagesState  # 그래프 상태
 from langgraph.graph.state import StateGraph  # 그래프 상태
 
+logger = logging.getLogger(__name__)  # 모듈 로거
+
 # 2. 환경 변수 설정
 load_dotenv()  # .env 파일 로드
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 COHERE_API_KEY = os.environ.get("COHERE_API_KEY", "")
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
-client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "1024"))  # 임베딩 캐시 최대 항목 수
+EMBEDDING_CACHE_TTL = float(os.environ.get("EMBEDDING_CACHE_TTL", "3600"))  # 임베딩 캐시 유효 시간 (초)
+INDEX_RETRY_AFTER = float(os.environ.get("INDEX_RETRY_AFTER", "30"))  # 인메모리 인덱스 로딩 실패 후 다시 시도하기까지 대기 시간 (초)
+INDEX_RELOAD_INTERVAL = float(os.environ.get("INDEX_RELOAD_INTERVAL", "0"))  # 인메모리 이미지/텍스트 인덱스 다시 로딩 간격 (초, 0이면 시작 시 스냅샷 고정)
+BM25_TIMEOUT = float(os.environ.get("BM25_TIMEOUT", "1.0"))  # BM25 검색 제한 시간 (초)
+VECTOR_TIMEOUT = float(os.environ.get("VECTOR_TIMEOUT", "3.0"))  # 벡터 검색(RPC) 제한 시간 (초)
+RETRIEVER_POOL_SIZE = int(os.environ.get("RETRIEVER_POOL_SIZE", "16"))  # 검색기 동시 실행 스레드 수
+RETRIEVER_MAX_IN_FLIGHT = int(os.environ.get("RETRIEVER_MAX_IN_FLIGHT", str(max(1, RETRIEVER_POOL_SIZE // 2))))  # 검색기별 동시 실행 상한 (넘으면 그 검색기 생략)
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "5"))  # Supabase(PostgREST) 요청 제한 시간 (초, 제한 시간을 넘긴 RPC가 스레드를 붙잡는 최대 시간)
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", "1024"))  # 하이브리드 검색 결과 캐시 최대 항목 수 (0이면 비활성화)
+RETRIEVAL_CACHE_TTL = float(os.environ.get("RETRIEVAL_CACHE_TTL", "600"))  # 하이브리드 검색 결과 캐시 유효 시간 (초)
+BM25_SNAPSHOT_DIR = os.environ.get("BM25_SNAPSHOT_DIR", ".cache/bm25")  # BM25 스냅샷 저장 디렉터리
+BM25_SNAPSHOT_MAX_AGE = float(os.environ.get("BM25_SNAPSHOT_MAX_AGE", "86400"))  # 스냅샷 최대 사용 시간 (초, 0이면 무제한)
+BM25_SNAPSHOT_CHECK_COUNT = os.environ.get("BM25_SNAPSHOT_CHECK_COUNT", "true").lower() == "true"  # 시작 시 문서 수 비교 여부
+BM25_WATERMARK_COLUMN = os.environ.get("BM25_WATERMARK_COLUMN", "") or None  # 증분 갱신 워터마크 컬럼 (updated_at 또는 증가하는 id)
+BM25_REFRESH_INTERVAL = float(os.environ.get("BM25_REFRESH_INTERVAL", "0"))  # BM25 증분 갱신 주기 (초, 0이면 비활성화)
+BM25_ENGINE = os.environ.get("BM25_ENGINE", "sparse").lower()  # BM25 엔진 (sparse: 희소 행렬, rank_bm25: 기존 BM25Retriever)
+BM25_TOKENIZER = os.environ.get("BM25_TOKENIZER", "korean").lower()  # BM25 토크나이저 (korean: 조사 제거 + 바이그램, whitespace: 공백 분리)
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "5000"))  # 느린 쿼리 로그 기준 (ms)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "supabase").lower()  # 벡터 검색 백엔드 (supabase: RPC, flat/ivf/auto: 인프로세스 인덱스)
+VECTOR_IVF_MIN_ROWS = int(os.environ.get("VECTOR_IVF_MIN_ROWS", "50000"))  # auto일 때 IVF 근사 검색을 사용할 최소 문서 수
+VECTOR_IVF_NLIST = int(os.environ.get("VECTOR_IVF_NLIST", "0"))  # IVF 목록 수 (0이면 sqrt(문서 수))
+VECTOR_IVF_NPROBE = int(os.environ.get("VECTOR_IVF_NPROBE", "8"))  # IVF 질의당 검색할 목록 수 (클수록 정확하고 느림)
+VECTOR_EF_SEARCH = int(os.environ.get("VECTOR_EF_SEARCH", "0"))  # Supabase HNSW 인덱스 검색 후보 수 (hnsw.ef_search, 0이면 DB 기본값)
+VECTOR_PROBES = int(os.environ.get("VECTOR_PROBES", "0"))  # Supabase ivfflat 인덱스 검색 목록 수 (ivfflat.probes, 0이면 DB 기본값)
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "int8").lower()  # 인메모리 이미지/텍스트 임베딩 저장 형식 (float32 / int8)
+EMBEDDING_RESCORE = int(os.environ.get("EMBEDDING_RESCORE", "4"))  # 양자화 검색 후 원본으로 재점수화할 후보 배수 (k * 값, 0이면 사용 안 함)
+EMBEDDING_EXACT_DIR = os.environ.get("EMBEDDING_EXACT_DIR", ".cache/embeddings")  # 재점수화용 원본 float32 행렬 파일 위치 (메모리 매핑)
+SEARCH_BUDGET_MS = float(os.environ.get("SEARCH_BUDGET_MS", str(DEFAULT_BUDGETS_MS["total"])))  # 검색 전체 시간 예산 (ms, 초과 시 이미지 단계 생략)
+SEARCH_RETRIEVE_BUDGET_MS = float(os.environ.get("SEARCH_RETRIEVE_BUDGET_MS", str(DEFAULT_BUDGETS_MS["retrieve"])))  # 하이브리드 검색 단계 예산 (ms, 초과 시 기록만)
+SEARCH_IMAGE_CANDIDATES_BUDGET_MS = float(os.environ.get("SEARCH_IMAGE_CANDIDATES_BUDGET_MS", str(DEFAULT_BUDGETS_MS["image_candidates"])))  # 이미지 후보 단계 예산 (ms)
+SEARCH_IMAGE_RERANK_BUDGET_MS = float(os.environ.get("SEARCH_IMAGE_RERANK_BUDGET_MS", str(DEFAULT_BUDGETS_MS["image_rerank"])))  # 이미지 재정렬 단계 예산 (ms)
+SLOW_QUERY_LOG_FILE = os.environ.get("SLOW_QUERY_LOG_FILE", "")  # 느린 쿼리 로그 파일 (비어 있으면 표준 로그로만 출력)
+client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+configure_slow_query_log(SLOW_QUERY_LOG_FILE)  # 느린 쿼리 로그 파일 설정
 
 # 3. 검색기(Retriever) 설정
 # 3-1. Cohere 임베딩 (텍스트 및 이미지/멀티모달 임베딩용)
-cohere_embeddings = CohereEmbeddings(
-    model="embed-v4.0",  # 임베딩 모델 이름
-    cohere_api_key=COHERE_API_KEY)  # Cohere API 키 설정
+# 동일한 텍스트의 반복 임베딩을 막기 위해 프로세스 전역 캐시로 감싸서 사용
+cohere_embeddings = CachedEmbeddings(
+    CohereEmbeddings(
+        model="embed-v4.0",  # 임베딩 모델 이름
+        cohere_api_key=COHERE_API_KEY),  # Cohere API 키 설정
+    model_name="embed-v4.0",  # 캐시 키에 사용할 모델 이름
+    max_size=EMBEDDING_CACHE_SIZE,  # 최대 캐시 항목 수
+    ttl=EMBEDDING_CACHE_TTL)  # 캐시 유효 시간
 
 # 3-2. Supabase 텍스트 벡터 스토어 설정
 text_vectorstore = SupabaseVectorStore(
@@ -54,70 +110,212 @@ image_vectorstore = SupabaseVectorStore(
     table_name="image_embeddings",  # 벡터 테이블 이름
     query_name="match_image_embeddings")  # 검색 쿼리 이름
 
+# 3-3. 이미지 임베딩 인메모리 인덱스 (최초 사용 시 지연 로딩)
+image_index = ImageEmbeddingIndex(
+    client,  # Supabase 클라이언트
+    table_name="image_embeddings",  # 이미지 임베딩 테이블 이름
+    quantization=EMBEDDING_QUANTIZATION,  # 임베딩 저장 형식
+    rescore=EMBEDDING_RESCORE,  # 원본 재점수화 후보 배수
+    exact_dir=EMBEDDING_EXACT_DIR,  # 원본 행렬 파일 위치
+    retry_after=INDEX_RETRY_AFTER,  # 로딩 실패 후 재시도 대기 시간
+    reload_interval=INDEX_RELOAD_INTERVAL)  # 주기적 다시 로딩 간격
+
 # 3-3. Supabase 벡터 스토어 검색기 정의
 class EnhancedSupabaseRetriever:
-    def __init__(self, client, embeddings, table_name="embeddings", query_name="match_embeddings", k=5):
+    def __init__(self, client, embeddings, table_name="embeddings", query_name="match_embeddings", k=5,
+                 filtered_query_name=None, ef_search=0, probes=0):
         self.client = client  # Supabase 클라이언트 설정
         self.embeddings = embeddings  # 임베딩 모델 설정
         self.table_name = table_name  # 벡터 테이블 이름
         self.query_name = query_name  # 검색 쿼리 이름
         self.k = k  # 검색 결과 수
+        self.filtered_query_name = filtered_query_name  # 페이지/메타데이터 필터를 SQL에서 적용하는 검색 함수 (None이면 결과를 받아서 필터링)
+        self._filtered_lock = threading.Lock()  # 필터링 검색 함수 비활성화 / 경고를 한 번만
+        self.search_params = {}  # 벡터 인덱스 검색 범위 (HNSW ef_search / ivfflat probes)
+        if ef_search:
+            self.search_params["ef_search"] = ef_search
+        if probes:
+            self.search_params["probes"] = probes
+    
+    def _to_documents(self, rows, page_filter=None, metadata_filter=None):  # RPC 결과를 문서 목록으로 변환
+        docs = []  # 결과 저장
+        for match in rows or []:  # 결과 반복
+            if 'content' in match and match['content']:  # 콘텐츠가 있으면
+                metadata = match.get('metadata', {}) or {}  # 메타데이터 추출
+                metadata['similarity'] = float(match.get('similarity', 0))  # 점수 추가
+                metadata['source'] = "Vector"  # 소스 정보 추가
+                
+                if page_filter:  # 페이지 필터 적용 (필터링 RPC를 쓸 수 없을 때를 대비해 한 번 더 확인)
+                    page_info = str(metadata.get('page', ''))  # 페이지 정보 추출
+                    if page_info != str(page_filter):  # 페이지 정보가 일치하지 않으면 건너뜀
+                        continue  # 건너뜀
+                if metadata_filter and any(metadata.get(key) != value for key, value in metadata_filter.items()):
+                    continue  # 메타데이터 필터가 일치하지 않으면 건너뜀
+                
+                docs.append(Document(  # 문서 추가
+                    page_content=match['content'],  # 콘텐츠
+                    metadata=metadata))  # 메타데이터
+        return docs  # 결과 반환
     
-    def invoke(self, query, page_filter=None):
+    def _match_filtered(self, query_embedding, page_filter=None, metadata_filter=None):  # 필터와 인덱스 검색 범위를 SQL에 전달
+        if not self.filtered_query_name:
+            return None
+        params = {"query_embedding": encode_vector(query_embedding),
+                  "match_threshold": 0.5,
+                  "match_count": self.k,
+                  "filter": metadata_filter or {}}
+        if page_filter:
+            try:
+                params["filter_page"] = int(str(page_filter).strip())  # 페이지 생성 컬럼(int) 인덱스로 후보를 좁힘
+            except ValueError:
+                return None  # 숫자가 아닌 페이지는 결과를 받아서 필터링
+        params.update(self.search_params)
         try:
-            query_embedding = self.embeddings.embed_query(query)  # 임베딩 생성
-            matches = self.client.rpc(  # Supabase RPC 호출
-                self.query_name,  # 검색 쿼리 이름
-                    {"query_embedding": query_embedding,  # 임베딩 쿼리
-                    "match_threshold": 0.5,  # 매칭 임계치
-                    "match_count": self.k}).execute()  # 매칭 결과 수
-            
-            docs = []  # 결과 저장
-            if matches.data:  # 결과가 있으면
-                for i, match in enumerate(matches.data):  # 결과 반복
-                    if 'content' in match and match['content']:  # 콘텐츠가 있으면
-                        metadata = match.get('metadata', {}) or {}  # 메타데이터 추출
-                        metadata['similarity'] = float(match.get('similarity', 0))  # 점수 추가
-                        metadata['source'] = "Vector"  # 소스 정보 추가
-                        
-                        if page_filter:  # 페이지 필터 적용
-                            page_info = str(metadata.get('page', ''))  # 페이지 정보 추출
-                            if page_info != str(page_filter):  # 페이지 정보가 일치하지 않으면 건너뜀
-                                continue  # 건너뜀
-                        
-                        docs.append(Document(  # 문서 추가
-                            page_content=match['content'],  # 콘텐츠
-                            metadata=metadata))  # 메타데이터
-            
-            return docs  # 결과 반환
+            external_call()
+            return self.client.rpc(self.filtered_query_name, params).execute().data
+        except Exception as e:
+            if "PGRST202" in str(e) or "Could not find the function" in str(e):  # 함수가 없는 DB면 이후로는 시도하지 않음
+                with self._filtered_lock:
+                    name, self.filtered_query_name = self.filtered_query_name, None
+                if name:  # 동시에 실패한 다른 요청은 경고하지 않음
+                    logger.warning(f"필터링 검색 함수({name}) 없음, 기존 검색으로 대체")
+            return None
+    
+    def _match(self, query_embedding, page_filter=None, metadata_filter=None):  # 임베딩 하나로 Supabase RPC 호출
+        if page_filter or metadata_filter or self.search_params:
+            rows = self._match_filtered(query_embedding, page_filter, metadata_filter)
+            if rows is not None:
+                return rows
+        external_call()
+        return self.client.rpc(  # Supabase RPC 호출
+            self.query_name,  # 검색 쿼리 이름
+                {"query_embedding": encode_vector(query_embedding),  # 임베딩 쿼리 (pgvector 텍스트 형식으로 전송량 절감)
+                "match_threshold": 0.5,  # 매칭 임계치
+                "match_count": self.k}).execute().data  # 매칭 결과 수
+    
+    def invoke(self, query, page_filter=None, metadata_filter=None):
+        try:
+            with stage("query_embedding"):
+                query_embedding = self.embeddings.embed_query(query)  # 임베딩 생성
+            with stage("supabase_rpc"):
+                rows = self._match(query_embedding, page_filter, metadata_filter)
+            return self._to_documents(rows, page_filter, metadata_filter)  # 결과 반환
         
         except Exception as e:  # 오류 처리
             return []  # 결과 반환
     
+    def batch_invoke(self, queries, page_filter=None, metadata_filter=None):  # 여러 쿼리를 임베딩 1회 + RPC 1회로 검색
+        with stage("query_embedding"):
+            if hasattr(self.embeddings, "embed_queries"):
+                query_embeddings = self.embeddings.embed_queries(queries)  # 한 번의 API 호출로 일괄 임베딩
+            else:
+                query_embeddings = [self.embeddings.embed_query(query) for query in queries]
+        
+        grouped = None
+        if not (page_filter or metadata_filter):  # 필터가 있으면 쿼리별 필터링 RPC 사용
+            try:
+                with stage("supabase_rpc"):
+                    external_call()
+                    rows = self.client.rpc(  # 일괄 검색 RPC (쿼리 순번별 결과 반환)
+                        f"{self.query_name}_batch",
+                        {"query_embeddings": [encode_vector(embedding) for embedding in query_embeddings],
+                         "match_threshold": 0.5,
+                         "match_count": self.k,
+                         **self.search_params}).execute().data or []
+                grouped = [[] for _ in queries]
+                for row in rows:
+                    grouped[int(row["query_index"])].append(row)
+            except Exception as e:  # 일괄 RPC가 없으면 쿼리별 RPC로 대체 (임베딩은 재사용)
+                grouped = None
+        if grouped is None:
+            grouped = []
+            for query_embedding in query_embeddings:
+                try:
+                    grouped.append(self._match(query_embedding, page_filter, metadata_filter))
+                except Exception:
+                    grouped.append([])
+        return [self._to_documents(rows, page_filter, metadata_filter) for rows in grouped]
+    
     def get_relevant_documents(self, query):  # 관련 문서 검색
         return self.invoke(query)  # 검색 결과 반환
 
-resp = client.table("embeddings").select("content,metadata").execute()  # 벡터 테이블 조회
-docs = [Document(page_content=item["content"], metadata=item.get("metadata", {})) for item in resp.data]  # 문서 리스트 생성
-texts = [d.page_content for d in docs]  # 문서 내용 리스트 생성
-
-vector_retriever = EnhancedSupabaseRetriever(  # 기본 유사도 검색기
+supabase_vector_retriever = EnhancedSupabaseRetriever(  # 기본 유사도 검색기 (Supabase RPC)
     client=client,  # Supabase 클라이언트
     embeddings=cohere_embeddings,  # 임베딩 모델
     table_name="text_embeddings",  # 벡터 테이블 이름
     query_name="match_text_embeddings",  # 검색 쿼리 이름
-    k=5)  # 검색 결과 수
+    k=5,  # 검색 결과 수
+    filtered_query_name="match_text_embeddings_filtered",  # 페이지/메타데이터 필터 검색 함수
+    ef_search=VECTOR_EF_SEARCH,  # HNSW 검색 후보 수
+    probes=VECTOR_PROBES)  # ivfflat 검색 목록 수
+
+if VECTOR_BACKEND == "supabase":
+    vector_retriever = supabase_vector_retriever
+else:  # text_embeddings를 메모리에 복제해 프로세스 안에서 검색 (로딩 전/실패 시 Supabase RPC 사용)
+    vector_retriever = LocalVectorRetriever(
+        client=client,  # Supabase 클라이언트
+        embeddings=cohere_embeddings,  # 임베딩 모델
+        table_name="text_embeddings",  # 벡터 테이블 이름
+        backend=VECTOR_BACKEND,  # flat / ivf / auto
+        k=5,  # 검색 결과 수
+        ivf_min_rows=VECTOR_IVF_MIN_ROWS,  # auto일 때 IVF 사용 기준
+        nlist=VECTOR_IVF_NLIST or None,  # IVF 목록 수
+        nprobe=VECTOR_IVF_NPROBE,  # IVF 질의당 검색 목록 수
+        quantization=EMBEDDING_QUANTIZATION,  # 임베딩 저장 형식
+        rescore=EMBEDDING_RESCORE,  # 원본 재점수화 후보 배수
+        exact_dir=EMBEDDING_EXACT_DIR,  # 원본 행렬 파일 위치
+        retry_after=INDEX_RETRY_AFTER,  # 로딩 실패 후 재시도 대기 시간
+        reload_interval=INDEX_RELOAD_INTERVAL,  # 주기적 다시 로딩 간격
+        fallback=supabase_vector_retriever)  # 대체 검색기
 
 # 3-4. BM25 키워드 검색기 생성
-bm25 = BM25Retriever.from_texts(texts=texts, metadatas=[d.metadata for d in docs], k=5)  # BM25 검색기
+bm25_tokenizer = korean_tokenizer if BM25_TOKENIZER == "korean" else default_tokenizer  # 색인/질의 공통 토크나이저
+
+def build_bm25_retriever(index, k=5):  # 설정된 엔진으로 BM25 검색기 생성
+    if BM25_ENGINE == "rank_bm25":
+        return index.to_retriever(k=k)
+    return SparseBM25Retriever.from_index(index, k=k)
+
+# 디스크 스냅샷이 있고 최신이면 메모리 매핑으로 바로 로딩하고, 없거나 오래된 경우에만 테이블 전체를 읽어 다시 생성
+bm25_index = load_or_build_index(
+    client,  # Supabase 클라이언트
+    BM25_SNAPSHOT_DIR,  # 스냅샷 디렉터리
+    table_name="embeddings",  # 문서 테이블 이름
+    max_age=BM25_SNAPSHOT_MAX_AGE or None,  # 최대 사용 시간
+    check_count=BM25_SNAPSHOT_CHECK_COUNT,  # 문서 수 비교 여부
+    watermark_column=BM25_WATERMARK_COLUMN,  # 증분 갱신 워터마크 컬럼
+    tokenizer=bm25_tokenizer)  # 토크나이저 (바뀌면 스냅샷 재생성)
+bm25 = build_bm25_retriever(bm25_index, k=5)  # BM25 검색기
 
 # 3-5. 강화된 하이브리드 검색기 정의
+retriever_executor = ThreadPoolExecutor(max_workers=RETRIEVER_POOL_SIZE, thread_name_prefix="retriever")  # 검색기 동시 실행 풀
+
+def _timed_invoke(retriever, query, stage_name):
+    started = time.perf_counter()
+    with stage(stage_name):
+        docs = retriever.invoke(query)
+    return docs, (time.perf_counter() - started) * 1000  # 결과와 소요 시간(ms)
+
+def _timed_batch_invoke(retriever, queries, stage_name):
+    started = time.perf_counter()
+    with stage(stage_name):
+        if hasattr(retriever, "batch_invoke"):  # 일괄 검색을 지원하는 검색기
+            batch = retriever.batch_invoke(queries)
+        else:
+            batch = [retriever.invoke(query) for query in queries]
+    return [docs or [] for docs in batch], (time.perf_counter() - started) * 1000
+
 class EnhancedEnsembleRetriever:
     def __init__(
         self,  # 초기화
         retrievers: List[Any],  # 검색기 목록
         weights: Optional[List[float]] = None,  # 가중치 목록
-        verbose: bool = False):  # 디버깅 여부
+        verbose: bool = False,  # 디버깅 여부
+        timeouts: Optional[List[Optional[float]]] = None,  # 검색기별 제한 시간 (초, None이면 무제한)
+        executor: Optional[ThreadPoolExecutor] = None,  # 검색기 동시 실행 풀
+        k: int = 5,  # 최종 결과 수
+        cache: Optional[LRUTTLCache] = None,  # 검색 결과 캐시 (None이면 사용 안 함)
+        max_in_flight: Optional[int] = None):  # 검색기별 동시 실행 상한 (None이면 무제한)
         self.retrievers = retrievers  # 검색기 목록
         
         if weights is None:  # 가중치 목록이 없으면 균등 가중치 설정
@@ -125,45 +323,152 @@ class EnhancedEnsembleRetriever:
         self.weights = weights  # 가중치 목록
         self.verbose = verbose  # 디버깅 여부
         self.retriever_names = ["BM25", "Vector"]  # 검색기 이름 목록 변경
+        self.stage_names = ["bm25_scoring", "vector_search"]  # 검색기별 메트릭/구간 이름
+        self.timeouts = timeouts or [None for _ in retrievers]  # 검색기별 제한 시간
+        self.executor = executor or retriever_executor  # 검색기 동시 실행 풀
+        self.k = k  # 최종 결과 수
+        self.cache = cache  # 검색 결과 캐시
+        self.max_in_flight = max_in_flight  # 검색기별 동시 실행 상한
+        self._in_flight = [0 for _ in retrievers]  # 검색기별 실행 중인 작업 수 (제한 시간을 넘겨 버린 작업 포함)
+        self._in_flight_lock = threading.Lock()
     
     def invoke(self, query: str) -> List[Document]:  # 검색 쿼리 처리
+        return self.invoke_with_info(query)[0]
+    
+    def _submit(self, i: int, fn, retriever, arg, stage_name):
+        # 검색기 i의 실행 중인 작업이 상한에 닿았으면 제출하지 않음 (None 반환)
+        # 제한 시간을 넘긴 작업은 future.cancel()로 멈추지 않고 RPC가 끝날 때(SUPABASE_TIMEOUT)까지 스레드를 차지하므로,
+        # 느려진 검색기가 풀 전체를 채워 다른 검색기까지 막지 않도록 검색기별로 동시 실행 수를 제한한다
+        with self._in_flight_lock:
+            if self.max_in_flight is not None and self._in_flight[i] >= self.max_in_flight:
+                return None
+            self._in_flight[i] += 1
+        try:
+            future = self.executor.submit(contextvars.copy_context().run, fn, retriever, arg, stage_name)
+        except Exception:
+            self._release(i)
+            raise
+        future.add_done_callback(lambda _: self._release(i))
+        return future
+    
+    def _release(self, i: int) -> None:
+        with self._in_flight_lock:
+            self._in_flight[i] -= 1
+    
+    def _collect(self, futures, started) -> Tuple[List[Any], Dict[str, Dict]]:
+        # 제한 시간 안에 도착한 결과만 사용 (검색기별 상태는 retrieval_info에 기록)
+        results = []  # 검색기별 결과
+        retrieval_info = {}  # 검색기별 상태 (debug_info용)
+        for i, future in enumerate(futures):
+            name = self.retriever_names[i]
+            if future is None:  # 동시 실행 상한 초과로 제출하지 않음
+                results.append(None)
+                retrieval_info[name] = {"status": "skipped:saturated", "in_flight": self._in_flight[i]}
+                continue
+            timeout = self.timeouts[i] if i < len(self.timeouts) else None
+            remaining = None if timeout is None else max(0.0, started + timeout - time.perf_counter())  # 공통 시작 시점 기준 남은 시간
+            try:
+                docs, elapsed_ms = future.result(timeout=remaining)
+                results.append(docs)
+                retrieval_info[name] = {"status": "ok", "count": len(docs or []), "elapsed_ms": round(elapsed_ms, 1)}
+            except FuturesTimeoutError:  # 제한 시간 초과 - 늦게 도착하는 결과는 버림
+                future.cancel()  # 아직 대기 중인 작업만 취소됨 (실행 중인 작업은 끝날 때까지 실행되고 결과만 버림)
+                results.append(None)
+                retrieval_info[name] = {"status": "timeout", "timeout_ms": round(timeout * 1000, 1)}
+            except Exception as e:
+                results.append(None)
+                retrieval_info[name] = {"status": "error", "error": str(e)}
+        return results, retrieval_info
+    
+    def _gather(self, query: str) -> Tuple[List[List[Document]], Dict[str, Dict]]:
+        # 모든 검색기를 동시에 실행하고, 제한 시간 안에 도착한 결과만 사용
+        retrievers = list(self.retrievers)  # 실행 도중 검색기 교체에 영향받지 않도록 고정
+        started = time.perf_counter()
+        futures = [self._submit(i, _timed_invoke, retriever, query, stage_name)
+                   for i, (retriever, stage_name) in enumerate(zip(retrievers, self.stage_names))]
+        results, retrieval_info = self._collect(futures, started)
+        return [docs or [] for docs in results], retrieval_info
+    
+    def _gather_batch(self, queries: List[str]) -> Tuple[List[List[List[Document]]], Dict[str, Dict]]:
+        # 검색기마다 쿼리 묶음 전체를 한 번에 실행 (벡터 검색은 임베딩/RPC 각 1회)
+        retrievers = list(self.retrievers)
+        started = time.perf_counter()
+        futures = [self._submit(i, _timed_batch_invoke, retriever, queries, stage_name)
+                   for i, (retriever, stage_name) in enumerate(zip(retrievers, self.stage_names))]
+        results, retrieval_info = self._collect(futures, started)
+        return [batch or [[] for _ in queries] for batch in results], retrieval_info
+    
+    def _cache_key(self, query: str) -> Tuple[str, Tuple[float, ...], int]:
+        return (normalize_text(query), tuple(float(weight) for weight in self.weights), self.k)
+    
+    def _cache_get(self, query: str) -> Optional[Tuple[List[Document], Dict[str, Dict]]]:
+        # 캐시에는 (본문, 메타데이터) 쌍만 보관하고, 꺼낼 때마다 새 Document와 메타데이터 사본을 만들어 반환
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self._cache_key(query))
+        if entry is None:
+            return None
+        rows, retrieval_info = entry
+        docs = [Document(page_content=content, metadata=dict(metadata)) for content, metadata in rows]
+        return docs, {name: dict(info, cached=True) for name, info in retrieval_info.items()}
+    
+    def _cache_set(self, query: str, docs: List[Document], retrieval_info: Dict[str, Dict]) -> None:
+        # 제한 시간 초과/오류로 일부 검색기 결과가 빠진 경우는 저장하지 않음
+        if self.cache is None or any(info.get("status") != "ok" for info in retrieval_info.values()):
+            return
+        rows = tuple((doc.page_content, dict(doc.metadata)) for doc in docs)
+        self.cache.set(self._cache_key(query), (rows, {name: dict(info) for name, info in retrieval_info.items()}))
+    
+    def invoke_batch_with_info(self, queries: List[str]) -> List[Tuple[List[Document], Dict[str, Dict]]]:  # 여러 쿼리 일괄 검색
+        outputs = [self._cache_get(query) for query in queries]  # 캐시에 있는 쿼리는 검색 생략
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            batches, retrieval_info = self._gather_batch([queries[i] for i in missing])
+            for j, i in enumerate(missing):
+                docs = self._merge([batch[j] for batch in batches])
+                self._cache_set(queries[i], docs, retrieval_info)
+                outputs[i] = (docs, dict(retrieval_info))
+        return outputs
+    
+    def invoke_with_info(self, query: str) -> Tuple[List[Document], Dict[str, Dict]]:  # 검색 결과와 검색기별 상태 반환
+        cached = self._cache_get(query)
+        if cached is not None:
+            return cached
+        results, retrieval_info = self._gather(query)
+        docs = self._merge(results)
+        self._cache_set(query, docs, retrieval_info)
+        return docs, retrieval_info
+    
+    def _merge(self, results: List[List[Document]]) -> List[Document]:  # 검색기별 결과를 가중치로 결합
         all_docs = []  # 모든 검색 결과 저장
         retriever_docs = {}  # 각 검색기별 문서 저장
         
-        for i, retriever in enumerate(self.retrievers):  # 검색기 반복
-            try:
-                docs = retriever.invoke(query)  # 검색 쿼리 처리
-                retriever_docs[self.retriever_names[i]] = []  # 검색기별 결과 저장
-                
-                for j, doc in enumerate(docs):  # 문서 반복
-                    if doc.metadata is None: # 메타데이터가 없으면
-                        doc.metadata = {}  # 빈 딕셔너리로 초기화
-                        
-                    doc.metadata["source"] = self.retriever_names[i]  # 소스 정보 추가
-                    doc.metadata["original_rank"] = j  # 순위 정보 추가
-                    doc.metadata["retriever_weight"] = float(self.weights[i])  # 가중치 정보 추가
-                    
-                    if self.retriever_names[i] == "Vector" and "similarity" in doc.metadata:  # Vector 검색일 경우
-                        similarity = float(doc.metadata["similarity"])  # 유사도 점수 추출
-                        if similarity > 0.5:  # 유사도 점수가 0.5보다 높으면
-                            enhanced_score = 0.8 + (similarity - 0.5) * 0.8  # 유사도 점수 강화
-                        else:
-                            enhanced_score = similarity * 1.6  # 유사도 점수 강화
-                        
-                        doc.metadata["score"] = enhanced_score * self.weights[i]  # 가중치 적용
-                        doc.metadata["original_similarity"] = similarity  # 원본 유사도 저장 (디버깅용)
+        for i, docs in enumerate(results):  # 검색기 결과 반복
+            # 검색기 결과(저장소 핸들 또는 Document)를 메타데이터를 복사한 Document로 변환 (동시 요청 간 점수 덮어쓰기 방지)
+            docs = [as_document(doc) for doc in docs]
+            retriever_docs[self.retriever_names[i]] = []  # 검색기별 결과 저장
+            
+            for j, doc in enumerate(docs):  # 문서 반복
+                doc.metadata["source"] = self.retriever_names[i]  # 소스 정보 추가
+                doc.metadata["original_rank"] = j  # 순위 정보 추가
+                doc.metadata["retriever_weight"] = float(self.weights[i])  # 가중치 정보 추가
+                
+                if self.retriever_names[i] == "Vector" and "similarity" in doc.metadata:  # Vector 검색일 경우
+                    similarity = float(doc.metadata["similarity"])  # 유사도 점수 추출
+                    if similarity > 0.5:  # 유사도 점수가 0.5보다 높으면
+                        enhanced_score = 0.8 + (similarity - 0.5) * 0.8  # 유사도 점수 강화
                     else:
-                        base_score = 1.0 / (1.0 + j)  # 순위 기반 점수
-                        doc.metadata["score"] = float(base_score * self.weights[i])  # 순위 기반 점수 계산
+                        enhanced_score = similarity * 1.6  # 유사도 점수 강화
+                    
+                    doc.metadata["score"] = enhanced_score * self.weights[i]  # 가중치 적용
+                    doc.metadata["original_similarity"] = similarity  # 원본 유사도 저장 (디버깅용)
+                else:
+                    base_score = 1.0 / (1.0 + j)  # 순위 기반 점수
+                    doc.metadata["score"] = float(base_score * self.weights[i])  # 순위 기반 점수 계산
 
-                    retriever_docs[self.retriever_names[i]].append(doc)  # 검색기별 결과 저장
-                        
-                all_docs.append(docs)  # 검색 결과 저장
-            
-            except Exception as e:
-                retriever_docs[self.retriever_names[i]] = []  # 검색기별 결과 초기화
-                all_docs.append([])  # 검색 결과 초기화 
-                continue
+                retriever_docs[self.retriever_names[i]].append(doc)  # 검색기별 결과 저장
+                    
+            all_docs.append(docs)  # 검색 결과 저장
         
         all_documents = []  # 모든 문서 저장
         for i, docs in enumerate(all_docs):  # 검색 결과 반복
@@ -205,18 +510,58 @@ class EnhancedEnsembleRetriever:
         for doc in final_docs:  # 최종 결과 반복
             content_hash = hash(doc.page_content)  # 중복 방지를 위한 해시 값
             
-            if content_hash not in used_contents and len(result_docs) < 5:  # 중복되지 않고 결과 수가 5개 미만이면
+            if content_hash not in used_contents and len(result_docs) < self.k:  # 중복되지 않고 결과 수가 k개 미만이면
                 result_docs.append(doc)  # 검색 결과 추가
                 used_contents.add(content_hash)  # 중복 방지    
         
         result_docs.sort(key=lambda x: x.metadata["score"], reverse=True)  # 점수 순으로 정렬
-        return result_docs[:5]  # 최대 5개 결과 반환
+        return result_docs[:self.k]  # 최대 k개 결과 반환
 
 # 3-6. 하이브리드 검색기 설정
 hybrid_retriever = EnhancedEnsembleRetriever(
     retrievers=[bm25, vector_retriever],  # 두 개의 검색기 사용
     weights=[0.3, 0.7],  # 가중치 설정 - 벡터 검색 가중치 0.7, BM25 0.3
-    verbose=False)  # 디버깅 정보 비활성화
+    verbose=False,  # 디버깅 정보 비활성화
+    timeouts=[BM25_TIMEOUT, VECTOR_TIMEOUT],  # 검색기별 제한 시간
+    max_in_flight=RETRIEVER_MAX_IN_FLIGHT,  # 검색기별 동시 실행 상한
+    k=5,  # 최종 결과 수
+    cache=LRUTTLCache(max_size=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL) if RETRIEVAL_CACHE_SIZE > 0 else None)  # 검색 결과 캐시
+
+# 3-7. BM25 인덱스 증분 갱신
+# 변경된 행만 반영한 새 BM25 검색기를 만든 뒤 검색기 목록을 통째로 교체 (실행 중인 검색은 이전 목록을 그대로 사용)
+def _swap_bm25_retriever(retriever):
+    global bm25
+    bm25 = retriever
+    hybrid_retriever.retrievers = [retriever] + list(hybrid_retriever.retrievers[1:])
+
+bm25_refresher = BM25Refresher(
+    client,  # Supabase 클라이언트
+    bm25_index,  # 현재 인덱스
+    on_swap=_swap_bm25_retriever,  # 검색기 교체 콜백
+    table_name="embeddings",  # 문서 테이블 이름
+    interval=BM25_REFRESH_INTERVAL,  # 갱신 주기
+    k=5,  # 검색 결과 수
+    snapshot_dir=BM25_SNAPSHOT_DIR,  # 갱신 결과를 스냅샷으로 저장
+    check_count=BM25_SNAPSHOT_CHECK_COUNT,  # 삭제 감지용 문서 수 비교
+    retriever_factory=build_bm25_retriever)  # 설정된 엔진으로 검색기 생성
+if hybrid_retriever.cache is not None:
+    bm25_refresher.add_listener(hybrid_retriever.cache.clear)  # 인덱스가 바뀌면 검색 결과 캐시 무효화
+    if isinstance(vector_retriever, LocalVectorRetriever):
+        vector_retriever.add_listener(hybrid_retriever.cache.clear)  # 벡터 복제본을 다시 로딩해도 무효화
+
+# 3-8. 단계별 검색 파이프라인 (에이전트 도구와 FastAPI 앱이 함께 사용)
+pipeline_executor = ThreadPoolExecutor(max_workers=RETRIEVER_POOL_SIZE, thread_name_prefix="pipeline")  # 이미지 단계 실행 풀
+search_pipeline = SearchPipeline(
+    hybrid_retriever,  # 텍스트 검색기
+    cohere_embeddings,  # 쿼리 임베딩 (캐시 포함)
+    image_index,  # 이미지 임베딩 인메모리 인덱스
+    client,  # Supabase 클라이언트
+    budgets_ms={
+        "total": SEARCH_BUDGET_MS,
+        "retrieve": SEARCH_RETRIEVE_BUDGET_MS,
+        "image_candidates": SEARCH_IMAGE_CANDIDATES_BUDGET_MS,
+        "image_rerank": SEARCH_IMAGE_RERANK_BUDGET_MS},
+    executor=pipeline_executor)
 
 # 4. OpenAI LLM 챗봇 모델 설정
 llm = ChatOpenAI(
@@ -236,749 +581,16 @@ class SearchDocumentsTool(BaseTool):
     name: str = "search_documents"  # 도구 이름
     description: str = "갤럭시 S25 매뉴얼에서 관련 정보를 검색합니다."  # 도구 설명
 
-    def analyze_image_relevance(self, image_url, query_text):
-        try:
-            query_embedding = cohere_embeddings.embed_query(query_text)  # 쿼리 임베딩 생성
-            
-            img_embedding = None  # 이미지 임베딩 저장
-            try:
-                resp = client.table("image_embeddings").select("embedding,metadata").eq("metadata->>image_url", image_url).execute()  #
-                if resp and resp.data and len(resp.data) > 0:  #
-                    if 'embedding' in resp.data[0]:  #
-                        embedding_str = resp.data[0]['embedding']  # 임베딩 문자열 추출
-                        if isinstance(embedding_str, str):  #
-                            try:
-                                embedding_str = embedding_str.replace(" ", "")  # 공백 제거
-                                img_embedding = ast.literal_eval(embedding_str)
-                            except:
-                                print(f"임베딩 문자열 파싱 실패: {embedding_str[:50]}...")
-                                img_embedding = None
-                        else:
-                            img_embedding = embedding_str
-                    metadata = resp.data[0].get('metadata', {})
-            except Exception as e:
-                print(f"이미지 임베딩 검색 오류: {str(e)}")
-                metadata = {}
-            
-            # 임베딩 유사도 계산 (기본 점수 0.5)
-            embedding_similarity = 0.5
-            if img_embedding:
-                try:
-                    # 코사인 유사도 계산
-                    norm_q = np.linalg.norm(query_embedding)
-                    norm_img = np.linalg.norm(img_embedding)
-                    if norm_q > 0 and norm_img > 0:
-                        embedding_similarity = np.dot(query_embedding, img_embedding) / (norm_q * norm_img)
-                        # 0~1 범위로 정규화
-                        embedding_similarity = (embedding_similarity + 1) / 2
-                        # numpy.float64를 Python float로 변환
-                        embedding_similarity = float(embedding_similarity)
-                except Exception as e:
-                    print(f"유사도 계산 오류: {str(e)}")
-                    embedding_similarity = 0.5
-            
-            # 위치 정보 추출 (URL 패턴 기반)
-            vertical_position = 0.5  # 기본값 (중간)
-            if "top" in image_url.lower() or "upper" in image_url.lower():
-                vertical_position = 0.2  # 위쪽
-            elif "bottom" in image_url.lower() or "lower" in image_url.lower():
-                vertical_position = 0.8  # 아래쪽
-            elif "mid" in image_url.lower() or "middle" in image_url.lower():
-                vertical_position = 0.5  # 중간
-            
-            # 기본 결과 설정
-            result = {
-                "vertical_position": float(vertical_position),
-                "relevance_score": float(embedding_similarity),
-                "embedding_similarity": float(embedding_similarity),
-                "metadata": metadata
-            }
-            
-            return result
-        except Exception as e:
-            print(f"이미지 분석 오류: {str(e)}")
-            return {
-                "vertical_position": 0.5,  # 기본값
-                "relevance_score": 0.5,  # 기본 관련성 점수
-                "embedding_similarity": 0.5
-            }
+    def _run(self, query: str) -> Tuple[str, Dict]:  # 검색 쿼리 처리 (구간 트리 기록, 느린 쿼리 로그)
+        with start_trace("search_docs_tool", slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS, query=query) as trace:
+            result_text, debug_info = self._search(query)
+            annotate(pages=debug_info.get("page_numbers", [])[:3])
+        debug_info["timing"] = trace.to_dict()  # 단계별 시작 시점/소요 시간/외부 호출 수
+        return result_text, debug_info
     
-    def get_all_page_images(self, page, query_text):
-        try:
-            # 해당 페이지의 모든 이미지 검색
-            resp = client.table("image_embeddings").select("*").eq("metadata->>page", str(page)).execute()
-            
-            if not resp or not resp.data or len(resp.data) == 0:
-                # URL 패턴으로 검색 시도
-                resp = client.table("image_embeddings").select("*").ilike("metadata->>image_url", f"%p{page}%").execute()
-                if not resp or not resp.data or len(resp.data) == 0:
-                    return []
-            
-            page_images = []
-            for item in resp.data:
-                if 'metadata' in item and item['metadata'] and 'image_url' in item['metadata']:
-                    img_url = item['metadata']['image_url']
-                    img_page = item['metadata'].get('page', page)
-                    
-                    # 이미지 관련성 분석
-                    img_analysis = self.analyze_image_relevance(img_url, query_text)
-                    
-                    # 이미지 정보 저장
-                    image_info = {
-                        "url": img_url,
-                        "page": img_page,
-                        "is_page_match": True,  # 같은 페이지이므로 항상 True
-                        "text_similarity": float(img_analysis["embedding_similarity"]),
-                        "vertical_position": float(img_analysis["vertical_position"]),
-                        "relevance_score": float(img_analysis["relevance_score"]),
-                        "score": float(0.7 * img_analysis["relevance_score"] + 0.3)  # 점수 계산 방식 수정
-                    }
-                    
-                    page_images.append(image_info)
-            
-            # 관련성 점수 기준 내림차순 정렬
-            page_images.sort(key=lambda x: x["relevance_score"], reverse=True)
-            return page_images
-            
-        except Exception as e:
-            print(f"페이지 이미지 검색 오류: {str(e)}")
-            return []
-    
-    def _run(self, query: str) -> Tuple[str, Dict]:  # 검색 쿼리 처리
-        normalized_query = query.strip().rstrip('.!?')  # 검색 쿼리 정규화
-        
-        debug_info = {  # 디버깅 정보 초기화
-            "query": normalized_query,  # 검색 쿼리
-            "results": [],  # 검색 결과 저장 
-            "image_results": [],  # 이미지 검색 결과 저장
-            "page_info": {},  # 페이지 정보 저장
-            "vertical_position": {}  # 이미지 위치 정보 저장
-        }
-        
-        try:
-            # 1. 텍스트 검색 수행
-            docs = hybrid_retriever.invoke(normalized_query)  # 검색 쿼리 처리
-            
-            if not docs:
-                return "매뉴얼에서 관련 정보를 찾을 수 없습니다.", debug_info  # 검색 결과 반환
-            
-            # 2. 검색 결과에서 페이지 정보 추출
-            page_info = {}  # 페이지 번호와 페이지별 점수
-            page_numbers = []  # 페이지 번호 리스트
-            
-            # 페이지 번호 직접 추출 (쿼리에서)
-            extracted_page = None
-            page_pattern = re.search(r'(?:페이지|page|p)?\s*(\d+)(?:페이지|쪽|page)?', normalized_query.lower())
-            if page_pattern:
-                extracted_page = page_pattern.group(1)
-                debug_info["extracted_page"] = extracted_page
-            
-            # 검색 결과에서 페이지 정보 수집
-            for rank, doc in enumerate(docs):
-                doc_page = None
-                
-                # 메타데이터에서 페이지 번호 추출
-                if "page" in doc.metadata:
-                    doc_page = str(doc.metadata["page"])
-                elif "category" in doc.metadata and doc.metadata["category"]:
-                    if isinstance(doc.metadata["category"], str) and "p" in doc.metadata["category"].lower():
-                        page_matches = re.findall(r'p(\d+)', doc.metadata["category"].lower())
-                        if page_matches:
-                            doc_page = page_matches[0]
-                
-                if doc_page:
-                    # 페이지별 점수 계산 (순위에 반비례)
-                    page_score = 1.0 / (rank + 1)
-                    
-                    # 쿼리에서 추출한 페이지와 일치하면 점수 가중치
-                    if extracted_page and doc_page == extracted_page:
-                        page_score *= 1.5
-                    
-                    # 페이지 정보 저장
-                    if doc_page not in page_info:
-                        page_info[doc_page] = {
-                            "score": page_score,
-                            "content": [doc.page_content]
-                        }
-                        page_numbers.append(doc_page)
-                    else:
-                        page_info[doc_page]["score"] += page_score
-                        page_info[doc_page]["content"].append(doc.page_content)
-            
-            # 페이지 점수 기준으로 정렬
-            sorted_pages = sorted([(page, info["score"]) for page, info in page_info.items()], 
-                                key=lambda x: x[1], reverse=True)
-            top_pages = [page for page, _ in sorted_pages]
-            
-            # 디버그 정보에 페이지 정보 추가
-            debug_info["page_numbers"] = top_pages
-            debug_info["page_info"] = {page: " ".join(page_info[page]["content"])[:200] 
-                                     for page in page_info}
-            debug_info["page_scores"] = {page: float(page_info[page]["score"]) 
-                                       for page in page_info}
-            
-            # 3. 이미지 검색 - 주요 페이지에 대한 검색 수행
-            all_images = []  # 모든 이미지 정보 저장
-
-            # 상위 페이지들에 대해 이미지 검색 수행
-            page_specific_queries = []
-
-            # 페이지별 이미지 검색 쿼리 구성
-            if top_pages:
-                # 1. 전체 쿼리로 모든 이미지 검색
-                page_specific_queries.append((normalized_query, None))
-                
-                # 2. 상위 3개 페이지에 대한 페이지별 검색
-                for page in top_pages[:3]:
-                    page_specific_queries.append((f"{normalized_query} 페이지 {page}", page))
+    def _search(self, query: str) -> Tuple[str, Dict]:  # 검색 쿼리 처리 (앱과 같은 단계별 파이프라인, 이미지 정보는 컨텍스트에 포함)
+        return search_pipeline.run(query, inline_images=True, reference_tip=True)
 
-            # 각 쿼리에 대해 이미지 검색 수행
-            for query, page_filter in page_specific_queries:
-                # 이미지 검색 수행
-                try:
-                    image_docs = []
-                    
-                    # 페이지 특정 검색일 경우 해당 페이지로 필터링
-                    if page_filter:
-                        image_docs = vector_retriever.invoke(query, page_filter=page_filter)
-                    else:
-                        # 일반 검색은 더 많은 결과 가져오기 - 여기 수정
-                        image_docs = vector_retriever.invoke(query)
-                        
-                        # 여전히 이미지가 없으면 마지막 시도: 직접 테이블에서 검색된 페이지의 이미지만 가져오기
-                        if not any(doc.metadata.get('image_url') for doc in image_docs):
-                            try:
-                                # 디버그 모드 여부 확인을 위한 함수 추가
-                                def is_debug_mode():
-                                    # __main__ 모듈에 debug_mode 변수가 있으면 가져옴
-                                    return debug_mode if 'debug_mode' in globals() else False
-                                
-                                # 디버그 모드일 때만 출력
-                                if is_debug_mode():
-                                    print(f"\n✅ 이미지 탐색: 페이지 {top_pages}에 해당하는 이미지만 직접 가져오기")
-                                
-                                # 메타데이터 필드 중 page 필드가 top_pages 중 하나와 일치하는 레코드 검색
-                                for page in top_pages:
-                                    try:
-                                        # 메타데이터에서 페이지가 일치하는 레코드 검색 (올바른 방법으로 수정)
-                                        resp = client.table("image_embeddings").select("*").eq("metadata->>page", str(page)).execute()
-                                        
-                                        if resp and resp.data and len(resp.data) > 0:
-                                            # 디버그 모드일 때만 출력
-                                            if is_debug_mode():
-                                                print(f"\n✅ 성공: 페이지 {page}에서 {len(resp.data)}개 이미지를 찾았습니다!")
-                                            
-                                            for item in resp.data:
-                                                if 'metadata' in item and item['metadata'] and 'image_url' in item['metadata']:
-                                                    img_url = item['metadata']['image_url']
-                                                    img_page = item['metadata'].get('page', 'unknown')
-                                                    
-                                                    # 디버그 모드일 때만 출력
-                                                    if is_debug_mode():
-                                                        print(f"  ✓ 이미지(페이지 {img_page}): {img_url[:50]}...")
-                                                    
-                                                    # Document 객체 생성
-                                                    doc = Document(
-                                                        page_content="이미지 문서", 
-                                                        metadata={
-                                                            'image_url': img_url,
-                                                            'page': img_page,
-                                                            'is_page_match': True,
-                                                            'score': float(1.0),  # 하드코딩된 값 수정
-                                                            'relevance_score': float(0.5),  # 임베딩 분석 없이 기본값 설정
-                                                            'source': 'direct_db_query'
-                                                        }
-                                                    )
-                                                    image_docs.append(doc)
-                                                    # 하나만 찾아도 충분
-                                                    break
-                                    except Exception as page_err:
-                                        # 디버그 모드일 때만 출력
-                                        if is_debug_mode():
-                                            print(f"  페이지 {page} 검색 오류: {page_err}")
-                                        
-                                        # URL에 페이지 번호가 포함된 이미지 검색 시도
-                                        try:
-                                            # URL 패턴 검색
-                                            resp = client.table("image_embeddings").select("*").ilike("metadata->>image_url", f"%p{page}%").execute()
-                                            
-                                            if resp and resp.data and len(resp.data) > 0:
-                                                # 디버그 모드일 때만 출력
-                                                if is_debug_mode():
-                                                    pass
-                                                
-                                                for item in resp.data:
-                                                    if 'metadata' in item and item['metadata'] and 'image_url' in item['metadata']:
-                                                        img_url = item['metadata']['image_url']
-                                                        
-                                                        # 디버그 모드일 때만 출력
-                                                        if is_debug_mode():
-                                                            print(f"  ✓ URL 패턴 이미지(페이지 {page}): {img_url[:50]}...")
-                                                        
-                                                        # Document 객체 생성
-                                                        doc = Document(
-                                                            page_content="이미지 문서", 
-                                                            metadata={
-                                                                'image_url': img_url,
-                                                                'page': page,  # 패턴에서 찾았으므로 검색한 페이지 번호 사용
-                                                                'is_page_match': True,
-                                                                'score': float(1.0),  # 하드코딩된 값 수정
-                                                                'relevance_score': float(0.5),  # 임베딩 분석 없이 기본값 설정
-                                                                'source': 'url_pattern_query'
-                                                            }
-                                                        )
-                                                        image_docs.append(doc)
-                                                        # 하나만 찾아도 충분
-                                                        break
-                                        except Exception as url_err:
-                                            # 디버그 모드일 때만 출력
-                                            if is_debug_mode():
-                                                print(f"  페이지 {page} URL 패턴 검색 오류: {url_err}")
-                                    
-                                    # 이미지를 찾았는지 확인
-                                    if not any(doc.metadata.get('image_url') for doc in image_docs):
-                                        # 디버그 모드일 때만 출력
-                                        if is_debug_mode():
-                                            print("  ❌ 실패: 어떤 페이지에서도 이미지를 찾지 못했습니다.")
-                                        
-                                        # 마지막 대안: 이미지 테이블에서 아무 이미지나 5개 가져오기
-                                        try:
-                                            resp = client.table("image_embeddings").select("*").limit(5).execute()
-                                            
-                                            if resp and resp.data and len(resp.data) > 0:
-                                                # 디버그 모드일 때만 출력
-                                                if is_debug_mode():
-                                                    pass
-                                                
-                                                for item in resp.data:
-                                                    if 'metadata' in item and item['metadata'] and 'image_url' in item['metadata']:
-                                                        img_url = item['metadata']['image_url']
-                                                        img_page = item['metadata'].get('page', 'unknown')
-                                                        
-                                                        # Document 객체 생성
-                                                        doc = Document(
-                                                            page_content="이미지 문서", 
-                                                            metadata={
-                                                                'image_url': img_url,
-                                                                'page': img_page,
-                                                                'score': 1.0,  # 낮은 점수 부여
-                                                                'relevance_score': 0.9,  # 관련성 점수 추가
-                                                                'source': 'fallback_image'
-                                                            }
-                                                        )
-                                                        image_docs.append(doc)
-                                        except Exception as fallback_err:
-                                            # 디버그 모드일 때만 출력
-                                            if is_debug_mode():
-                                                print(f"대안 이미지 검색 오류: {fallback_err}")
-                            except Exception as direct_err:
-                                # 디버그 모드일 때만 출력
-                                if is_debug_mode():
-                                    print(f"직접 데이터베이스 쿼리 오류: {direct_err}")
-                    
-                    # 검색된 이미지 정보 처리
-                    for img_doc in image_docs:
-                        if 'image_url' in img_doc.metadata:
-                            # 이미지 URL과 메타데이터 추출
-                            url = img_doc.metadata['image_url']
-                            
-                            # 이미 처리된 URL인지 확인 (중복 방지)
-                            if any(img["url"] == url for img in all_images):
-                                continue
-                            
-                            # 페이지 정보 추출
-                            img_page = None
-                            if "page" in img_doc.metadata:
-                                img_page = str(img_doc.metadata["page"])
-                            
-                            # 페이지 정보가 없으면 URL에서 추출 시도
-                            if not img_page:
-                                for pattern in [
-                                    r"p(\d+)", r"page(\d+)", r"_(\d+)_", r"_(\d+)\.", 
-                                    r"-(\d+)-", r"-(\d+)\.", r"/(\d+)/", r"(\d+)\.jpg",
-                                    r"_p(\d+)_", r"p(\d+)_", r"_p(\d+)\.", r"figure_p(\d+)"
-                                ]:
-                                    page_matches = re.findall(pattern, url.lower())
-                                    if page_matches:
-                                        img_page = page_matches[0]
-                                        break
-                            
-                            # 여전히 페이지 정보가 없으면 JSON 메타데이터에서 추출 시도
-                            if not img_page and 'metadata' in img_doc.metadata and img_doc.metadata['metadata']:
-                                try:
-                                    meta_json = json.loads(img_doc.metadata['metadata'])
-                                    if 'page' in meta_json:
-                                        img_page = str(meta_json['page'])
-                                except:
-                                    pass
-                            
-                            # URL에 페이지 번호가 포함되어 있는지 확인
-                            is_page_match = False
-                            if img_page and img_page in top_pages:
-                                is_page_match = True
-                            
-                            # 점수 계산 (개선된 방식)
-                            url_match_score = 0.7 if is_page_match else 0.1  # 페이지 매칭 점수 증가
-                            text_match_score = min(0.5, float(img_doc.metadata.get('similarity', 0)))
-                            
-                            # 최종 점수 계산
-                            image_score = url_match_score + text_match_score
-                            
-                            # 이미지 정보 저장
-                            image_info = {
-                                "url": url,
-                                "page": img_page,
-                                "is_page_match": is_page_match,
-                                "text_similarity": float(img_doc.metadata.get('similarity', 0)),
-                                "vertical_position": 0.5,  # 기본값
-                                "score": image_score,
-                                "search_query": query
-                            }
-                            # fallback으로 score값을 relevance_score에도 기록해 두자
-                            image_info["relevance_score"] = image_score
-                            
-                            all_images.append(image_info)
-                except Exception as e:
-                    debug_info["image_search_error"] = str(e)
-                    import traceback
-                    debug_info["image_search_traceback"] = traceback.format_exc()
-            
-            # 4. 이미지 정보 처리 및 상위 이미지 선택
-            best_images = []  # 여러 이미지 저장용 리스트로 변경
-            best_image_scores = []
-            
-            if all_images:
-                # 이미지 검색 결과 디버깅
-                debug_info["found_images"] = len(all_images)
-                debug_info["image_pages"] = [img.get("page") for img in all_images if img.get("page")]
-                
-                # 페이지 매칭 필터링 강화
-                # 1. 검색된 페이지와 일치하는 이미지만 필터링
-                matched_images = [img for img in all_images if str(img.get("page")) in [str(p) for p in top_pages]]
-                
-                # 2. 일치하는 이미지가 있으면 해당 이미지 중에서 선택
-                if matched_images:
-                    # 디버그 모드일 때만 출력
-                    if 'debug_mode' in globals() and debug_mode:
-                        pass
-                    
-                    sorted_images = sorted(matched_images, key=lambda x: x["score"], reverse=True)
-                    
-                    # 페이지별 이미지 그룹화
-                    page_groups = {}
-                    for img in sorted_images:
-                        if img.get("page"):
-                            page = str(img.get("page"))
-                            if page not in page_groups:
-                                page_groups[page] = []
-                            page_groups[page].append(img)
-                    
-                    # 베스트 페이지의 모든 이미지 가져오기
-                    if page_groups:
-                        # 점수가 가장 높은 이미지의 페이지
-                        best_page = sorted_images[0].get("page")
-                        
-                        # 해당 페이지의 모든 이미지 가져오기 - 클래스 메서드로 호출
-                        all_page_images = self.get_all_page_images(best_page, normalized_query)
-                        
-                        # 기존 검색 결과와 합치기
-                        if best_page in page_groups:
-                            existing_urls = [img["url"] for img in page_groups[best_page]]
-                            for img in all_page_images:
-                                if img["url"] not in existing_urls:
-                                    page_groups[best_page].append(img)
-                        
-                        # 가장 관련성 높은 최대 3개 이미지 선택
-                        if best_page in page_groups:
-                            page_images = sorted(
-                                page_groups[best_page],
-                                key=lambda x: x.get("relevance_score", x.get("score", 0)),  # relevance_score가 없으면 score 사용
-                                reverse=True
-                            )
-                            best_images = page_images[:3]  # 최대 3개
-                            best_image_scores = [img["score"] for img in best_images]
-                            
-                            # 검색 결과 텍스트와 이미지 임베딩의 관련성 평가 추가
-                            if len(best_images) > 0:
-                                try:
-                                    # 검색 결과 텍스트 추출
-                                    result_texts = []
-                                    if docs:
-                                        result_texts = [doc.page_content for doc in docs[:3]]  # 상위 3개 문서만 사용
-                                    
-                                    if result_texts:
-                                        # 결과 텍스트 합치기
-                                        combined_text = " ".join(result_texts)
-                                        
-                                        # 각 이미지별로 텍스트와의 관련성 점수 계산
-                                        for img in best_images:
-                                            # 이미지 URL에서 임베딩 가져오기
-                                            img_result = self.analyze_image_relevance(img["url"], combined_text)
-                                            # 텍스트 관련성 점수 업데이트
-                                            img["text_relevance"] = float(img_result.get("relevance_score", 0.5))
-                                            # relevance_score 값을 text_relevance로 업데이트하여 최종 결과에 정확히 표시되도록 함
-                                            img["relevance_score"] = float(img["text_relevance"])
-                                            
-                                            # 디버그 모드일 때만 출력
-                                            if 'debug_mode' in globals() and debug_mode:
-                                                print(f"\n✅ 이미지 텍스트 관련성 계산: {img['url'][-10:]}, 매칭: {img.get('score', 0):.4f}, 텍스트 관련성: {img.get('text_relevance', 0):.4f}")
-                                            
-                                            # 이미지가 2개 이상인 경우에만 정렬 (1개면 그대로 유지)
-                                            if len(best_images) > 1:
-                                                # 텍스트 관련성 점수 기준으로 재정렬
-                                                best_images = sorted(best_images, key=lambda x: float(x.get("text_relevance", x.get("relevance_score", 0))), reverse=True)
-                                            
-                                            # 디버그 정보에 텍스트 관련성 점수 추가
-                                            debug_info["text_relevance_scores"] = {
-                                                img["url"]: img.get("text_relevance", 0) for img in best_images
-                                            }
-                                            debug_info["score_calculation"] = "텍스트 관련성 점수 기준으로 이미지 선택됨"
-                                            debug_info["text_comparison_result"] = "텍스트와 이미지 관련성 비교 완료"
-                                            
-                                            # 이미지 수에 따른 메시지 출력
-                                            if len(best_images) > 1:
-                                                # 디버그 모드일 때만 출력
-                                                if 'debug_mode' in globals() and debug_mode:
-                                                    print(f"   ✓ 검색 결과 텍스트와 이미지 관련성 비교 완료, 텍스트 관련성 기준으로 최적 이미지 선택됨")
-                                            else:
-                                                # 디버그 모드일 때만 출력
-                                                if 'debug_mode' in globals() and debug_mode:
-                                                    print(f"검색 결과 텍스트와 단일 이미지의 관련성 분석 완료")
-                                except Exception as compare_err:
-                                    # 디버그 모드일 때만 출력
-                                    if 'debug_mode' in globals() and debug_mode:
-                                        print(f"텍스트-이미지 비교 중 오류: {str(compare_err)}")
-                                    debug_info["text_comparison_error"] = str(compare_err)
-                else:
-                    # 일치하는 이미지가 없으면 전체 이미지 중에서 선택
-                    # 디버그 모드일 때만 출력
-                    if 'debug_mode' in globals() and debug_mode:
-                        print(f"✅ 검색된 페이지와 일치하는 이미지가 없음. 전체 {len(all_images)}개 이미지에서 선택")
-                    
-                    sorted_images = sorted(all_images, key=lambda x: x["score"], reverse=True)
-                    if sorted_images:
-                        best_images = [sorted_images[0]]
-                        best_image_scores = [sorted_images[0]["score"]]
-                        
-                        # 일치하는 이미지가 없는 경우에도 텍스트 관련성 분석 추가
-                        try:
-                            # 검색 결과 텍스트 추출
-                            result_texts = []
-                            if docs:
-                                result_texts = [doc.page_content for doc in docs[:3]]  # 상위 3개 문서만 사용
-                            
-                            if result_texts:
-                                # 결과 텍스트 합치기
-                                combined_text = " ".join(result_texts)
-                                
-                                # 이미지의 텍스트와의 관련성 점수 계산
-                                img = best_images[0]
-                                img_result = self.analyze_image_relevance(img["url"], combined_text)
-                                img["text_relevance"] = float(img_result.get("relevance_score", 0.5))
-                                # relevance_score 값을 text_relevance로 업데이트하여 최종 결과에 정확히 표시되도록 함
-                                img["relevance_score"] = float(img["text_relevance"])
-                                # 디버그 모드일 때만 출력
-                                if 'debug_mode' in globals() and debug_mode:
-                                    print(f"일치하지 않는 이미지 텍스트 관련성 계산: {img['url'][-10:]}, 관련성: {img['text_relevance']:.4f}")
-                                
-                                # 디버그 정보에 텍스트 관련성 점수 추가
-                                debug_info["text_relevance_scores"] = {
-                                    img["url"]: img.get("text_relevance", 0) for img in best_images
-                                }
-                        except Exception as compare_err:
-                            # 디버그 모드일 때만 출력
-                            if 'debug_mode' in globals() and debug_mode:
-                                print(f"일치하지 않는 이미지 관련성 분석 오류: {str(compare_err)}")
-                            debug_info["non_matching_comparison_error"] = str(compare_err)
-            
-            # 이미지가 하나 이상 선택되었는지 확인
-            if best_images:
-                best_image = best_images[0]  # 기존 호환성 유지
-                best_image_score = best_image["score"]
-                
-                # 페이지 매칭 정보 추가
-                best_image["is_page_match"] = str(best_image.get("page")) in [str(p) for p in top_pages]
-                
-                for img in best_images:
-                    img["is_page_match"] = str(img.get("page")) in [str(p) for p in top_pages]
-                
-                # 일치하지 않는 경우 경고 출력
-                if not best_image["is_page_match"]:
-                    # 디버그 모드일 때만 출력
-                    if 'debug_mode' in globals() and debug_mode:
-                        print(f"⚠️ 경고: 선택된 이미지(페이지 {best_image.get('page')})는 검색된 페이지({top_pages})와 일치하지 않습니다.")
-                
-                # 페이지 매칭 관련 디버그 정보 추가
-                debug_info["best_image_matches_search_page"] = best_image["is_page_match"]
-                debug_info["best_images_count"] = len(best_images)
-                
-                # 이미지 목록 디버그 정보에 추가
-                debug_info["best_images"] = best_images
-                debug_info["best_image_scores"] = best_image_scores
-                
-                # 위치 정보 (있을 경우)
-                position_value = best_image.get("vertical_position", 0.5)
-                if position_value < 0.3:
-                    position_text = "위쪽"
-                elif position_value > 0.7:
-                    position_text = "아래쪽"
-                else:
-                    position_text = "중간"
-                
-                # 디버그 모드일 때만 출력
-                if 'debug_mode' in globals() and debug_mode:
-                    pass
-                    # 페이지 일치 여부
-                    is_matched = img.get("is_page_match", False)
-                    pass
-                    
-                    # 페이지 불일치 시 추가 디버깅
-                    if not is_matched:
-                        print(f"이미지 페이지: {img['page']}, 검색된 페이지: {state['debug_info']['page_numbers']}")
-
-            # 5. 최종 결과 구성
-            result_text = ""
-            
-            # 최적의 페이지 기준으로 결과 재정렬
-            top_page = top_pages[0] if top_pages else None
-            
-            # 가장 좋은 이미지가 있으면 그 페이지를 최상위로
-            if best_images:
-                top_page = best_images[0]["page"]
-            
-            # 해당 페이지 문서를 상위로 재정렬
-            reordered_docs = []
-            for doc in docs:
-                doc_page = None
-                if "page" in doc.metadata:
-                    doc_page = str(doc.metadata["page"])
-                
-                if doc_page == top_page:
-                    reordered_docs.insert(0, doc)
-                else:
-                    reordered_docs.append(doc)
-            
-            # 결과가 5개 이상이면 5개로 제한
-            if len(reordered_docs) > 5:
-                reordered_docs = reordered_docs[:5]
-            
-            # 참조 페이지 목록 저장
-            reference_pages = []
-            for doc in reordered_docs:
-                if "page" in doc.metadata:
-                    page = str(doc.metadata["page"])
-                    if page not in reference_pages:
-                        reference_pages.append(page)
-            
-            # 텍스트 결과 구성
-            for i, doc in enumerate(reordered_docs):
-                result_text += f"내용: {doc.page_content}\n"
-                result_text += f"카테고리: {doc.metadata.get('category','없음')}\n"
-                result_text += f"페이지: {doc.metadata.get('page','없음')}\n"
-                
-                # 첫 번째 문서에 이미지들 추가 (최소 관련성 점수 기준 추가)
-                if i == 0 and best_images:
-                    # 관련성 점수 및 매칭 점수 임계값 설정 (변경: 0.4 -> 0.5, 매칭 점수 0.6 추가)
-                    relevance_threshold = 0.5
-                    matching_threshold = 0.6
-                    
-                    # 두 임계값을 모두 만족하는 이미지만 필터링
-                    filtered_images = [img for img in best_images 
-                                      if float(img.get("text_relevance", img.get("relevance_score", 0))) >= relevance_threshold 
-                                      and img.get("score", 0) >= matching_threshold]
-                    
-                    # 임계값을 넘는 이미지가 있는 경우에만 이미지 추가
-                    if filtered_images:
-                        # 모든 베스트 이미지 URL 추가
-                        for j, img in enumerate(filtered_images):
-                            result_text += f"[이미지 {j+1}]"
-                            if j == 0:
-                                result_text += " 👑 텍스트와 가장 관련성 높은 이미지"
-                            result_text += f"\n{img['url']}\n"
-                            result_text += f"페이지: {img.get('page', '알 수 없음')}\n"
-                            
-                            # 관련성 점수가 낮은 경우 명시적으로 표시 (변경: 조건 수정)
-                            relevance_score = float(img.get('text_relevance', img.get('relevance_score', 0)))
-                            match_score = float(img.get('score', 0))
-
-                            if relevance_score < 0.65 or match_score < 0.7:
-                                result_text += f"[참고: 이 이미지는 질문과의 관련성이 다소 낮을 수 있습니다. 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
-                            elif relevance_score >= 0.8:
-                                result_text += f"[이 이미지는 질문과 매우 관련성이 높습니다. 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
-                            else:
-                                result_text += f"[이미지 {j+1} 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
-                    else:
-                        # 낮은 관련성으로 인해 이미지를 표시하지 않음을 기록
-                        debug_info["images_filtered_due_to_low_relevance"] = True
-                
-                result_text += "\n"
-                
-                # 디버그 정보 저장
-                item = {
-                    "rank": i+1,
-                    "source": doc.metadata.get("source", "알 수 없음"),
-                    "score": float(doc.metadata.get("score", 0)),
-                    "page": doc.metadata.get("page", "없음"),
-                    "category": doc.metadata.get("category", "없음"),
-                    "section": doc.metadata.get("section", "없음"),
-                    "preview": doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
-                }
-                
-                # 이미지 정보 추가
-                if i == 0 and best_images:
-                    item["images"] = []
-                    for img in best_images:
-                        item["images"].append({
-                            "url": img["url"],
-                            "page": img.get("page", "알 수 없음"),
-                            "score": float(img["score"]),
-                            "relevance_score": float(img.get("text_relevance", img.get("relevance_score", 0)))
-                        })
-                
-                debug_info["results"].append(item)
-            
-            # 베스트 이미지가 없는 경우에 추가 이미지 검색 시도 - 삭제 (요청 1번)
-            # 기존 코드 제거 (추가 이미지 검색 코드 전체 제거)
-
-            # 참조 페이지 정보 추가
-            if reference_pages:
-                reference_pages.sort()
-                
-                # 주요 페이지만 표시 (최대 2개)
-                if len(reference_pages) > 2:
-                    main_pages = reference_pages[:2]
-                    reference_text = "\n\n💡 추가 정보가 필요하면 매뉴얼의 관련 섹션을 참고해보세요."
-                else:
-                    reference_text = "\n\n💡 이 기능에 대해 더 알고 싶으시면 매뉴얼의 관련 섹션을 참고해보세요."
-                
-                result_text += reference_text
-                debug_info["reference_pages"] = reference_pages
-
-            # 이미지 검색 결과 디버깅 정보 개선 (추가)
-            if not best_images:
-                debug_info["no_image_reason"] = "이미지를 찾지 못했거나 검색된 페이지와 일치하는 이미지가 없음"
-                
-                # 검색된 모든 이미지 페이지 정보 저장
-                all_image_pages = []
-                for img in all_images:
-                    if "page" in img:
-                        all_image_pages.append(img["page"])
-                
-                if all_image_pages:
-                    debug_info["found_image_pages"] = all_image_pages
-                    debug_info["found_images_count"] = len(all_images)
-                    
-                    # 페이지 불일치 확인
-                    debug_info["page_mismatch"] = all(str(p) not in top_pages for p in all_image_pages)
-                    debug_info["found_pages_not_in_search"] = True
-
-            return result_text, debug_info  # 검색 결과 반환
-            
-        except Exception as e:  # 오류 처리
-            import traceback
-            debug_info["error"] = str(e)
-            debug_info["traceback"] = traceback.format_exc()
-            return "검색 중 오류가 발생했습니다: " + str(e), debug_info  # 오류 반환
 
 # 5-3. LangGraph 에이전트 노드 구성
 workflow = StateGraph(AgentState)  # 상태 그래프 생성
@@ -0,0 +1,272 @@
+# 이미지 임베딩 인메모리 인덱스 모듈
+# image_embeddings 테이블의 임베딩을 한 번 읽어 정규화된 행렬(float32, 또는 quantization.py의 int8)로 보관하고,
+# 후보 이미지 전체를 행렬-벡터 곱 한 번으로 점수화한다.
+# 행렬은 최초 로딩 시점의 스냅샷이다. reload_interval(INDEX_RELOAD_INTERVAL)을 주지 않으면 이후 테이블 변경은
+# 재시작 전까지 반영되지 않는다 (다시 로딩 방식은 index_loading.py 참고).
+
+import logging  # 로딩 로그
+import re  # URL의 페이지 패턴 추출
+import threading  # 로딩 동시성 제어
+import time  # 로딩 시각 기록
+from typing import Any, Dict, Iterable, List, Optional, Tuple  # 타입 힌트
+
+import numpy as np  # 행렬 연산
+
+from index_loading import LazyLoading  # 지연 로딩 / 실패 후 재시도 대기
+from quantization import QuantizedMatrix  # int8 임베딩 저장
+from vector_codec import decode_vector  # pgvector 임베딩 디코딩
+from tracing import external_call  # 요청 구간의 외부 호출 수 기록
+
+logger = logging.getLogger(__name__)
+
+
+_URL_PAGE_PATTERN = re.compile(r"p(\d+)")  # ILIKE '%p{page}%' 대체용 URL 페이지 패턴
+
+
+def page_key(page: Any) -> Optional[str]:
+    """페이지 값을 조회 키로 정규화 (12, "12", "012" -> "12")"""
+    if page is None:
+        return None
+    text = str(page).strip()
+    return str(int(text)) if text.isdigit() else (text or None)
+
+
+def _url_page_keys(url: str) -> List[str]:
+    """ILIKE '%p{page}%'와 같은 결과가 나오도록 URL의 p숫자 패턴마다 모든 숫자 접두어를 키로 사용 ("p12" -> "1", "12")"""
+    keys = set()
+    for digits in _URL_PAGE_PATTERN.findall(url.lower()):
+        keys.update(digits[:i] for i in range(1, len(digits) + 1))
+    return list(keys)
+
+
+class _IndexState:
+    """원자적으로 교체되는 인덱스 스냅샷"""
+    __slots__ = ("matrix", "url_to_row", "metadatas", "loaded_at", "page_to_rows", "url_page_to_rows")
+
+    def __init__(self, matrix: QuantizedMatrix, url_to_row: Dict[str, int], metadatas: List[Dict[str, Any]], loaded_at: float,
+                 page_to_rows: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 url_page_to_rows: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.matrix = matrix  # (이미지 수, 차원) 정규화된 행렬 (float32 / int8)
+        self.url_to_row = url_to_row  # 이미지 URL -> 행 번호
+        self.metadatas = metadatas  # 행 번호별 메타데이터
+        self.loaded_at = loaded_at  # 로딩 시각
+        self.page_to_rows = page_to_rows or {}  # 메타데이터 페이지 -> 이미지 행 목록
+        self.url_page_to_rows = url_page_to_rows or {}  # URL 페이지 패턴 -> 이미지 행 목록 (페이지가 일치하는 이미지가 없을 때 사용)
+
+
+class ImageEmbeddingIndex(LazyLoading):
+    index_name = "이미지 임베딩 인덱스"
+
+    def __init__(self, client, table_name: str = "image_embeddings", page_size: int = 500, compact_rpc: Optional[str] = "get_image_embeddings_compact",
+                 quantization: str = "float32", rescore: int = 4, exact_dir: Optional[str] = None, retry_after: float = 30.0,
+                 reload_interval: float = 0.0):
+        super().__init__(retry_after, reload_interval)  # 실패 후 재시도 대기 / 주기적 다시 로딩
+        self.client = client  # Supabase 클라이언트
+        self.table_name = table_name  # 이미지 임베딩 테이블 이름
+        self.page_size = page_size  # 한 번에 읽어올 행 수
+        self.compact_rpc = compact_rpc  # 임베딩을 바이너리(base64)로 돌려주는 RPC 이름 (None이면 테이블 직접 조회)
+        self.quantization = quantization  # 임베딩 저장 형식 (float32 / int8)
+        self.rescore = rescore  # 원본 재점수화 후보 배수 (0이면 양자화 점수 그대로 사용)
+        self.exact_dir = exact_dir  # 재점수화용 원본 행렬 파일 디렉터리 (None이면 재점수화 안 함)
+        self._state: Optional[_IndexState] = None  # 현재 인덱스 스냅샷
+        self._lock = threading.Lock()  # 중복 로딩 방지
+
+    @property
+    def loaded(self) -> bool:
+        return self._state is not None
+
+    def _table_page(self, start: int) -> List[Dict[str, Any]]:
+        resp = self.client.table(self.table_name).select("embedding,metadata").range(start, start + self.page_size - 1).execute()
+        return resp.data or []
+
+    def _rpc_page(self, start: int) -> List[Dict[str, Any]]:
+        resp = self.client.rpc(self.compact_rpc, {"row_offset": start, "row_limit": self.page_size}).execute()
+        return resp.data or []
+
+    def _fetch_rows(self) -> Iterable[Dict[str, Any]]:
+        fetch_page = self._table_page
+        if self.compact_rpc:  # 압축 형식 RPC를 우선 사용하고, 없으면 테이블 조회로 대체
+            try:
+                rows = self._rpc_page(0)
+                fetch_page = self._rpc_page
+            except Exception as e:
+                logger.warning(f"압축 형식 RPC({self.compact_rpc}) 사용 불가, 테이블 조회로 대체: {str(e)}")
+                rows = self._table_page(0)
+        else:
+            rows = self._table_page(0)
+
+        start = 0
+        while True:  # 페이지 단위로 전체 테이블 조회
+            yield from rows
+            if len(rows) < self.page_size:
+                break
+            start += self.page_size
+            rows = fetch_page(start)
+
+    def load(self) -> "ImageEmbeddingIndex":
+        """테이블 전체를 읽어 새 행렬을 만들고 기존 스냅샷과 교체"""
+        started = time.perf_counter()
+        vectors: List[np.ndarray] = []
+        url_to_row: Dict[str, int] = {}
+        metadatas: List[Dict[str, Any]] = []
+
+        page_to_rows: Dict[str, List[Dict[str, Any]]] = {}
+        url_page_to_rows: Dict[str, List[Dict[str, Any]]] = {}
+        seen_urls = set()
+
+        for row_data in self._fetch_rows():
+            metadata = row_data.get("metadata") or {}
+            url = metadata.get("image_url")
+            if not url or url in seen_urls:  # URL이 없거나 중복이면 건너뜀
+                continue
+            seen_urls.add(url)
+
+            # 페이지 -> 이미지 색인 (임베딩이 없는 이미지도 포함)
+            page = page_key(metadata.get("page", row_data.get("page")))
+            if page is not None:
+                page_to_rows.setdefault(page, []).append({"metadata": metadata})
+            for key in _url_page_keys(url):
+                url_page_to_rows.setdefault(key, []).append({"metadata": metadata})
+
+            try:
+                vector = decode_vector(row_data.get("embedding"))
+            except (ValueError, TypeError):  # 손상된 임베딩은 건너뜀
+                logger.warning(f"이미지 임베딩 파싱 실패: {url[:50]}")
+                continue
+            if vector is None or vector.ndim != 1 or (vectors and vector.shape[0] != vectors[0].shape[0]):
+                continue
+
+            url_to_row[url] = len(vectors)
+            vectors.append(vector)
+            metadatas.append(metadata)
+
+        if vectors:
+            matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)  # 연속 메모리 행렬
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms  # 미리 정규화하여 내적 = 코사인 유사도
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        del vectors
+        matrix = QuantizedMatrix(matrix, self.quantization, self.rescore, self.exact_dir)
+
+        self._state = _IndexState(matrix, url_to_row, metadatas, time.time(), page_to_rows, url_page_to_rows)  # 원자적 교체
+        logger.info(f"이미지 임베딩 인덱스 로딩 완료: {len(url_to_row)}개, {(time.perf_counter() - started) * 1000:.1f} ms")
+        return self
+
+    def share(self, store, name: str = "image") -> None:
+        """임베딩 행렬을 공유 메모리(SharedArrayStore)로 이동 (fork 전 부모 프로세스에서 호출, 이후 다시 로딩하면 워커별 사본)"""
+        state = self._state
+        if state is not None:
+            state.matrix.share(store, f"{name}-matrix")
+
+    def __contains__(self, image_url: str) -> bool:
+        state = self._state
+        return state is not None and image_url in state.url_to_row
+
+    def __len__(self) -> int:
+        state = self._state
+        return len(state.url_to_row) if state is not None else 0
+
+    def get_metadata(self, image_url: str) -> Optional[Dict[str, Any]]:
+        state = self.ensure_loaded()
+        if state is None or image_url not in state.url_to_row:
+            return None
+        return state.metadatas[state.url_to_row[image_url]]
+
+    def page_rows(self, page: Any) -> Optional[List[Dict[str, Any]]]:
+        """페이지의 이미지 행 목록 ({"metadata": ...}) - 인덱스를 쓸 수 없으면 None
+
+        메타데이터 페이지가 일치하는 이미지가 없으면 URL 패턴(p{page})으로 찾는다 (기존 ILIKE 대체 조회와 동일).
+        """
+        state = self.ensure_loaded()
+        if state is None:
+            return None
+        key = page_key(page)
+        return list(state.page_to_rows.get(key) or state.url_page_to_rows.get(key) or [])
+
+    def find_page_rows(self, page: Any) -> List[Dict[str, Any]]:
+        """페이지의 이미지 행 목록 (인덱스 우선, 인덱스를 쓸 수 없으면 DB 조회)"""
+        rows = self.page_rows(page)
+        if rows is None:
+            rows = fetch_page_image_rows(self.client, page, self.table_name)
+        return rows
+
+    def vectors(self, image_urls: List[str]) -> Tuple[List[str], np.ndarray]:
+        """인덱스에 있는 후보 이미지의 정규화된 float32 임베딩 (URL 목록, (URL 수, 차원) 행렬) - 원본이 없으면 역양자화"""
+        state = self.ensure_loaded()
+        if state is None or not image_urls or state.matrix.size == 0:
+            return [], np.empty((0, 0), dtype=np.float32)
+
+        urls = [url for url in dict.fromkeys(image_urls) if url in state.url_to_row]  # 중복 제거 후 인덱스에 있는 URL만
+        if not urls:
+            return [], np.empty((0, state.matrix.shape[1]), dtype=np.float32)
+        rows = np.fromiter((state.url_to_row[url] for url in urls), dtype=np.intp, count=len(urls))
+        return urls, state.matrix.float32(rows)
+
+    def score(self, query_embedding, image_urls: List[str]) -> Dict[str, float]:
+        """후보 이미지들의 코사인 유사도를 행렬-벡터 곱 한 번으로 계산 (인덱스에 없는 URL은 제외)"""
+        urls, matrix = self.vectors(image_urls)
+        if not urls:
+            return {}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != matrix.shape[1]:
+            return {}
+        similarities = matrix @ (query / norm)  # 후보 행만 원본(없으면 양자화 행렬)으로 행렬-벡터 곱
+        return {url: float(sim) for url, sim in zip(urls, similarities)}
+
+    def search(self, query_embedding, k: int = 3) -> Optional[List[Tuple[Dict[str, Any], float]]]:
+        """전체 이미지 중 쿼리와 가장 유사한 k개 (메타데이터, 유사도) - 인덱스를 쓸 수 없으면 None
+
+        match_image_embeddings RPC(similarity_search_by_vector)와 같은 정확한 코사인 검색을 프로세스 안에서 수행한다.
+        """
+        state = self.ensure_loaded()
+        if state is None:
+            return None
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if k <= 0 or state.matrix.size == 0 or norm == 0 or query.shape[0] != state.matrix.shape[1]:
+            return []
+
+        rows, similarities = state.matrix.candidates(query / norm, k)  # 양자화 행렬이면 상위 후보를 원본으로 재점수화
+        if similarities.size > k:  # 전체 정렬 없이 상위 k개만 선택
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(similarities.size)
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [(state.metadatas[int(rows[i]) if rows is not None else int(i)], float(similarities[i])) for i in top]
+
+
+def fetch_page_image_rows(client, page: Any, table_name: str = "image_embeddings") -> List[Dict[str, Any]]:
+    """인덱스를 쓸 수 없을 때의 DB 조회 - 타입이 지정된 page 컬럼(btree 인덱스)을 우선 사용"""
+    key = page_key(page)
+    if key is None:
+        return []
+    if key.isdigit():
+        try:
+            external_call()
+            resp = client.table(table_name).select("metadata").eq("page", int(key)).execute()
+            if resp and resp.data:
+                return resp.data
+        except Exception as e:  # page 컬럼 마이그레이션 전 - JSON 조회로 대체
+            logger.debug(f"page 컬럼 조회 실패, 메타데이터 조회로 대체: {str(e)}")
+
+    external_call()
+    resp = client.table(table_name).select("metadata").eq("metadata->>page", str(page)).execute()
+    if resp and resp.data:
+        return resp.data
+    external_call()
+    resp = client.table(table_name).select("metadata").ilike("metadata->>image_url", f"%p{page}%").execute()  # URL 패턴으로 검색
+    return resp.data if resp and resp.data else []
+
+
+def estimate_vertical_position(image_url: str) -> float:
+    """URL 패턴으로 이미지의 페이지 내 세로 위치 추정 (0: 위쪽, 1: 아래쪽)"""
+    url = image_url.lower()
+    if "top" in url or "upper" in url:
+        return 0.2  # 위쪽
+    if "bottom" in url or "lower" in url:
+        return 0.8  # 아래쪽
+    return 0.5  # 기본값 (중간)
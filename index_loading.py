@@ -0,0 +1,86 @@
+# 인메모리 인덱스 지연 로딩 모듈
+# 이미지 임베딩 인덱스와 텍스트 벡터 인덱스가 함께 쓰는 ensure_loaded().
+# 로딩에 실패하면 실패 시각을 기록하고 retry_after초 동안은 잠금을 잡지 않고 바로 None을 돌려준다
+# (요청마다 잠금 뒤에 줄을 서서 테이블 전체를 다시 읽는 재시도 폭주 방지, 호출한 쪽은 DB 조회로 대체).
+# reload_interval(초)을 주면 스냅샷이 그보다 오래됐을 때 다음 사용 시점에 백그라운드 스레드에서 다시 로딩하고
+# (그동안은 기존 스냅샷으로 응답), 교체 후 add_listener()로 등록한 함수를 호출한다 (결과 캐시 무효화 등).
+# reload_interval이 0이면 최초 로딩 후 스냅샷은 바뀌지 않는다 (테이블 변경은 재시작해야 반영).
+
+import logging  # 로딩 오류 로그
+import threading  # 백그라운드 다시 로딩
+import time  # 실패 시각 / 스냅샷 나이
+from typing import Any, Callable, List, Optional  # 타입 힌트
+
+logger = logging.getLogger(__name__)
+
+
+class LazyLoading:
+    """load()로 self._state를 교체하는 인덱스의 지연 로딩 (self._state / self._lock은 사용하는 클래스가 정의)
+
+    self._state는 로딩 시각(time.time())을 loaded_at 속성으로 가진다.
+    """
+
+    index_name = "인덱스"  # 로그에 쓰는 이름
+
+    def __init__(self, retry_after: float = 30.0, reload_interval: float = 0.0):
+        self.retry_after = retry_after  # 로딩 실패 후 다시 시도하기까지 대기 시간 (초)
+        self.reload_interval = reload_interval  # 주기적 다시 로딩 간격 (초, 0이면 다시 로딩하지 않음)
+        self.reload_count = 0  # 백그라운드 다시 로딩 횟수
+        self._failed_at: Optional[float] = None  # 마지막 로딩 실패 시각 (monotonic)
+        self._reloading = False  # 백그라운드 다시 로딩 진행 여부
+        self._listeners: List[Callable[[], None]] = []  # 다시 로딩 후 호출할 함수
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def _backing_off(self) -> bool:
+        failed_at = self._failed_at
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_after
+
+    def _stale(self, state: Any) -> bool:
+        return self.reload_interval > 0 and time.time() - state.loaded_at >= self.reload_interval
+
+    def ensure_loaded(self) -> Optional[Any]:
+        """최초 사용 시 지연 로딩 (로딩 실패 시, 그리고 실패 후 retry_after초 동안 None 반환)"""
+        state = self._state
+        if state is not None:
+            if self._stale(state) and not self._reloading and not self._backing_off():
+                self._start_reload()
+            return state
+        if self._backing_off():
+            return None
+        with self._lock:
+            if self._state is None and not self._backing_off():
+                try:
+                    self.load()
+                    self._failed_at = None
+                except Exception as e:
+                    self._failed_at = time.monotonic()
+                    logger.error(f"{self.index_name} 로딩 오류 ({self.retry_after:g}초 후 다시 시도): {str(e)}")
+        return self._state
+
+    def _start_reload(self) -> None:
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name=f"{type(self).__name__}-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        """테이블을 다시 읽어 스냅샷 교체 (load()가 새 스냅샷을 완성한 뒤 교체하므로 그동안 기존 스냅샷으로 검색)"""
+        try:
+            with self._lock:
+                self.load()
+                self._failed_at = None
+            self.reload_count += 1
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            logger.error(f"{self.index_name} 다시 로딩 오류 (기존 스냅샷 유지, {self.retry_after:g}초 후 다시 시도): {str(e)}")
+            return
+        finally:
+            self._reloading = False
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"{self.index_name} 다시 로딩 리스너 오류: {str(e)}")
@@ -0,0 +1,221 @@
+# 프로세스 메모리(RSS) 감시 및 제어 모듈
+# 요청마다 gc.collect()를 호출하는 대신 현재 RSS를 /proc에서 읽어
+# 높은 수위(high watermark)를 넘었을 때만 가비지 컬렉션과 malloc_trim을 실행하고,
+# 한계에 가까우면 무거운 작업을 줄이거나(degrade) 새 요청을 거절(shed)한다.
+
+import ctypes  # malloc_trim 호출
+import ctypes.util
+import gc  # 가비지 컬렉션
+import logging
+import os
+import threading  # 동시 접근 보호
+import time  # 수집 간격 계산
+from typing import Any, Dict, Optional  # 타입 힌트
+
+try:
+    import resource  # 최대 RSS (Windows에는 없음)
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096  # 메모리 페이지 크기 (바이트)
+_CGROUP_LIMIT_FILES = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")  # cgroup v2 / v1
+
+
+# 1. 메모리 사용량 읽기
+def read_rss_bytes() -> Optional[int]:
+    """현재 RSS (바이트) - /proc/self/statm을 읽으며, 없으면 psutil 사용 (둘 다 없으면 None)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE  # 두 번째 값이 상주 페이지 수
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        return None
+
+
+def read_pss_bytes() -> Optional[int]:
+    """비례 배분 메모리 PSS (바이트) - 여러 프로세스가 공유하는 페이지(fork 후 복사되지 않은 힙, 공유 메모리 배열)는
+    공유하는 프로세스 수로 나누어 더하므로 워커들의 PSS 합이 실제 사용량이 된다 (smaps_rollup이 없으면 RSS)"""
+    try:
+        with open("/proc/self/smaps_rollup", "rb") as f:
+            for line in f:
+                if line.startswith(b"Pss:"):
+                    return int(line.split()[1]) * 1024  # kB 단위
+    except (OSError, ValueError, IndexError):
+        pass
+    return read_rss_bytes()
+
+
+def read_peak_rss_bytes() -> Optional[int]:
+    """프로세스 시작 이후 최대 RSS (바이트)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024  # 리눅스는 KB, macOS는 바이트 단위
+
+
+def read_memory_limit() -> Optional[int]:
+    """컨테이너(cgroup) 메모리 한도 (바이트, 제한이 없으면 None)"""
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # "max" 또는 매우 큰 값은 제한 없음
+            return int(value)
+    return None
+
+
+def _load_malloc_trim():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        trim = libc.malloc_trim
+        trim.argtypes = [ctypes.c_size_t]
+        trim.restype = ctypes.c_int
+        return trim
+    except (OSError, AttributeError):  # glibc가 아닌 환경 (musl, macOS, Windows)
+        return None
+
+
+_malloc_trim = _load_malloc_trim()
+
+
+def malloc_trim() -> bool:
+    """해제된 힙 메모리를 운영체제에 반환 (glibc에서만 동작)"""
+    if _malloc_trim is None:
+        return False
+    return bool(_malloc_trim(0))
+
+
+# 2. 메모리 거버너
+class MemoryGovernor:
+    """RSS 수위에 따라 메모리 정리, 작업 축소, 요청 거절을 결정
+
+    - 높은 수위(high) 초과: 가비지 컬렉션 + malloc_trim 실행 (cooldown 간격 이내 반복 실행 방지),
+      정리 후에도 높으면 degraded 상태로 표시하여 선택적인 작업(이미지 분석 등)을 생략
+    - 위험 수위(critical) 초과: 정리 후에도 넘으면 새 요청을 거절 (shed)
+
+    다중 워커 모드(serve.py)에서는 workers로 나눈 한도를 워커별 PSS(proportional=True)와 비교한다.
+    측정값은 sample_interval초 동안 재사용하여 요청마다 /proc(PSS는 smaps_rollup 전체 집계)를 읽지 않는다.
+    """
+
+    def __init__(self, limit_bytes: Optional[int] = None, high_watermark: float = 0.75, critical_watermark: float = 0.9,
+                 cooldown: float = 5.0, workers: int = 1, proportional: bool = False, sample_interval: float = 1.0):
+        limit_bytes = limit_bytes or read_memory_limit()
+        self.limit_bytes = limit_bytes // max(1, workers) if limit_bytes else None  # 워커당 메모리 한도 (None이면 정리/거절 없이 측정만)
+        self.proportional = proportional  # RSS 대신 PSS로 수위 판단 (공유 페이지 중복 계산 방지)
+        self.high_watermark = high_watermark  # 정리를 시작할 사용률
+        self.critical_watermark = critical_watermark  # 요청을 거절할 사용률
+        self.cooldown = cooldown  # 정리 최소 간격 (초)
+        self.sample_interval = sample_interval  # 측정값 재사용 시간 (초, 0이면 매번 측정)
+        self._sampled_at = time.monotonic()  # 마지막 측정 시각
+        self.rss_bytes = self._read() or 0  # 마지막으로 측정한 RSS
+        self.peak_rss_bytes = self.rss_bytes  # 측정한 RSS 중 최댓값
+        self.collections = 0  # 정리 실행 횟수
+        self.freed_bytes = 0  # 정리로 줄어든 RSS 합계
+        self.shed_requests = 0  # 거절한 요청 수
+        self.degraded_requests = 0  # 작업을 줄여 처리한 요청 수
+        self._last_collect = 0.0  # 마지막 정리 시각
+        self._lock = threading.Lock()  # 정리 중복 실행 방지
+
+    @property
+    def high_bytes(self) -> Optional[int]:
+        return int(self.limit_bytes * self.high_watermark) if self.limit_bytes else None
+
+    @property
+    def critical_bytes(self) -> Optional[int]:
+        return int(self.limit_bytes * self.critical_watermark) if self.limit_bytes else None
+
+    def _read(self) -> Optional[int]:
+        return read_pss_bytes() if self.proportional else read_rss_bytes()
+
+    def sample(self, max_age: Optional[float] = None) -> int:
+        """현재 RSS 측정 (최댓값 갱신, 마지막 측정이 max_age초(기본값 sample_interval) 이내면 그 값을 반환)"""
+        now = time.monotonic()
+        if now - self._sampled_at < (self.sample_interval if max_age is None else max_age):
+            return self.rss_bytes
+        self._sampled_at = now
+        rss = self._read()
+        if rss is not None:
+            self.rss_bytes = rss
+            if rss > self.peak_rss_bytes:
+                self.peak_rss_bytes = rss
+        return self.rss_bytes
+
+    def level(self) -> str:
+        """마지막 측정값 기준 수위 (ok / high / critical)"""
+        if not self.limit_bytes:
+            return "ok"
+        if self.rss_bytes >= self.critical_bytes:
+            return "critical"
+        if self.rss_bytes >= self.high_bytes:
+            return "high"
+        return "ok"
+
+    def collect(self, force: bool = False) -> bool:
+        """높은 수위를 넘었으면 가비지 컬렉션과 malloc_trim 실행 (실행했으면 True)"""
+        rss = self.sample()
+        if not force and (self.high_bytes is None or rss < self.high_bytes):
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_collect < self.cooldown:  # 최근에 정리했으면 생략
+            return False
+        if not self._lock.acquire(blocking=False):  # 다른 스레드가 정리 중
+            return False
+        try:
+            self._last_collect = now
+            gc.collect()
+            malloc_trim()
+            after = self.sample(0)
+            self.collections += 1
+            self.freed_bytes += max(0, rss - after)
+            logger.info(f"메모리 정리: {rss / 1048576:.1f} MB -> {after / 1048576:.1f} MB")
+            return True
+        finally:
+            self._lock.release()
+
+    def collect_due(self) -> bool:
+        """측정값(캐시)이 높은 수위를 넘었고 정리 간격이 지났으면 True (collect()를 실행할지 미리 확인)"""
+        rss = self.sample()
+        return (self.high_bytes is not None and rss >= self.high_bytes
+                and time.monotonic() - self._last_collect >= self.cooldown and not self._lock.locked())
+
+    def should_shed(self) -> bool:
+        """위험 수위를 넘었으면 정리를 시도하고, 그래도 넘으면 True (요청 거절)"""
+        self.sample()
+        if self.level() != "critical":
+            return False
+        self.collect()
+        if self.level() == "critical":
+            self.shed_requests += 1
+            return True
+        return False
+
+    def degraded(self) -> bool:
+        """높은 수위 이상이면 True (선택적인 작업 생략)"""
+        if self.level() == "ok":
+            return False
+        self.degraded_requests += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rss_bytes": self.rss_bytes,
+            "peak_rss_bytes": max(self.peak_rss_bytes, read_peak_rss_bytes() or 0),
+            "measure": "pss" if self.proportional else "rss",
+            "limit_bytes": self.limit_bytes,
+            "high_watermark_bytes": self.high_bytes,
+            "critical_watermark_bytes": self.critical_bytes,
+            "level": self.level(),
+            "collections": self.collections,
+            "freed_bytes": self.freed_bytes,
+            "shed_requests": self.shed_requests,
+            "degraded_requests": self.degraded_requests,
+            "gc_counts": gc.get_count(),
+        }
@@ -0,0 +1,233 @@
+# Prometheus 텍스트 형식 메트릭 모듈
+# prometheus_client 의존성 없이 카운터 / 게이지 / 히스토그램을 제공한다.
+# 관측 한 번은 잠금 + 이진 탐색(bisect) 수준의 비용이므로 운영 환경에서도 항상 켜 둘 수 있다.
+
+import bisect  # 히스토그램 버킷 탐색
+import threading  # 동시 접근 보호
+import time  # 소요 시간 측정
+from contextlib import contextmanager  # 구간 측정용 컨텍스트 매니저
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple  # 타입 힌트
+
+from tracing import span  # 요청별 구간 기록
+
+# 지연 시간 기본 버킷 (초) - 캐시 적중(수 ms)부터 LLM 응답(수십 초)까지
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, Dict[str, str], float]  # (이름 접미사, 레이블, 값)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+# 1. 메트릭 레지스트리
+class Registry:
+    """메트릭과 수집 함수(스크레이프 시점에 값을 읽는 게이지)를 모아 텍스트 형식으로 출력"""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []  # 등록된 메트릭
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []  # 수집 함수
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """collector()는 (이름, 타입, 설명, 샘플 목록)을 반환 (캐시 적중률, 메모리 등 다른 모듈의 통계 노출용)"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in list(self._metrics)]
+        for collector in list(self._collectors):
+            try:
+                families.extend(collector())
+            except Exception as e:  # 수집 함수 오류가 /metrics 전체를 막지 않도록 함
+                lines.append(f"# collector error: {type(e).__name__}")
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()  # 프로세스 전역 레지스트리
+
+
+# 2. 메트릭 타입
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional[Registry] = REGISTRY):
+        self.name = name  # 메트릭 이름
+        self.documentation = documentation  # 설명 (# HELP)
+        self.labelnames = tuple(labelnames)  # 레이블 이름
+        self._values: Dict[Tuple[str, ...], object] = {}  # 레이블 값 -> 값
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("", self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    """증가만 하는 값 (요청 수 등)"""
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("_total", self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """오르내리는 현재 값 (처리 중인 요청 수 등)"""
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """구간별 관측 횟수 (지연 시간 분포)"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))  # 버킷 상한 (+Inf는 자동 추가)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)  # value 이상인 첫 버킷
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]  # [버킷별 횟수, 합계]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in sorted(self._values.items())]
+        samples: List[Sample] = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):  # 누적 횟수로 출력
+                cumulative += count
+                samples.append(("_bucket", dict(labels, le=_format_value(bound)), cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+# 3. 챗봇 공통 메트릭
+STAGE_LATENCY = Histogram(
+    "chatbot_stage_duration_seconds",
+    "Latency of each search/chat pipeline stage",
+    ["stage"])
+REQUESTS = Counter(
+    "chatbot_http_requests",
+    "HTTP requests by endpoint and outcome",
+    ["endpoint", "method", "outcome"])
+REQUEST_LATENCY = Histogram(
+    "chatbot_http_request_duration_seconds",
+    "HTTP request latency by endpoint (until response headers for streaming endpoints)",
+    ["endpoint"])
+IN_FLIGHT = Gauge(
+    "chatbot_http_requests_in_flight",
+    "Requests currently being handled by endpoint",
+    ["endpoint"])
+
+
+@contextmanager
+def stage(name: str):
+    """파이프라인 단계 소요 시간 측정: with stage("llm_completion"): ...
+
+    히스토그램에 기록하고, 진행 중인 트레이스가 있으면 같은 이름의 구간도 남긴다.
+    """
+    started = time.perf_counter()
+    with span(name):
+        try:
+            yield
+        finally:
+            STAGE_LATENCY.observe(time.perf_counter() - started, stage=name)
+
+
+def outcome_of(status_code: int) -> str:
+    """HTTP 상태 코드를 결과 분류로 변환"""
+    if status_code == 503:
+        return "shed"
+    if status_code >= 500:
+        return "server_error"
+    if status_code >= 400:
+        return "client_error"
+    return "ok"
+
+
+def cache_collector(caches: Callable[[], Dict[str, Optional[Dict]]]):
+    """캐시 이름 -> stats() 딕셔너리를 적중/미스 카운터와 적중률/크기 게이지로 변환하는 수집 함수 생성"""
+    def collect():
+        stats = {name: value for name, value in caches().items() if value}
+        return [
+            ("chatbot_cache_hits", "counter", "Cache hits by cache", [("_total", {"cache": name}, s.get("hits", 0)) for name, s in stats.items()]),
+            ("chatbot_cache_misses", "counter", "Cache misses by cache", [("_total", {"cache": name}, s.get("misses", 0)) for name, s in stats.items()]),
+            ("chatbot_cache_hit_ratio", "gauge", "Cache hit ratio since start", [("", {"cache": name}, s.get("hit_ratio", 0.0)) for name, s in stats.items()]),
+            ("chatbot_cache_entries", "gauge", "Entries currently cached", [("", {"cache": name}, s.get("size", 0)) for name, s in stats.items()]),
+        ]
+    return collect
@@ -0,0 +1,474 @@
+# 단계별 검색 파이프라인 모듈
+# LangGraph 에이전트(SearchDocumentsTool)와 FastAPI 앱(perform_search)이 함께 쓰는 검색 흐름.
+#   retrieve -> page_ranking -> image_candidates -> image_rerank -> context_assembly
+# 단계마다 시간 예산(ms)이 있고 전체 예산도 따로 둔다.
+#  - 이미지 단계는 스레드 풀에서 실행하고 min(단계 예산, 남은 전체 예산)을 넘으면 결과를 기다리지 않고 건너뛴다.
+#  - 나머지 단계는 호출한 스레드에서 실행하고, 예산을 넘으면 debug_info["pipeline"]에 over_budget으로 기록만 한다
+#    (retrieve는 BM25_TIMEOUT / VECTOR_TIMEOUT으로 이미 제한됨).
+# 이미지 단계를 건너뛰면 debug_info["degraded"]가 설정되어 답변 캐시에 저장되지 않는다.
+
+import contextvars  # 스레드 풀에 요청 컨텍스트(트레이스) 전달
+import re  # 페이지 번호 추출
+import time  # 단계별 소요 시간 측정
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError  # 이미지 단계 실행
+from typing import Any, Callable, Dict, List, Optional, Tuple  # 타입 힌트
+
+import numpy as np  # 유사도 계산
+
+from image_index import estimate_vertical_position  # 이미지 위치 추정
+from metrics import stage  # 단계별 지연 시간 메트릭 / 구간 기록
+from tracing import external_call  # 외부 호출 수 기록
+from vector_codec import decode_vector  # pgvector 임베딩 디코딩
+
+# 단계별 기본 시간 예산 (ms) - galaxy_chatbot의 SEARCH_*_BUDGET_MS 환경 변수로 변경
+DEFAULT_BUDGETS_MS = {
+    "total": 8000,  # 전체 검색
+    "retrieve": 4000,  # 하이브리드 검색 (BM25 + 벡터)
+    "page_ranking": 50,  # 검색 결과 페이지 점수화
+    "image_candidates": 1500,  # 상위 페이지 이미지 조회
+    "image_rerank": 1500,  # 후보 전체를 쿼리 / 검색 결과 텍스트와 한 번에 점수화 + 재정렬
+    "context_assembly": 50,  # LLM 컨텍스트 구성
+}
+IMAGE_STAGES = ("image_candidates", "image_rerank")  # 예산이 부족하면 건너뛰는 단계
+STAGE_METRIC_NAMES = {"retrieve": "hybrid_retrieval"}  # 기존 대시보드와 같은 메트릭 이름 유지
+
+PAGE_PATTERN = re.compile(r'(?:페이지|page|p)?\s*(\d+)(?:페이지|쪽|page)?')  # 쿼리 속 페이지 번호
+CATEGORY_PAGE_PATTERN = re.compile(r'p(\d+)')  # category 메타데이터(p12)의 페이지 번호
+
+NO_RESULT_TEXT = "매뉴얼에서 관련 정보를 찾을 수 없습니다."
+
+
+def normalize_query(query: str) -> str:
+    """검색 쿼리 정규화 (앞뒤 공백과 끝의 문장 부호 제거)"""
+    return query.strip().rstrip('.!?')
+
+
+def document_page(doc) -> Optional[str]:
+    """문서의 페이지 번호 (page 메타데이터, 없으면 category의 p{번호})"""
+    if "page" in doc.metadata:
+        return str(doc.metadata["page"])
+    category = doc.metadata.get("category")
+    if isinstance(category, str) and "p" in category.lower():
+        matches = CATEGORY_PAGE_PATTERN.findall(category.lower())
+        if matches:
+            return matches[0]
+    return None
+
+
+class SearchPipeline:
+    """하이브리드 검색 결과로 페이지를 고르고, 그 페이지의 이미지를 골라 LLM 컨텍스트를 구성"""
+
+    def __init__(self, retriever, embeddings, image_index, client, budgets_ms: Optional[Dict[str, float]] = None,
+                 executor: Optional[ThreadPoolExecutor] = None, max_docs: int = 5, max_images: int = 3,
+                 image_table: str = "image_embeddings"):
+        self.retriever = retriever  # invoke_with_info(query)를 제공하는 하이브리드 검색기
+        self.embeddings = embeddings  # 쿼리 임베딩 모델 (캐시 포함)
+        self.image_index = image_index  # 이미지 임베딩 인메모리 인덱스
+        self.client = client  # Supabase 클라이언트 (인덱스에 없는 이미지 조회용)
+        self.budgets_ms = dict(DEFAULT_BUDGETS_MS, **(budgets_ms or {}))  # 단계별 시간 예산
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix="pipeline")  # 이미지 단계 / 임베딩 선계산
+        self.max_docs = max_docs  # 컨텍스트에 넣을 최대 문서 수
+        self.max_images = max_images  # 선택할 최대 이미지 수
+        self.image_table = image_table  # 이미지 임베딩 테이블 이름
+
+    # 1. 이미지 관련성 점수
+    def _relevance_result(self, image_url: str, cosine_similarity: float, metadata) -> Dict[str, Any]:
+        embedding_similarity = float((cosine_similarity + 1) / 2)  # 0~1 범위로 정규화
+        return {
+            "vertical_position": float(estimate_vertical_position(image_url)),  # 위치 정보 (URL 패턴 기반)
+            "relevance_score": embedding_similarity,
+            "embedding_similarity": embedding_similarity,
+            "metadata": metadata or {}
+        }
+
+    def _default_result(self) -> Dict[str, Any]:
+        return {
+            "vertical_position": 0.5,  # 기본값
+            "relevance_score": 0.5,  # 기본 관련성 점수
+            "embedding_similarity": 0.5
+        }
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """텍스트별 정규화된 쿼리 임베딩 (텍스트 수, 차원) - 캐시에 없는 텍스트만 한 번의 API 호출로 임베딩"""
+        if hasattr(self.embeddings, "embed_queries"):
+            embeddings = self.embeddings.embed_queries(texts)
+        else:
+            embeddings = [self.embeddings.embed_query(text) for text in texts]
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _fetch_image_vectors(self, image_urls: List[str]) -> Dict[str, Tuple[Optional[np.ndarray], Dict[str, Any]]]:
+        """인덱스에 없는 이미지들의 임베딩과 메타데이터를 DB 조회 한 번으로 가져옴 (URL -> (임베딩, 메타데이터))"""
+        found: Dict[str, Tuple[Optional[np.ndarray], Dict[str, Any]]] = {}
+        try:
+            external_call()
+            resp = self.client.table(self.image_table).select("embedding,metadata").in_("metadata->>image_url", image_urls).execute()
+        except Exception as e:
+            print(f"이미지 임베딩 검색 오류: {str(e)}")
+            return found
+        for row in (resp.data if resp else None) or []:
+            metadata = row.get('metadata') or {}
+            image_url = metadata.get('image_url')
+            if image_url not in image_urls or image_url in found:
+                continue
+            try:
+                vector = decode_vector(row.get('embedding'))  # pgvector 값을 float32 배열로 변환
+            except ValueError:
+                print(f"임베딩 문자열 파싱 실패: {str(row.get('embedding'))[:50]}...")
+                vector = None
+            found[image_url] = (vector, metadata)
+        return found
+
+    @stage("image_relevance")
+    def score_images(self, image_urls: List[str], texts: List[str]) -> Dict[str, Tuple[np.ndarray, Dict[str, Any]]]:
+        """후보 이미지 전체를 텍스트 여러 개와 한 번에 점수화 (URL -> (텍스트별 코사인 유사도, 메타데이터))
+
+        텍스트는 한 번씩만 임베딩하고, 후보 임베딩은 인덱스에서 모은 뒤 인덱스에 없는 것만 DB 조회 한 번으로 가져와
+        (텍스트 수, 차원) x (차원, 후보 수) 행렬 곱 한 번으로 모든 점수를 계산한다.
+        임베딩을 찾지 못한 이미지는 유사도 0 (관련성 0.5)으로 둔다.
+        """
+        image_urls = list(dict.fromkeys(image_urls))
+        queries = self._embed_texts(texts)
+        urls, vectors = self.image_index.vectors(image_urls)
+        metadatas = {url: self.image_index.get_metadata(url) or {} for url in urls}
+
+        missing = [url for url in image_urls if url not in metadatas]
+        if missing:
+            fetched = self._fetch_image_vectors(missing)
+            extra_urls, extra_vectors = [], []
+            for url in missing:
+                vector, metadata = fetched.get(url, (None, {}))
+                metadatas[url] = metadata
+                norm = np.linalg.norm(vector) if vector is not None else 0.0
+                if norm > 0 and vector.shape[0] == queries.shape[1]:
+                    extra_urls.append(url)
+                    extra_vectors.append(vector / norm)
+            if extra_vectors:
+                stacked = np.vstack(extra_vectors).astype(np.float32)
+                vectors = np.vstack([vectors, stacked]) if urls else stacked
+                urls = urls + extra_urls
+
+        similarities = np.zeros((len(texts), 0), dtype=np.float32)
+        if urls and vectors.shape[1] == queries.shape[1]:
+            similarities = queries @ vectors.T  # 모든 (텍스트, 이미지) 쌍의 코사인 유사도
+        else:
+            urls = []
+        columns = {url: i for i, url in enumerate(urls)}
+        zeros = np.zeros(len(texts), dtype=np.float32)
+        return {url: (similarities[:, columns[url]] if url in columns else zeros, metadatas.get(url) or {})
+                for url in image_urls}
+
+    def analyze_images_relevance(self, image_urls: List[str], query_text: str) -> Dict[str, Dict[str, Any]]:
+        """후보 이미지 전체의 쿼리 관련성 (쿼리 임베딩 1회 + DB 조회 최대 1회 + 행렬 곱 1회, 실패 시 0.5)"""
+        try:
+            scored = self.score_images(image_urls, [query_text])
+        except Exception as e:
+            print(f"이미지 일괄 분석 오류: {str(e)}")
+            return {image_url: self._default_result() for image_url in image_urls}
+        return {url: self._relevance_result(url, float(sims[0]), metadata) for url, (sims, metadata) in scored.items()}
+
+    def analyze_image_relevance(self, image_url: str, query_text: str) -> Dict[str, Any]:
+        """이미지 하나의 쿼리 관련성 (인덱스에 없으면 DB에서 임베딩 조회, 실패 시 0.5)"""
+        return self.analyze_images_relevance([image_url], query_text)[image_url]
+
+    def _page_image(self, item: Dict[str, Any], page, img_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "url": item['metadata']['image_url'],
+            "page": item['metadata'].get('page', page),
+            "is_page_match": True,  # 같은 페이지이므로 항상 True
+            "text_similarity": float(img_analysis["embedding_similarity"]),
+            "vertical_position": float(img_analysis["vertical_position"]),
+            "relevance_score": float(img_analysis["relevance_score"]),
+            "score": float(0.7 * img_analysis["relevance_score"] + 0.3)
+        }
+
+    def page_image_items(self, page) -> List[Dict[str, Any]]:
+        """페이지의 이미지 행 중 image_url이 있는 것"""
+        with stage("image_lookup"):
+            page_rows = self.image_index.find_page_rows(page)  # 페이지 -> 이미지 인메모리 색인, 로딩 전이면 page 컬럼 조회
+        return [dict(item, page=page) for item in page_rows or []
+                if item.get('metadata') and 'image_url' in item['metadata']]
+
+    def get_all_page_images(self, page, query_text: str) -> List[Dict[str, Any]]:
+        """페이지의 모든 이미지를 쿼리 관련성 내림차순으로 반환"""
+        try:
+            items = self.page_image_items(page)
+            if not items:
+                return []
+
+            analyses = self.analyze_images_relevance([item['metadata']['image_url'] for item in items], query_text)
+            page_images = [self._page_image(item, page, analyses[item['metadata']['image_url']]) for item in items]
+            page_images.sort(key=lambda x: x["relevance_score"], reverse=True)
+            return page_images
+        except Exception as e:
+            print(f"페이지 이미지 검색 오류: {str(e)}")
+            return []
+
+    # 2. 단계
+    def retrieve(self, query: str):
+        return self.retriever.invoke_with_info(query)  # (문서 목록, 검색기별 상태)
+
+    def rank_pages(self, query: str, docs) -> Tuple[List[str], Dict[str, Dict[str, Any]], Optional[str]]:
+        """순위에 반비례하는 점수를 페이지별로 합산 (쿼리에 적힌 페이지는 1.5배)"""
+        match = PAGE_PATTERN.search(query.lower())
+        extracted_page = match.group(1) if match else None
+
+        page_info: Dict[str, Dict[str, Any]] = {}
+        for rank, doc in enumerate(docs):
+            page = document_page(doc)
+            if not page:
+                continue
+            score = 1.0 / (rank + 1)
+            if extracted_page and page == extracted_page:
+                score *= 1.5
+            if page not in page_info:
+                page_info[page] = {"score": score, "content": [doc.page_content]}
+            else:
+                page_info[page]["score"] += score
+                page_info[page]["content"].append(doc.page_content)
+
+        top_pages = [page for page, _ in sorted(((page, info["score"]) for page, info in page_info.items()),
+                                                key=lambda x: x[1], reverse=True)]
+        return top_pages, page_info, extracted_page
+
+    def image_candidates(self, query: str, top_pages: List[str]) -> List[Dict[str, Any]]:
+        """상위 페이지(최대 3개) 중 이미지가 있는 첫 페이지의 이미지 행 (점수화는 image_rerank에서 한 번에)"""
+        for page in top_pages[:3]:
+            items = self.page_image_items(page)
+            if items:
+                return items
+        return []
+
+    def rerank_images(self, candidates: List[Dict[str, Any]], query: str, combined_text: str) -> List[Dict[str, Any]]:
+        """후보 전체를 쿼리 / 검색 결과 텍스트와 한 번에 점수화해 최대 max_images개 선택
+
+        쿼리 관련성 상위 max_images개를 고른 뒤 검색 결과 텍스트와의 관련성(text_relevance) 순으로 정렬한다.
+        """
+        urls = [item['metadata']['image_url'] for item in candidates]
+        try:
+            scored = self.score_images(urls, [query, combined_text])
+        except Exception as e:
+            print(f"이미지 일괄 분석 오류: {str(e)}")
+            scored = {}
+
+        images = []
+        for item in candidates:
+            url = item['metadata']['image_url']
+            if url in scored:
+                sims, metadata = scored[url]
+                image = self._page_image(item, item.get('page'), self._relevance_result(url, float(sims[0]), metadata))
+                image["text_relevance"] = float((sims[1] + 1) / 2)
+            else:
+                image = self._page_image(item, item.get('page'), self._default_result())
+                image["text_relevance"] = 0.5
+            images.append(image)
+        images.sort(key=lambda x: x["relevance_score"], reverse=True)
+
+        best_images = images[:self.max_images]
+        for img in best_images:
+            img["relevance_score"] = img["text_relevance"]
+        if len(best_images) > 1:
+            best_images.sort(key=lambda x: x["text_relevance"], reverse=True)
+        return best_images
+
+    def assemble_context(self, docs, top_pages: List[str], best_images: List[Dict[str, Any]], debug_info: Dict[str, Any],
+                         inline_images: bool = False, reference_tip: bool = False) -> str:
+        """대표 페이지 문서를 앞으로 옮긴 상위 문서로 컨텍스트 구성
+
+        inline_images: 첫 문서 아래에 이미지 URL과 관련성 점수를 적음 (에이전트용, 앱은 응답에 이미지를 따로 담음)
+        reference_tip: 끝에 매뉴얼 참고 안내 문구 추가 (에이전트용, 앱은 답변 생성 후 추가)
+        """
+        top_page = best_images[0]["page"] if best_images else (top_pages[0] if top_pages else None)
+        top_page = str(top_page) if top_page is not None else None
+        leading = [doc for doc in docs if document_page(doc) == top_page]
+        ordered = (leading + [doc for doc in docs if document_page(doc) != top_page])[:self.max_docs]
+
+        reference_pages = []
+        result_text = ""
+        for i, doc in enumerate(ordered):
+            page = doc.metadata.get("page")
+            if page is not None and str(page) not in reference_pages:
+                reference_pages.append(str(page))
+
+            result_text += f"내용: {doc.page_content}\n"
+            result_text += f"카테고리: {doc.metadata.get('category','없음')}\n"
+            result_text += f"페이지: {doc.metadata.get('page','없음')}\n"
+            if i == 0 and inline_images and best_images:
+                result_text += self._image_lines(best_images, debug_info)
+            result_text += "\n"
+
+            item = {
+                "rank": i + 1,
+                "source": doc.metadata.get("source", "알 수 없음"),
+                "score": float(doc.metadata.get("score", 0)),
+                "page": doc.metadata.get("page", "없음"),
+                "category": doc.metadata.get("category", "없음"),
+                "section": doc.metadata.get("section", "없음"),
+                "preview": doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
+            }
+            if i == 0 and best_images:
+                item["images"] = [{"url": img["url"],
+                                   "page": img.get("page", "알 수 없음"),
+                                   "score": float(img["score"]),
+                                   "relevance_score": float(img.get("text_relevance", img.get("relevance_score", 0)))}
+                                  for img in best_images]
+            debug_info["results"].append(item)
+
+        if reference_pages:
+            reference_pages.sort()
+            debug_info["reference_pages"] = reference_pages
+            if reference_tip:
+                if len(reference_pages) > 2:
+                    result_text += "\n\n💡 추가 정보가 필요하면 매뉴얼의 관련 섹션을 참고해보세요."
+                else:
+                    result_text += "\n\n💡 이 기능에 대해 더 알고 싶으시면 매뉴얼의 관련 섹션을 참고해보세요."
+        return result_text
+
+    def _image_lines(self, best_images: List[Dict[str, Any]], debug_info: Dict[str, Any]) -> str:
+        """관련성(0.5 이상)과 매칭 점수(0.6 이상)를 모두 넘는 이미지만 컨텍스트에 포함"""
+        filtered_images = [img for img in best_images
+                           if float(img.get("text_relevance", img.get("relevance_score", 0))) >= 0.5
+                           and img.get("score", 0) >= 0.6]
+        if not filtered_images:
+            debug_info["images_filtered_due_to_low_relevance"] = True
+            return ""
+
+        text = ""
+        for j, img in enumerate(filtered_images):
+            text += f"[이미지 {j+1}]"
+            if j == 0:
+                text += " 👑 텍스트와 가장 관련성 높은 이미지"
+            text += f"\n{img['url']}\n"
+            text += f"페이지: {img.get('page', '알 수 없음')}\n"
+
+            relevance_score = float(img.get('text_relevance', img.get('relevance_score', 0)))
+            match_score = float(img.get('score', 0))
+            if relevance_score < 0.65 or match_score < 0.7:
+                text += f"[참고: 이 이미지는 질문과의 관련성이 다소 낮을 수 있습니다. 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
+            elif relevance_score >= 0.8:
+                text += f"[이 이미지는 질문과 매우 관련성이 높습니다. 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
+            else:
+                text += f"[이미지 {j+1} 관련성 점수: {relevance_score:.4f}, 매칭 점수: {match_score:.4f}]\n"
+        return text
+
+    # 3. 실행
+    def _run_stage(self, name: str, timings: Dict[str, Dict[str, Any]], deadline: float, func: Callable, *args, enforce: bool = False):
+        """단계 실행 후 소요 시간과 상태(ok / over_budget / timeout / error) 기록
+
+        enforce=True면 스레드 풀에서 실행하고 min(단계 예산, 남은 전체 예산)까지만 기다린다 (초과 시 None 반환).
+        """
+        budget_ms = self.budgets_ms[name]
+        started = time.perf_counter()
+        status, result = "ok", None
+        with stage(STAGE_METRIC_NAMES.get(name, name)):
+            if enforce:
+                timeout = max(0.0, min(budget_ms / 1000, deadline - started))
+                future = self.executor.submit(contextvars.copy_context().run, func, *args)  # 구간 기록을 위해 컨텍스트 전달
+                try:
+                    result = future.result(timeout=timeout)
+                except FuturesTimeoutError:
+                    future.cancel()  # 아직 시작 전이면 취소, 실행 중이면 결과만 버림
+                    status = "timeout"
+                except Exception as e:
+                    status = "error"
+                    timings.setdefault("errors", {})[name] = str(e)
+            else:
+                result = func(*args)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if status == "ok" and elapsed_ms > budget_ms:
+            status = "over_budget"
+        timings[name] = {"elapsed_ms": round(elapsed_ms, 1), "budget_ms": budget_ms, "status": status}
+        return result, status
+
+    def _skip_stage(self, name: str, timings: Dict[str, Dict[str, Any]], reason: str) -> None:
+        timings[name] = {"elapsed_ms": 0.0, "budget_ms": self.budgets_ms[name], "status": f"skipped:{reason}"}
+
+    def run(self, query: str, retrieved=None, skip_images: bool = False, inline_images: bool = False,
+            reference_tip: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """검색 실행 -> (LLM 컨텍스트, debug_info)
+
+        retrieved: 일괄 검색에서 미리 구한 (문서 목록, 검색기별 상태)
+        skip_images: 이미지 단계 생략 (메모리 부족 등, debug_info["degraded"] = "memory")
+        """
+        started = time.perf_counter()
+        deadline = started + self.budgets_ms["total"] / 1000
+        normalized_query = normalize_query(query)
+        timings: Dict[str, Dict[str, Any]] = {}
+        debug_info = {
+            "query": normalized_query,
+            "results": [],
+            "image_results": [],
+            "page_info": {},
+            "vertical_position": {},
+            "pipeline": {"budget_ms": self.budgets_ms["total"], "stages": timings}
+        }
+
+        try:
+            # 1. 텍스트 검색
+            if retrieved is None:
+                retrieved, _ = self._run_stage("retrieve", timings, deadline, self.retrieve, normalized_query)
+            docs, debug_info["retrieval"] = retrieved
+            if not docs:
+                return NO_RESULT_TEXT, debug_info
+
+            # 2. 페이지 점수화
+            (top_pages, page_info, extracted_page), _ = self._run_stage("page_ranking", timings, deadline, self.rank_pages, normalized_query, docs)
+            if extracted_page:
+                debug_info["extracted_page"] = extracted_page
+            debug_info["page_numbers"] = top_pages
+            debug_info["page_info"] = {page: " ".join(info["content"])[:200] for page, info in page_info.items()}
+            debug_info["page_scores"] = {page: float(info["score"]) for page, info in page_info.items()}
+
+            # 3. 이미지 후보 / 4. 재정렬 (예산이 부족하면 건너뜀)
+            best_images: List[Dict[str, Any]] = []
+            if top_pages and skip_images:
+                debug_info["degraded"] = "memory"
+                for name in IMAGE_STAGES:
+                    self._skip_stage(name, timings, "memory")
+            elif top_pages:
+                combined_text = " ".join(doc.page_content for doc in docs[:3])
+
+                candidates, status = None, "skipped"
+                if time.perf_counter() < deadline:
+                    candidates, status = self._run_stage("image_candidates", timings, deadline, self.image_candidates,
+                                                         normalized_query, top_pages, enforce=True)
+                else:
+                    self._skip_stage("image_candidates", timings, "budget")
+                if status not in ("ok", "over_budget"):
+                    debug_info["degraded"] = "budget"
+
+                if candidates:
+                    if time.perf_counter() < deadline:
+                        reranked, status = self._run_stage("image_rerank", timings, deadline, self.rerank_images,
+                                                           candidates, normalized_query, combined_text, enforce=True)
+                    else:
+                        reranked, status = None, "skipped"
+                        self._skip_stage("image_rerank", timings, "budget")
+                    if reranked is not None:
+                        best_images = reranked
+                    else:  # 점수화를 못 하면 페이지 순서 그대로 기본 점수로 사용
+                        best_images = [self._page_image(item, item.get('page'), self._default_result())
+                                       for item in candidates[:self.max_images]]
+                        debug_info["degraded"] = "budget"
+
+            if best_images:
+                for img in best_images:
+                    img["is_page_match"] = str(img.get("page")) in top_pages
+                debug_info["best_images"] = best_images
+                debug_info["text_relevance_scores"] = {img["url"]: img.get("text_relevance", 0) for img in best_images}
+            elif "degraded" not in debug_info:
+                debug_info["no_image_reason"] = "이미지를 찾지 못했거나 검색된 페이지와 일치하는 이미지가 없음"
+
+            # 5. 컨텍스트 구성
+            result_text, _ = self._run_stage("context_assembly", timings, deadline, self.assemble_context,
+                                             docs, top_pages, best_images, debug_info, inline_images, reference_tip)
+            return result_text, debug_info
+        except Exception as e:
+            import traceback
+            debug_info["error"] = str(e)
+            debug_info["traceback"] = traceback.format_exc()
+            return "검색 중 오류가 발생했습니다: " + str(e), debug_info
+        finally:
+            debug_info["pipeline"]["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
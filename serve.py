@@ -0,0 +1,160 @@
+# 사전 로딩 후 fork하는 다중 워커 서버
+# uvicorn --workers는 워커마다 앱을 새로 임포트하므로 BM25 인덱스, 문서 목록, 임베딩 행렬이 워커 수만큼 복제된다.
+# 여기서는 부모 프로세스가 인덱스를 한 번만 만들고(스냅샷 로딩 / 이미지·텍스트 벡터 인덱스 로딩)
+#  1) 큰 numpy 배열을 공유 메모리(/dev/shm) 읽기 전용 mmap으로 옮기고
+#  2) gc.freeze()로 기존 객체를 GC 검사 대상에서 빼서 fork 후 GC가 페이지를 건드려 복사되는 것을 막은 뒤
+#  3) 리슨 소켓을 연 상태로 워커를 fork한다. 워커는 같은 소켓에서 uvicorn을 실행하고 배열을 복사 없이 읽는다.
+# 부모는 워커를 감시하다가 비정상 종료한 워커를 다시 fork하고(인덱스 재로딩 없음), SIGTERM/SIGINT를 워커에 전달한다.
+#
+# 실행: WEB_WORKERS=3 python serve.py  (start.sh는 WEB_WORKERS > 1이면 이 스크립트를 사용)
+# 주의: BM25_REFRESH_INTERVAL > 0이면 워커마다 갱신하며, 갱신된 인덱스는 워커별 사본이 된다.
+#       같은 BM25_SNAPSHOT_DIR에 여러 워커가 동시에 저장해 서로의 스냅샷을 정리하지 않도록, 스냅샷은 워커 0(슬롯 0,
+#       다시 fork되어도 같은 슬롯)만 저장하고 나머지 워커는 snapshot_dir=None으로 메모리 안에서만 갱신한다.
+
+import gc  # fork 전 객체 동결
+import logging
+import os
+import signal  # 워커 종료 신호 전달
+import socket  # 공유 리슨 소켓
+import threading  # fork 전 스레드 확인
+import time  # 재시작 간격
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("serve")
+
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))  # 워커 프로세스 수
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+LIMIT_CONCURRENCY = int(os.environ.get("LIMIT_CONCURRENCY", "20"))  # 워커당 동시 처리 요청 수
+SHARED_ARRAY_DIR = os.environ.get("SHARED_ARRAY_DIR", "") or None  # 공유 배열 디렉터리 (기본 /dev/shm)
+RESPAWN_DELAY = 1.0  # 워커가 죽었을 때 다시 fork하기 전 대기 시간 (초, 연속 실패 시 과도한 재시작 방지)
+
+
+# 1. 부모 프로세스: 인덱스 사전 로딩
+def preload(application) -> None:
+    """워커가 시작할 때 하던 인덱스 로딩을 부모에서 실행 (스레드 풀을 쓰지 않고 직접 호출)"""
+    if os.environ.get("PRELOAD_IMAGE_INDEX", "true").lower() != "false":
+        application.image_index.ensure_loaded()
+    if hasattr(application.vector_retriever, "ensure_loaded") and os.environ.get("PRELOAD_VECTOR_INDEX", "true").lower() != "false":
+        application.vector_retriever.ensure_loaded()
+
+
+def share_indexes(application) -> None:
+    """BM25 / 이미지 / 텍스트 벡터 인덱스의 큰 배열을 공유 메모리로 이동"""
+    from shared_arrays import SharedArrayStore  # 공유 메모리 배열
+
+    store = SharedArrayStore(SHARED_ARRAY_DIR)
+    for retriever in application.hybrid_retriever.retrievers:
+        if hasattr(retriever, "share") and hasattr(retriever, "engine"):  # 희소 행렬 BM25 (rank_bm25 엔진은 배열이 없음)
+            retriever.share(store, "bm25")
+    application.image_index.share(store, "image")
+    if hasattr(application.vector_retriever, "share"):
+        application.vector_retriever.share(store, "vector")
+    store.close()  # 파일은 매핑 직후 삭제되었으므로 빈 디렉터리만 정리
+    logger.info(f"공유 메모리 배열: {len(store.arrays)}개, {store.nbytes / 1048576:.1f} MB")
+
+
+def close_pooled_connections() -> int:
+    """부모가 로딩 중에 연 HTTP keep-alive 연결을 닫음 (워커들이 같은 소켓을 나눠 쓰면 응답이 섞임)"""
+    try:
+        import httpcore
+    except ImportError:
+        return 0
+    pools = [obj for obj in gc.get_objects() if isinstance(obj, httpcore.ConnectionPool)]
+    for pool in pools:
+        pool.close()  # 연결만 닫히고 풀은 계속 사용 가능 (워커에서 새로 연결)
+    return len(pools)
+
+
+def bind_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# 2. 워커 프로세스
+def run_worker(application, sock: socket.socket, slot: int) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # 부모의 신호 처리기 해제 (uvicorn이 다시 설치)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    if slot != 0:  # BM25 스냅샷은 워커 0만 저장 (갱신기는 앱 시작 시 실행되므로 그 전에 설정)
+        application.bm25_refresher.snapshot_dir = None
+    config = uvicorn.Config(
+        application.app,
+        limit_concurrency=LIMIT_CONCURRENCY,
+        timeout_keep_alive=30,
+        log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(application, sock: socket.socket, slot: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(application, sock, slot)
+        except BaseException:
+            logger.exception("워커 실행 오류")
+            code = 1
+        finally:
+            os._exit(code)  # 부모의 atexit 처리기를 실행하지 않음
+    return pid
+
+
+# 3. 부모 프로세스: 워커 감시
+def main() -> None:
+    gc.disable()  # 로딩 중 만든 객체를 fork 전에 한 번에 동결하기 위해 자동 GC 중지
+    os.environ["WEB_WORKERS"] = str(WEB_WORKERS)  # 앱의 메모리 거버너가 워커당 한도를 계산하도록 전달
+    import app as application  # 앱/검색기/BM25 인덱스 생성
+
+    preload(application)
+    share_indexes(application)
+    closed = close_pooled_connections()
+    if threading.active_count() > 1:  # fork는 호출한 스레드만 복제하므로 다른 스레드가 잡은 잠금이 워커에서 풀리지 않을 수 있음
+        logger.warning(f"fork 전에 실행 중인 스레드가 있습니다: {[t.name for t in threading.enumerate()]}")
+    sock = bind_socket()
+
+    gc.collect()
+    gc.freeze()  # 이후 워커의 GC가 부모에서 만든 객체를 검사하지 않음 (copy-on-write 방지)
+    logger.info(f"사전 로딩 완료, 워커 {WEB_WORKERS}개 시작 (포트 {PORT}, 닫은 HTTP 연결 풀 {closed}개)")
+
+    workers = {spawn(application, sock, slot): slot for slot in range(WEB_WORKERS)}  # pid -> 슬롯 번호
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)  # uvicorn의 정상 종료 (처리 중인 요청 완료 후 종료)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = workers.pop(pid, None)
+        if stopping or slot is None:
+            continue
+        logger.warning(f"워커 {pid} 종료 (상태 {status}), 다시 시작합니다")
+        time.sleep(RESPAWN_DELAY)
+        workers[spawn(application, sock, slot)] = slot
+
+    sock.close()
+    logger.info("모든 워커가 종료되었습니다")
+
+
+if __name__ == "__main__":
+    main()
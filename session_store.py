@@ -0,0 +1,228 @@
+# 대화 세션 저장소 모듈
+# 클라이언트가 대화 이력 전체 대신 session_id만 보내면, 서버가 세션별 최근 대화를 보관한다.
+#  - 세션마다 최근 max_turns개 대화만 남기는 링 버퍼 (오래된 대화는 밀려남)
+#  - idle_ttl(초) 동안 사용하지 않은 세션은 제거하고, 세션 수가 max_sessions를 넘으면 가장 오래 쉰 세션부터 제거
+#  - 저장하는 답변은 max_answer_chars자로 잘라 프롬프트에 들어가는 이전 답변 길이도 제한
+# 백엔드는 memory(프로세스 메모리, 워커별)와 sqlite(로컬 파일, 같은 호스트의 워커끼리 공유) 두 가지이다.
+
+import abc  # 백엔드 인터페이스
+import os  # SQLite 파일 디렉터리 / 프로세스 확인
+import sqlite3  # SQLite 백엔드
+import threading  # 동시 접근 보호
+import time  # 마지막 사용 시각
+from collections import OrderedDict, deque  # 세션 LRU 순서 / 링 버퍼
+from typing import Any, Deque, Dict, List, Optional, Tuple  # 타입 힌트
+
+SESSION_BACKENDS = ("memory", "sqlite")  # 지원하는 백엔드
+
+
+class SessionStore(abc.ABC):
+    """세션별 최근 대화 저장소 인터페이스 (대화 = {"user": 질문, "ai": 답변}, build_conversation_context 형식)"""
+
+    backend = "none"
+
+    def __init__(self, max_turns: int = 5, idle_ttl: Optional[float] = 1800.0, max_sessions: int = 10000,
+                 max_answer_chars: int = 1000):
+        self.max_turns = max(1, int(max_turns))  # 세션별 보관 대화 수
+        self.idle_ttl = idle_ttl if idle_ttl and idle_ttl > 0 else None  # 유휴 세션 제거 시간 (초, None이면 무제한)
+        self.max_sessions = max(1, int(max_sessions))  # 최대 세션 수
+        self.max_answer_chars = max_answer_chars  # 저장할 답변 최대 길이 (0이면 자르지 않음)
+        self.evictions = 0  # 유휴/크기 초과로 제거된 세션 수
+
+    def _turn(self, user: str, ai: str) -> Dict[str, str]:
+        if self.max_answer_chars and len(ai) > self.max_answer_chars:
+            ai = ai[:self.max_answer_chars] + "..."
+        return {"user": user, "ai": ai}
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        """세션의 최근 대화 (오래된 순, 없거나 만료되면 빈 목록)"""
+
+    @abc.abstractmethod
+    def append(self, session_id: str, user: str, ai: str) -> None:
+        """대화 하나를 추가 (max_turns를 넘으면 가장 오래된 대화 제거)"""
+
+    @abc.abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """세션 삭제 (있었으면 True)"""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """보관 중인 세션 수"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "sessions": len(self),
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "idle_ttl": self.idle_ttl,
+            "evictions": self.evictions,
+        }
+
+
+# 1. 메모리 백엔드
+class MemorySessionStore(SessionStore):
+    """프로세스 메모리 세션 저장소 (세션 -> deque(maxlen=max_turns), 마지막 사용 순서로 정렬)"""
+
+    backend = "memory"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sessions: "OrderedDict[str, Tuple[float, Deque[Dict[str, str]]]]" = OrderedDict()  # 세션 -> (마지막 사용 시각, 대화)
+        self._lock = threading.Lock()  # 동시 접근 보호
+
+    def _evict(self, now: float) -> None:
+        """앞쪽(가장 오래 쉰 세션)부터 만료 / 크기 초과 세션 제거 (잠금 안에서 호출)"""
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and not (self.idle_ttl and last_used + self.idle_ttl < now):
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def append(self, session_id: str, user: str, ai: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            turns = entry[1] if entry is not None else deque(maxlen=self.max_turns)
+            turns.append(self._turn(user, ai))
+            self._sessions[session_id] = (now, turns)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# 2. SQLite 백엔드
+class SQLiteSessionStore(SessionStore):
+    """로컬 SQLite 파일 세션 저장소 (serve.py 다중 워커가 같은 파일을 공유, 재시작 후에도 유지)
+
+    대화마다 세션 안의 순번(seq)을 붙여 저장하고, 추가할 때 seq가 max_turns개 이전인 대화를 지워 링 버퍼를 유지한다.
+    유휴 세션 정리는 쓰기 때 최대 cleanup_interval초에 한 번 실행한다.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = ".cache/sessions.sqlite3", *args, cleanup_interval: float = 60.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path  # SQLite 파일 경로
+        self.cleanup_interval = cleanup_interval  # 유휴 세션 정리 최소 간격 (초)
+        self._conn: Optional[sqlite3.Connection] = None  # 프로세스별 연결 (fork 후 다시 연결)
+        self._pid: Optional[int] = None  # 연결을 만든 프로세스
+        self._lock = threading.Lock()  # 연결 공유 보호
+        self._last_cleanup = 0.0  # 마지막 정리 시각
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")  # 읽기와 쓰기가 서로 막지 않음
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_used REAL NOT NULL, next_seq INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS turns (session_id TEXT NOT NULL, seq INTEGER NOT NULL, user TEXT NOT NULL, "
+                         "ai TEXT NOT NULL, PRIMARY KEY (session_id, seq))")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _cleanup(self, conn: sqlite3.Connection, now: float) -> None:
+        """유휴 세션과 최대 세션 수를 넘는 오래된 세션 제거 (잠금과 트랜잭션 안에서 호출)"""
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        expired = []
+        if self.idle_ttl:
+            expired = [row[0] for row in conn.execute("SELECT session_id FROM sessions WHERE last_used < ?", (now - self.idle_ttl,))]
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - len(expired) - self.max_sessions
+        if overflow > 0:
+            expired += [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE last_used >= ? ORDER BY last_used LIMIT ?",
+                (now - self.idle_ttl if self.idle_ttl else float("-inf"), overflow))]
+        for session_id in expired:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.evictions += len(expired)
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        now = time.time()  # 프로세스끼리 공유하므로 벽시계 시각 사용
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT last_used FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return []
+            if self.idle_ttl and row[0] + self.idle_ttl < now:  # 정리 전의 만료 세션은 없는 것으로 취급
+                return []
+            conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+            rows = conn.execute("SELECT user, ai FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        return [{"user": user, "ai": ai} for user, ai in rows]
+
+    def append(self, session_id: str, user: str, ai: str) -> None:
+        now = time.time()
+        turn = self._turn(user, ai)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT last_used, next_seq FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                if row is not None and self.idle_ttl and row[0] + self.idle_ttl < now:  # 만료된 세션은 새로 시작
+                    conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+                    row = None
+                seq = row[1] if row is not None else 0
+                conn.execute("INSERT OR REPLACE INTO sessions (session_id, last_used, next_seq) VALUES (?, ?, ?)", (session_id, now, seq + 1))
+                conn.execute("INSERT OR REPLACE INTO turns (session_id, seq, user, ai) VALUES (?, ?, ?, ?)", (session_id, seq, turn["user"], turn["ai"]))
+                conn.execute("DELETE FROM turns WHERE session_id = ? AND seq <= ?", (session_id, seq - self.max_turns))
+                self._cleanup(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+                deleted = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+def create_session_store(backend: str = "memory", sqlite_path: str = ".cache/sessions.sqlite3", **kwargs) -> SessionStore:
+    """SESSION_BACKEND 값에 맞는 세션 저장소 생성"""
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"지원하지 않는 세션 백엔드: {backend} ({', '.join(SESSION_BACKENDS)})")
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, **kwargs)
+    return MemorySessionStore(**kwargs)
@@ -0,0 +1,49 @@
+# 프로세스 간 공유 배열 모듈
+# serve.py(사전 로딩 후 fork하는 다중 워커 모드)에서 부모 프로세스가 만든 큰 numpy 배열
+# (BM25 포스팅/가중치, 텍스트/이미지 임베딩 행렬)을 tmpfs(/dev/shm) 파일로 옮기고 읽기 전용 mmap으로 다시 연다.
+# fork된 워커는 같은 물리 페이지를 그대로 읽으므로 워커 수가 늘어도 배열 메모리는 한 번만 사용된다.
+# 파일은 매핑 직후 삭제하므로(매핑은 유지됨) 프로세스가 비정상 종료해도 /dev/shm에 남지 않는다.
+
+import logging  # 공유 결과 로그
+import os  # 파일 삭제
+import tempfile  # 공유 디렉터리 생성
+from typing import Any, Dict, Optional  # 타입 힌트
+
+import numpy as np  # 배열 저장 / 매핑
+
+logger = logging.getLogger(__name__)
+
+_SHM_DIR = "/dev/shm"  # 리눅스 공유 메모리 tmpfs
+
+
+class SharedArrayStore:
+    """배열을 공유 메모리 파일에 복사하고 읽기 전용 mmap 배열로 교체"""
+
+    def __init__(self, directory: Optional[str] = None, prefix: str = "chatbot-arrays-"):
+        base = directory or (_SHM_DIR if os.path.isdir(_SHM_DIR) else None)  # /dev/shm이 없으면 임시 디렉터리 (페이지 캐시 공유)
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=base)
+        self.arrays: Dict[str, int] = {}  # 공유한 배열 이름 -> 바이트 수
+
+    def share(self, name: str, array: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """배열을 공유 메모리로 옮긴 읽기 전용 배열 반환 (비어 있거나 이미 매핑된 배열은 그대로)"""
+        if array is None or isinstance(array, np.memmap) or array.size == 0:
+            return array
+        path = os.path.join(self.directory, f"{name}.npy")
+        np.save(path, np.ascontiguousarray(array))
+        shared = np.load(path, mmap_mode="r")  # 쓰기 시도는 ValueError (실수로 인한 copy-on-write 방지)
+        os.unlink(path)  # 매핑은 프로세스가 끝날 때까지 유지됨
+        self.arrays[name] = int(array.nbytes)
+        return shared
+
+    def close(self) -> None:
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.arrays.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "arrays": len(self.arrays), "bytes": self.nbytes}
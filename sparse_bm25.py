@@ -0,0 +1,175 @@
+# 희소 행렬 기반 BM25 키워드 검색 모듈
+# rank_bm25는 질의마다 모든 문서를 파이썬 루프로 점수화하므로 문서 수에 비례하는 파이썬 연산이 발생한다.
+# 여기서는 단어-문서 행렬을 CSR(단어별 포스팅) 형식으로 보관하고 BM25 가중치를 미리 계산해 두어,
+# 질의 단어의 포스팅만 벡터 연산으로 더한 뒤 argpartition으로 상위 k개를 고른다.
+#
+# 한국어는 조사가 명사에 붙어 공백 분리로는 "배터리가"와 "배터리"가 다른 단어가 되므로
+# 조사/어미를 떼어 낸 어간과 글자 바이그램을 함께 색인한다.
+
+import re  # 단어 분리
+from collections import OrderedDict  # 분석 결과 캐시
+from typing import Any, Dict, List, Optional, Tuple  # 타입 힌트
+
+import numpy as np  # 포스팅 연산
+
+from bm25_index import BM25Snapshot  # CSR 역색인
+from document_store import DocumentStore  # 문서 저장소
+
+# 1. 한국어 토크나이저
+_WORD_PATTERN = re.compile(r"[가-힣]+|[a-z0-9]+(?:[.\-][a-z0-9]+)*")  # 한글 단어 / 영문·숫자 단어 (S25, wi-fi, 1.5 등)
+
+# 명사 뒤에 붙는 조사와 자주 쓰이는 서술 어미 (긴 것부터 검사)
+_SUFFIXES = sorted([
+    "에서는", "에서도", "에게서", "으로는", "으로도", "으로서", "으로써", "이라고", "까지는", "부터는", "하려면", "합니다", "하세요",
+    "에서", "에게", "한테", "으로", "까지", "부터", "처럼", "보다", "이나", "이랑", "라고", "와는", "과는", "에는", "에도", "만큼",
+    "하는", "하기", "하고", "해서", "하면", "되는", "되면", "입니다",
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "와", "과", "로", "나", "랑", "요", "한", "할",
+], key=len, reverse=True)
+
+
+class KoreanTokenizer:
+    """조사 제거 + 글자 바이그램 토크나이저
+
+    "홈화면에서" -> ["홈화면", "홈화", "화면"]: 어간으로 정확히 일치시키고,
+    바이그램으로 띄어쓰기가 다른 복합 명사("홈 화면")도 찾을 수 있게 한다.
+    단어 단위 분석 결과는 캐시하여 같은 단어를 반복 분석하지 않는다.
+    """
+
+    def __init__(self, ngram: int = 2, strip_particles: bool = True, cache_size: int = 100_000):
+        self.name = f"korean-{ngram}gram" if ngram else "korean"  # 스냅샷 매니페스트에 기록되는 토크나이저 이름
+        self.ngram = ngram  # 글자 n-gram 길이 (0이면 사용 안 함)
+        self.strip_particles = strip_particles  # 조사/어미 제거 여부
+        self.cache_size = cache_size  # 단어 분석 캐시 크기
+        self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()  # 단어 -> 분석 결과
+
+    def stem(self, word: str) -> str:
+        if not self.strip_particles:
+            return word
+        for suffix in _SUFFIXES:
+            # 한 글자 조사는 어간이 두 글자 이상일 때만 제거 ("추가" -> "추" 방지)
+            if word.endswith(suffix) and len(word) - len(suffix) >= (2 if len(suffix) == 1 else 1):
+                return word[:-len(suffix)]
+        return word
+
+    def analyze_word(self, word: str) -> Tuple[str, ...]:
+        cached = self._cache.get(word)
+        if cached is not None:
+            return cached
+
+        if "가" <= word[0] <= "힣":
+            stem = self.stem(word)
+            tokens = [stem]
+            if self.ngram and len(stem) > self.ngram:  # 어간이 n-gram보다 길면 n-gram 추가
+                tokens.extend(stem[i:i + self.ngram] for i in range(len(stem) - self.ngram + 1))
+        else:
+            tokens = [word]
+        analyzed = tuple(tokens)
+
+        self._cache[word] = analyzed  # 경합 시 중복 계산만 발생하므로 잠금 없이 사용
+        if len(self._cache) > self.cache_size:
+            try:
+                self._cache.popitem(last=False)
+            except KeyError:
+                pass
+        return analyzed
+
+    def __call__(self, text: str) -> List[str]:
+        tokens: List[str] = []
+        for word in _WORD_PATTERN.findall((text or "").lower()):
+            tokens.extend(self.analyze_word(word))
+        return tokens
+
+
+korean_tokenizer = KoreanTokenizer()  # 기본 토크나이저 (프로세스 전역 분석 캐시 공유)
+
+
+# 2. 희소 행렬 BM25 엔진
+class SparseBM25:
+    """CSR 역색인과 미리 계산한 BM25 가중치로 질의를 점수화
+
+    가중치는 rank_bm25.BM25Okapi와 같은 식(ATIRE IDF, 음수 IDF는 epsilon * 평균 IDF로 대체)을 사용하므로
+    같은 토크나이저를 쓰면 점수가 rank_bm25와 일치한다.
+    """
+
+    def __init__(self, snapshot: BM25Snapshot, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.vocab = {token: term_id for term_id, token in enumerate(snapshot.vocab)}  # 단어 -> 단어 번호
+        self.indptr = np.asarray(snapshot.indptr)  # 단어별 포스팅 시작 위치
+        self.doc_ids = np.asarray(snapshot.doc_ids)  # 포스팅 문서 번호 (메모리 매핑 배열 그대로 사용)
+        self.corpus_size = len(snapshot.doc_len)
+
+        doc_len = np.asarray(snapshot.doc_len, dtype=np.float32)
+        avgdl = float(doc_len.mean()) if self.corpus_size else 0.0
+        df = np.diff(self.indptr).astype(np.float64)  # 단어별 문서 빈도
+        idf = np.log(self.corpus_size - df + 0.5) - np.log(df + 0.5)
+        if idf.size:
+            idf[idf < 0] = epsilon * idf.mean()
+        self.idf = idf.astype(np.float32)
+
+        # 포스팅별 BM25 가중치: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        tfs = np.asarray(snapshot.tfs, dtype=np.float32)
+        norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.full(self.corpus_size, k1, dtype=np.float32)
+        term_of_posting = np.repeat(np.arange(len(df), dtype=np.int32), np.diff(self.indptr))
+        self.weights = (self.idf[term_of_posting] * tfs * (k1 + 1) / (tfs + norm[self.doc_ids])).astype(np.float32)
+
+    def share(self, store, name: str = "bm25") -> None:
+        """포스팅 배열과 가중치를 공유 메모리(SharedArrayStore)로 이동 (fork 전 부모 프로세스에서 호출)"""
+        for array_name in ("indptr", "doc_ids", "idf", "weights"):
+            setattr(self, array_name, store.share(f"{name}-{array_name}", getattr(self, array_name)))
+
+    def query_terms(self, tokens: List[str]) -> Dict[int, int]:
+        """질의 토큰을 단어 번호별 출현 횟수로 변환 (색인에 없는 단어 제외)"""
+        terms: Dict[int, int] = {}
+        for token in tokens:
+            term_id = self.vocab.get(token)
+            if term_id is not None:
+                terms[term_id] = terms.get(term_id, 0) + 1
+        return terms
+
+    def get_scores(self, tokens: List[str]) -> np.ndarray:
+        """질의 벡터와 단어-문서 행렬의 희소 내적"""
+        scores = np.zeros(self.corpus_size, dtype=np.float32)
+        for term_id, count in self.query_terms(tokens).items():
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.doc_ids[start:end]] += count * self.weights[start:end]  # 한 단어의 포스팅 안에서 문서는 중복되지 않음
+        return scores
+
+    def top_k(self, tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """점수가 0보다 큰 상위 k개 문서 (문서 번호, 점수)"""
+        scores = self.get_scores(tokens)
+        if k <= 0 or scores.size == 0:
+            return []
+        if scores.size > k:
+            candidates = np.argpartition(-scores, k - 1)[:k]  # 전체 정렬 없이 상위 k개 선택
+        else:
+            candidates = np.arange(scores.size)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in order if scores[i] > 0]
+
+
+# 3. 검색기
+class SparseBM25Retriever:
+    """EnhancedEnsembleRetriever에서 BM25Retriever 대신 사용하는 키워드 검색기"""
+
+    def __init__(self, engine: SparseBM25, store: DocumentStore, tokenizer=korean_tokenizer, k: int = 5):
+        self.engine = engine  # 희소 행렬 BM25 엔진
+        self.store = store  # 문서 번호 순 문서 저장소 (결과는 DocHandle, Document 변환은 하이브리드 검색기에서)
+        self.tokenizer = tokenizer  # 질의 토크나이저 (색인과 동일해야 함)
+        self.k = k  # 검색 결과 수
+
+    @classmethod
+    def from_index(cls, index, k: int = 5, **bm25_params) -> "SparseBM25Retriever":
+        """BM25Index(문서별 단어 빈도)로부터 생성"""
+        return cls(SparseBM25(index.to_snapshot(), **bm25_params), index.store, tokenizer=index.tokenizer, k=k)
+
+    def share(self, store, name: str = "bm25") -> None:
+        self.engine.share(store, name)
+        self.store.share(store, f"{name}-documents")
+
+    def invoke(self, query: str, k: Optional[int] = None) -> List[Any]:
+        return [self.store.handle(i) for i, _ in self.engine.top_k(self.tokenizer(query), k or self.k)]
+
+    def batch_invoke(self, queries: List[str], k: Optional[int] = None) -> List[List[Any]]:
+        return [self.invoke(query, k) for query in queries]
+
+    def get_relevant_documents(self, query: str) -> List[Any]:
+        return self.invoke(query)
@@ -19,5 +19,19 @@ fi
 
 echo "애플리케이션 시작 중... (포트: $PORT)"
 
+# 블로킹 작업 스레드 풀 크기 / 동시 처리 요청 수 (핸들러가 이벤트 루프를 막지 않으므로 단일 워커로 여러 요청 처리)
+export BLOCKING_POOL_SIZE=${BLOCKING_POOL_SIZE:-8}
+export LIMIT_CONCURRENCY=${LIMIT_CONCURRENCY:-20}
+
+# 메모리 거버너 한도 (MB) - 현재 RSS가 한도의 75%를 넘으면 정리, 90%를 넘으면 검색/대화 요청 거절
+export MEMORY_LIMIT_MB=${MEMORY_LIMIT_MB:-512}
+
+# 워커 수 - 2 이상이면 인덱스를 한 번만 로딩해 공유 메모리로 옮긴 뒤 fork하는 serve.py 사용
+# (메모리 거버너 한도는 워커 수로 나누어 워커별 PSS와 비교)
+export WEB_WORKERS=${WEB_WORKERS:-1}
+if [ "$WEB_WORKERS" -gt 1 ]; then
+  exec python serve.py
+fi
+
 # 서버 실행 (단일 워커, 동시성 제한, 유휴 연결 타임아웃 설정)
-exec uvicorn app:app --host 0.0.0.0 --port $PORT --workers 1 --limit-concurrency 5 --timeout-keep-alive 30 
\ No newline at end of file
+exec uvicorn app:app --host 0.0.0.0 --port $PORT --workers 1 --limit-concurrency $LIMIT_CONCURRENCY --timeout-keep-alive 30 
\ No newline at end of file
@@ -0,0 +1,146 @@
+# 요청별 구간(span) 기록 모듈
+# 검색/대화 요청 하나를 트리 형태의 구간으로 기록하여 debug_info에서 시간이 어디에 쓰였는지 보여 주고,
+# 기준 시간을 넘은 요청은 느린 쿼리 로그(JSON 한 줄)로 남긴다.
+# 현재 구간은 contextvars로 전달되므로 스레드 풀(copy_context().run)에서 실행된 단계도 같은 트리에 기록된다.
+# 진행 중인 트레이스가 없으면 span()은 아무것도 기록하지 않는다.
+
+import contextvars  # 현재 구간 전달
+import json  # 느린 쿼리 로그 직렬화
+import logging
+import os  # 로그 파일 경로
+import time  # 구간 시간 측정
+from contextlib import contextmanager  # 구간 컨텍스트 매니저
+from typing import Any, Dict, List, Optional  # 타입 힌트
+
+slow_query_logger = logging.getLogger("slow_query")  # 느린 쿼리 로그 (JSON 한 줄)
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+
+# 1. 구간
+class Span:
+    """단계 이름, 트레이스 시작 기준 시작 시점, 소요 시간, 외부 호출 수, 하위 구간"""
+
+    __slots__ = ("name", "trace", "started", "duration", "external_calls", "children", "attrs")
+
+    def __init__(self, name: str, trace: "Trace", started: float):
+        self.name = name  # 단계 이름
+        self.trace = trace  # 소속 트레이스
+        self.started = started  # 시작 시각 (perf_counter)
+        self.duration: Optional[float] = None  # 소요 시간 (초, 진행 중이면 None)
+        self.external_calls = 0  # 이 구간에서 직접 실행한 외부 호출 수 (Cohere, Supabase, OpenAI)
+        self.children: List["Span"] = []  # 하위 구간 (여러 스레드에서 추가될 수 있음)
+        self.attrs: Dict[str, Any] = {}  # 추가 정보
+
+    def total_external_calls(self) -> int:
+        return self.external_calls + sum(child.total_external_calls() for child in list(self.children))
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.started
+        node = {
+            "name": self.name,
+            "start_ms": round((self.started - self.trace.root.started) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            "external_calls": self.total_external_calls(),
+        }
+        if self.attrs:
+            node.update(self.attrs)
+        children = sorted(list(self.children), key=lambda child: child.started)
+        if children:
+            node["children"] = [child.to_dict() for child in children]
+        return node
+
+
+# 2. 트레이스 (요청 하나의 구간 트리)
+class Trace:
+    def __init__(self, name: str, slow_threshold_ms: Optional[float] = None, **attrs):
+        self.root = Span(name, self, time.perf_counter())  # 최상위 구간
+        self.slow_threshold_ms = slow_threshold_ms  # 느린 쿼리 기준 (ms, None이면 기록 안 함)
+        self.attrs: Dict[str, Any] = dict(attrs)  # 느린 쿼리 로그에 함께 남길 정보 (질문, 선택된 페이지 등)
+
+    @property
+    def duration_ms(self) -> float:
+        duration = self.root.duration if self.root.duration is not None else time.perf_counter() - self.root.started
+        return duration * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.root.to_dict()
+
+    def finish(self) -> None:
+        self.root.duration = time.perf_counter() - self.root.started
+        if self.slow_threshold_ms is not None and self.duration_ms >= self.slow_threshold_ms:
+            record = {"event": "slow_query", "name": self.root.name, "duration_ms": round(self.duration_ms, 1)}
+            record.update(self.attrs)
+            record["spans"] = self.to_dict()
+            slow_query_logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def configure_slow_query_log(path: Optional[str] = None) -> None:
+    """느린 쿼리 로그를 파일에도 JSON Lines 형식으로 기록 (path가 없으면 표준 로그만 사용)"""
+    if not path or any(getattr(handler, "baseFilename", None) == os.path.abspath(path) for handler in slow_query_logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_query_logger.addHandler(handler)
+
+
+def current_trace() -> Optional[Trace]:
+    span = _current_span.get()
+    return span.trace if span is not None else None
+
+
+@contextmanager
+def start_trace(name: str, slow_threshold_ms: Optional[float] = None, **attrs):
+    """요청 트레이스 시작 (이미 진행 중인 트레이스가 있으면 그 안의 하위 구간으로 기록)
+
+    with start_trace("chat", slow_threshold_ms=5000, query=message) as trace:
+        ...
+    debug_info["timing"] = trace.to_dict()
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        with span(name):
+            yield parent.trace
+        return
+
+    trace = Trace(name, slow_threshold_ms, **attrs)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """현재 트레이스에 하위 구간 기록 (트레이스가 없으면 기록하지 않음)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, time.perf_counter())
+    if attrs:
+        child.attrs.update(attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.duration = time.perf_counter() - child.started
+        _current_span.reset(token)
+
+
+def external_call(count: int = 1) -> None:
+    """현재 구간에 외부 API/DB 호출 수 추가"""
+    current = _current_span.get()
+    if current is not None:
+        current.external_calls += count
+
+
+def annotate(**attrs) -> None:
+    """현재 트레이스의 느린 쿼리 로그 정보 추가 (선택된 페이지 등)"""
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs.update(attrs)
@@ -0,0 +1,62 @@
+# pgvector 임베딩 인코딩/디코딩 모듈
+# Supabase(PostgREST)가 돌려주는 pgvector 값을 파이썬 리스트를 거치지 않고 바로 float32 배열로 변환한다.
+#  - 텍스트 형식: "[0.1,0.2,...]"              -> np.fromstring (C 파서)
+#  - 바이너리 형식: vector_send() 결과 (bytea)  -> np.frombuffer (복사 1회)
+#    (PostgREST에서는 "\x..." hex 문자열 또는 base64 문자열로 전달됨)
+
+import base64  # base64 바이너리 디코딩
+import struct  # 바이너리 헤더 파싱
+from typing import Optional, Sequence  # 타입 힌트
+
+import numpy as np  # 배열 변환
+
+_HEADER = struct.Struct(">HH")  # pgvector 바이너리 헤더: 차원(uint16), 예약(uint16)
+
+
+def decode_vector_binary(buffer) -> np.ndarray:
+    """pgvector 바이너리 형식(vector_send)을 float32 배열로 변환"""
+    buffer = memoryview(buffer)
+    if len(buffer) < _HEADER.size:
+        raise ValueError("pgvector 바이너리 길이가 너무 짧습니다")
+    dim, _ = _HEADER.unpack_from(buffer)
+    if len(buffer) != _HEADER.size + dim * 4:
+        raise ValueError(f"pgvector 바이너리 길이 불일치: 차원 {dim}, 길이 {len(buffer)}")
+    return np.frombuffer(buffer, dtype=">f4", count=dim, offset=_HEADER.size).astype(np.float32)  # 빅엔디언 -> 네이티브
+
+
+def decode_vector_text(text: str) -> np.ndarray:
+    """pgvector 텍스트 형식("[0.1, 0.2, ...]")을 float32 배열로 변환"""
+    body = text.strip()
+    if body.startswith("[") and body.endswith("]"):
+        body = body[1:-1]
+    if not body.strip():
+        return np.zeros(0, dtype=np.float32)
+
+    vector = np.fromstring(body, dtype=np.float32, sep=",")  # 공백은 구분자 주변에서 무시됨
+    if vector.shape[0] != body.count(",") + 1:  # 파싱이 중간에 멈춘 경우
+        raise ValueError(f"pgvector 텍스트 파싱 실패: {text[:50]}...")
+    return vector
+
+
+def decode_vector(value) -> Optional[np.ndarray]:
+    """Supabase에서 받은 임베딩 값을 형식에 맞춰 float32 배열로 변환 (None은 그대로 반환)"""
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_vector_binary(value)
+    if isinstance(value, str):
+        stripped = value.lstrip()
+        if stripped.startswith("["):  # 텍스트 형식
+            return decode_vector_text(stripped)
+        if stripped.startswith("\\x"):  # bytea hex 출력
+            return decode_vector_binary(bytes.fromhex(stripped[2:]))
+        return decode_vector_binary(base64.b64decode("".join(stripped.split()), validate=True))  # base64 바이너리 (줄바꿈 제거)
+    return np.asarray(value, dtype=np.float32)  # JSON 배열 (파이썬 리스트)
+
+
+def encode_vector(vector: Sequence[float], precision: int = 7) -> str:
+    """RPC 파라미터용 pgvector 텍스트 형식 인코딩 (JSON 실수 배열보다 짧음)"""
+    array = np.asarray(vector, dtype=np.float32)
+    return "[" + ",".join(format(float(x), f".{precision}g") for x in array) + "]"
@@ -0,0 +1,345 @@
+# 인프로세스 벡터 검색 모듈
+# text_embeddings 테이블을 메모리에 정규화된 행렬(float32, 또는 quantization.py의 int8)로 복제해 두고,
+# Supabase RPC(match_text_embeddings) 왕복 없이 프로세스 안에서 코사인 유사도 검색을 한다.
+#  - FlatIndex: 전체 행렬-벡터 곱 (정확한 검색, 수만 건까지 1 ms 안팎)
+#  - IVFIndex: k-means 중심점으로 나눈 역색인에서 가까운 nprobe개 목록만 검색 (근사 검색, 대규모 코퍼스용)
+# LocalVectorRetriever는 EnhancedSupabaseRetriever와 같은 invoke(query, page_filter) / batch_invoke 인터페이스를 제공한다.
+# 복제본은 최초 로딩 시점의 스냅샷이다. reload_interval(INDEX_RELOAD_INTERVAL)을 주지 않으면 이후 테이블 변경은
+# 재시작 전까지 반영되지 않는다 (다시 로딩 방식은 index_loading.py 참고).
+
+import logging  # 로딩 로그
+import math  # IVF 목록 수 계산
+import threading  # 로딩 동시성 제어
+import time  # 로딩 시각 기록
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union  # 타입 힌트
+
+import numpy as np  # 행렬 연산
+
+from document_store import DocHandle, DocumentStore  # 본문 버퍼 / 메타데이터 코드 배열 문서 저장소
+from image_index import page_key  # 페이지 값 정규화
+from index_loading import LazyLoading  # 지연 로딩 / 실패 후 재시도 대기 / 주기적 다시 로딩
+from quantization import QuantizedMatrix, as_quantized  # int8 임베딩 저장
+from metrics import stage  # 단계별 지연 시간 메트릭
+from vector_codec import decode_vector  # pgvector 임베딩 디코딩
+
+logger = logging.getLogger(__name__)
+
+Hit = Tuple[int, float]  # (행 번호, 코사인 유사도)
+
+
+# 1. 공통 함수
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """행 단위 L2 정규화 (내적 = 코사인 유사도)"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def normalize_query(query) -> Optional[np.ndarray]:
+    vector = np.asarray(query, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def top_hits(scores: np.ndarray, rows: Optional[np.ndarray], k: int, threshold: Optional[float] = None) -> List[Hit]:
+    """점수 배열에서 상위 k개 (전체 정렬 없이 argpartition 사용, threshold 이하는 제외)"""
+    if k <= 0 or scores.size == 0:
+        return []
+    if scores.size > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    hits = []
+    for i in order:
+        score = float(scores[i])
+        if threshold is not None and score <= threshold:  # match_text_embeddings와 같이 임계치 초과만 반환
+            break
+        hits.append((int(rows[i]) if rows is not None else int(i), score))
+    return hits
+
+
+# 2. 검색 인덱스
+class FlatIndex:
+    """정확한 검색: 정규화된 행렬 전체와의 내적 (양자화 행렬이면 상위 후보를 원본으로 재점수화)"""
+
+    kind = "flat"
+
+    def __init__(self, matrix: Union[np.ndarray, QuantizedMatrix]):
+        self.matrix = as_quantized(matrix)  # (행 수, 차원) 정규화된 행렬 (float32 / int8)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def search(self, query: np.ndarray, k: int, threshold: Optional[float] = None) -> List[Hit]:
+        rows, scores = self.matrix.candidates(query, k)
+        return top_hits(scores, rows, k, threshold)
+
+    def search_batch(self, queries: np.ndarray, k: int, threshold: Optional[float] = None) -> List[List[Hit]]:
+        batch_scores = self.matrix.dot_batch(queries)  # 쿼리 묶음 전체를 행렬 곱 한 번으로 계산
+        results = []
+        for query, approx in zip(queries, batch_scores):
+            rows, scores = self.matrix.candidates(query, k, scores=approx)
+            results.append(top_hits(scores, rows, k, threshold))
+        return results
+
+    def share(self, store, name: str) -> None:
+        self.matrix.share(store, f"{name}-matrix")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "rows": len(self), **self.matrix.stats()}
+
+
+class IVFIndex:
+    """근사 검색: 구면 k-means로 행을 nlist개 목록으로 나누고, 질의와 가까운 nprobe개 목록만 정확히 점수화"""
+
+    kind = "ivf"
+
+    def __init__(self, matrix: Union[np.ndarray, QuantizedMatrix], nlist: Optional[int] = None, nprobe: int = 8, iterations: int = 10,
+                 train_size: int = 20000, seed: int = 0):
+        self.matrix = matrix = as_quantized(matrix)  # (행 수, 차원) 정규화된 행렬 (float32 / int8)
+        n = len(matrix)
+        self.nlist = max(1, min(n, nlist or int(math.sqrt(n))))  # 목록 수 (기본 sqrt(n), pgvector ivfflat 권장값과 같은 규모)
+        self.nprobe = max(1, min(self.nlist, nprobe))  # 질의당 검색할 목록 수
+        rng = np.random.default_rng(seed)
+
+        # 학습: 표본으로 중심점 계산 (구면 k-means - 내적으로 배정, 평균을 다시 정규화)
+        sample = matrix.float32() if n <= train_size else matrix.float32(np.sort(rng.choice(n, train_size, replace=False)))
+        centroids = sample[rng.choice(sample.shape[0], self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            for start in range(0, sample.shape[0], 2048):  # 목록별 합을 원-핫 행렬 곱으로 계산 (BLAS 사용)
+                one_hot = (assign[start:start + 2048][None, :] == np.arange(self.nlist)[:, None]).astype(np.float32)
+                sums += one_hot @ sample[start:start + 2048]
+            empty = np.bincount(assign, minlength=self.nlist) == 0
+            sums[empty] = centroids[empty]  # 비어 있는 목록은 이전 중심점 유지
+            centroids = normalize_rows(sums)
+        self.centroids = centroids
+
+        # 전체 행 배정 후 목록별 행 번호를 CSR 형식으로 보관
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 8192):  # 메모리 사용을 줄이기 위해 나누어 계산
+            assign[start:start + 8192] = np.argmax(matrix.float32(slice(start, start + 8192)) @ centroids.T, axis=1)
+        self.list_rows = np.argsort(assign, kind="stable").astype(np.int32)  # 목록 순으로 정렬된 행 번호
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))]).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        centroid_scores = self.centroids @ query
+        if self.nprobe < self.nlist:
+            probes = np.argpartition(-centroid_scores, self.nprobe - 1)[:self.nprobe]
+        else:
+            probes = np.arange(self.nlist)
+        return np.concatenate([self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes])
+
+    def search(self, query: np.ndarray, k: int, threshold: Optional[float] = None) -> List[Hit]:
+        rows, scores = self.matrix.candidates(query, k, self._candidates(query))
+        return top_hits(scores, rows, k, threshold)
+
+    def search_batch(self, queries: np.ndarray, k: int, threshold: Optional[float] = None) -> List[List[Hit]]:
+        return [self.search(query, k, threshold) for query in queries]
+
+    def share(self, store, name: str) -> None:
+        self.matrix.share(store, f"{name}-matrix")
+        for array_name in ("centroids", "list_rows", "list_offsets"):
+            setattr(self, array_name, store.share(f"{name}-{array_name}", getattr(self, array_name)))
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = np.diff(self.list_offsets)
+        return {"kind": self.kind, "rows": len(self), "nlist": self.nlist, "nprobe": self.nprobe,
+                "max_list_size": int(sizes.max()) if sizes.size else 0, **self.matrix.stats()}
+
+
+def build_index(matrix: Union[np.ndarray, QuantizedMatrix], backend: str = "auto", ivf_min_rows: int = 50000,
+                nlist: Optional[int] = None, nprobe: int = 8):
+    """설정에 맞는 검색 인덱스 생성 (auto: ivf_min_rows 미만이면 flat, 이상이면 ivf)"""
+    if backend == "ivf" or (backend == "auto" and matrix.shape[0] >= ivf_min_rows):
+        return IVFIndex(matrix, nlist=nlist, nprobe=nprobe)
+    return FlatIndex(matrix)
+
+
+# 3. 검색기
+class _VectorState:
+    """원자적으로 교체되는 인덱스 스냅샷"""
+    __slots__ = ("index", "store", "page_to_rows", "loaded_at")
+
+    def __init__(self, index, store: DocumentStore, page_to_rows: Dict[str, np.ndarray], loaded_at: float):
+        self.index = index  # FlatIndex 또는 IVFIndex
+        self.store = store  # 행 번호별 본문 / 메타데이터
+        self.page_to_rows = page_to_rows  # 페이지 -> 행 번호 배열 (페이지 필터용)
+        self.loaded_at = loaded_at  # 로딩 시각
+
+
+class LocalVectorRetriever(LazyLoading):
+    """text_embeddings를 메모리에 복제해 검색하는 벡터 검색기 (EnhancedSupabaseRetriever 대체)
+
+    로딩 전이거나 로딩에 실패하면 fallback 검색기(Supabase RPC)를 사용한다.
+    페이지/메타데이터 필터는 상위 k개를 고른 뒤 거르는 대신 조건에 맞는 행만 정확히 점수화한다.
+    """
+
+    index_name = "텍스트 벡터 인덱스"
+
+    def __init__(self, client, embeddings, table_name: str = "text_embeddings", backend: str = "auto", k: int = 5,
+                 match_threshold: float = 0.5, page_size: int = 1000, ivf_min_rows: int = 50000, nlist: Optional[int] = None,
+                 nprobe: int = 8, compact_rpc: Optional[str] = "get_text_embeddings_compact", fallback=None,
+                 quantization: str = "float32", rescore: int = 4, exact_dir: Optional[str] = None,
+                 retry_after: float = 30.0, reload_interval: float = 0.0):
+        super().__init__(retry_after, reload_interval)  # 실패 후 재시도 대기 / 주기적 다시 로딩
+        self.client = client  # Supabase 클라이언트
+        self.embeddings = embeddings  # 임베딩 모델
+        self.table_name = table_name  # 벡터 테이블 이름
+        self.backend = backend  # flat / ivf / auto
+        self.k = k  # 검색 결과 수
+        self.match_threshold = match_threshold  # 최소 유사도 (match_text_embeddings와 동일)
+        self.page_size = page_size  # 한 번에 읽어올 행 수
+        self.ivf_min_rows = ivf_min_rows  # auto일 때 IVF를 사용할 최소 행 수
+        self.nlist = nlist  # IVF 목록 수 (None이면 자동)
+        self.nprobe = nprobe  # IVF 질의당 검색 목록 수
+        self.compact_rpc = compact_rpc  # 임베딩을 바이너리(base64)로 돌려주는 RPC 이름 (None이면 테이블 직접 조회)
+        self.fallback = fallback  # 인덱스를 쓸 수 없을 때 사용할 검색기
+        self.quantization = quantization  # 임베딩 저장 형식 (float32 / int8)
+        self.rescore = rescore  # 원본 재점수화 후보 배수 (0이면 양자화 점수 그대로 사용)
+        self.exact_dir = exact_dir  # 재점수화용 원본 행렬 파일 디렉터리 (None이면 재점수화 안 함)
+        self._state: Optional[_VectorState] = None  # 현재 인덱스 스냅샷
+        self._lock = threading.Lock()  # 중복 로딩 방지
+
+    @property
+    def loaded(self) -> bool:
+        return self._state is not None
+
+    def __len__(self) -> int:
+        state = self._state
+        return len(state.store) if state is not None else 0
+
+    def _fetch_rows(self) -> Iterable[Dict[str, Any]]:
+        def table_page(start):
+            resp = self.client.table(self.table_name).select("id,content,metadata,embedding").range(start, start + self.page_size - 1).execute()
+            return resp.data or []
+
+        def rpc_page(start):
+            resp = self.client.rpc(self.compact_rpc, {"row_offset": start, "row_limit": self.page_size}).execute()
+            return resp.data or []
+
+        fetch_page = table_page
+        if self.compact_rpc:  # 압축 형식 RPC를 우선 사용하고, 없으면 테이블 조회로 대체
+            try:
+                rows = rpc_page(0)
+                fetch_page = rpc_page
+            except Exception as e:
+                logger.warning(f"압축 형식 RPC({self.compact_rpc}) 사용 불가, 테이블 조회로 대체: {str(e)}")
+                rows = table_page(0)
+        else:
+            rows = table_page(0)
+
+        start = 0
+        while True:
+            yield from rows
+            if len(rows) < self.page_size:
+                break
+            start += self.page_size
+            rows = fetch_page(start)
+
+    def load(self) -> "LocalVectorRetriever":
+        """테이블 전체를 읽어 새 인덱스를 만들고 기존 스냅샷과 교체"""
+        started = time.perf_counter()
+        vectors: List[np.ndarray] = []
+        records: List[Tuple[str, Dict[str, Any]]] = []
+        pages: Dict[str, List[int]] = {}
+
+        for row in self._fetch_rows():
+            if not row.get("content"):  # match_text_embeddings와 같이 본문이 없는 행은 제외
+                continue
+            try:
+                vector = decode_vector(row.get("embedding"))
+            except (ValueError, TypeError):
+                continue
+            if vector is None or vector.ndim != 1 or (vectors and vector.shape[0] != vectors[0].shape[0]):
+                continue
+            metadata = row.get("metadata") or {}
+            page = page_key(metadata.get("page"))
+            if page is not None:
+                pages.setdefault(page, []).append(len(vectors))
+            vectors.append(vector)
+            records.append((row["content"], metadata))
+
+        matrix = normalize_rows(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+        del vectors
+        matrix = QuantizedMatrix(matrix, self.quantization, self.rescore, self.exact_dir)
+        index = build_index(matrix, self.backend, self.ivf_min_rows, self.nlist, self.nprobe)
+        page_to_rows = {page: np.asarray(rows, dtype=np.int32) for page, rows in pages.items()}
+        self._state = _VectorState(index, DocumentStore.from_records(records), page_to_rows, time.time())  # 원자적 교체
+        logger.info(f"텍스트 벡터 인덱스 로딩 완료 ({index.kind}): {len(records)}개, {(time.perf_counter() - started) * 1000:.1f} ms")
+        return self
+
+    def _search(self, state: _VectorState, query: Optional[np.ndarray], page_filter=None, metadata_filter=None) -> List[Hit]:
+        if query is None or len(state.store) == 0 or query.shape[0] != state.index.matrix.shape[1]:
+            return []
+        if page_filter or metadata_filter:  # 필터: 조건에 맞는 행만 정확히 점수화
+            if page_filter:
+                rows = state.page_to_rows.get(page_key(page_filter))
+                if rows is None:
+                    return []
+            else:
+                rows = np.arange(len(state.store), dtype=np.int32)
+            if metadata_filter:
+                rows = np.asarray([row for row in rows
+                                   if all(state.store.get(row, key) == value for key, value in metadata_filter.items())], dtype=np.int32)
+            rows, scores = state.index.matrix.candidates(query, self.k, rows)
+            return top_hits(scores, rows, self.k, self.match_threshold)
+        return state.index.search(query, self.k, self.match_threshold)
+
+    def _to_documents(self, state: _VectorState, hits: List[Hit]) -> List[DocHandle]:
+        """검색 결과 핸들 (본문/메타데이터는 접근할 때 저장소에서 새로 만들어 인덱스와 공유하지 않음)"""
+        return [state.store.handle(row, similarity=score, source="Vector") for row, score in hits]
+
+    def invoke(self, query, page_filter=None, metadata_filter=None):
+        state = self.ensure_loaded()
+        if state is None:
+            return self.fallback.invoke(query, page_filter, metadata_filter) if self.fallback is not None else []
+        with stage("query_embedding"):
+            query_embedding = normalize_query(self.embeddings.embed_query(query))
+        with stage("local_vector_search"):
+            hits = self._search(state, query_embedding, page_filter, metadata_filter)
+        return self._to_documents(state, hits)
+
+    def batch_invoke(self, queries, page_filter=None, metadata_filter=None):  # 여러 쿼리를 임베딩 1회 + 행렬 곱 1회로 검색
+        state = self.ensure_loaded()
+        if state is None:
+            if self.fallback is not None:
+                return self.fallback.batch_invoke(queries, page_filter, metadata_filter)
+            return [[] for _ in queries]
+        with stage("query_embedding"):
+            if hasattr(self.embeddings, "embed_queries"):
+                query_embeddings = self.embeddings.embed_queries(queries)
+            else:
+                query_embeddings = [self.embeddings.embed_query(query) for query in queries]
+        with stage("local_vector_search"):
+            normalized = [normalize_query(embedding) for embedding in query_embeddings]
+            dim = state.index.matrix.shape[1] if len(state.store) else None
+            if page_filter or metadata_filter or dim is None or any(q is None or q.shape[0] != dim for q in normalized):
+                batch_hits = [self._search(state, query, page_filter, metadata_filter) for query in normalized]
+            else:
+                batch_hits = state.index.search_batch(np.vstack(normalized), self.k, self.match_threshold)
+        return [self._to_documents(state, hits) for hits in batch_hits]
+
+    def get_relevant_documents(self, query):
+        return self.invoke(query)
+
+    def share(self, store, name: str = "vector") -> None:
+        """검색 인덱스 배열을 공유 메모리(SharedArrayStore)로 이동 (fork 전 부모 프로세스에서 호출)"""
+        state = self._state
+        if state is not None:
+            state.index.share(store, name)
+            state.store.share(store, f"{name}-documents")
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {"loaded": False, "backend": self.backend}
+        stats = state.index.stats()
+        stats.update({"loaded": True, "backend": self.backend, "loaded_at": state.loaded_at, "reload_count": self.reload_count})
+        return stats